@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Soldier, MedicalData, Alert, Evacuation, UserProfile
+from .models import Soldier, MedicalData, Alert, Evacuation, UserProfile, CriticalEpisode, SoldierState, Unit, StatusCounter, VitalsThresholds
+from .services.classification import clear_cache as clear_thresholds_cache
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
@@ -31,7 +32,7 @@ class SoldierAdmin(admin.ModelAdmin):
     search_fields = ('devEui', 'first_name', 'last_name', 'unit')
     ordering = ('last_name', 'first_name')
     inlines = [EvacuationInline, MedicalDataInline, AlertInline]
-    readonly_fields = ('is_evacuated', 'last_update', 'created_at')
+    readonly_fields = ('military_unit', 'is_evacuated', 'last_update', 'created_at')
 
 @admin.register(Evacuation)
 class EvacuationAdmin(admin.ModelAdmin):
@@ -57,6 +58,47 @@ class AlertAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
     readonly_fields = ('created_at',)
 
+@admin.register(SoldierState)
+class SoldierStateAdmin(admin.ModelAdmin):
+    list_display = ('soldier', 'issue_type', 'spo2', 'heart_rate', 'geohash', 'timestamp')
+    list_filter = ('issue_type',)
+    search_fields = ('soldier__devEui', 'soldier__first_name', 'soldier__last_name', 'geohash')
+    readonly_fields = ('medical_data', 'updated_at')
+
+@admin.register(CriticalEpisode)
+class CriticalEpisodeAdmin(admin.ModelAdmin):
+    list_display = ('soldier', 'started_at', 'ended_at', 'issue_types', 'worst_spo2', 'readings_count')
+    list_filter = ('started_at', 'ended_at')
+    search_fields = ('soldier__devEui', 'soldier__first_name', 'soldier__last_name')
+    ordering = ('-started_at',)
+
+@admin.register(Unit)
+class UnitAdmin(admin.ModelAdmin):
+    list_display = ('name', 'parent')
+    search_fields = ('name',)
+    list_select_related = ('parent',)
+
+@admin.register(VitalsThresholds)
+class VitalsThresholdsAdmin(admin.ModelAdmin):
+    list_display = ('id', 'unit', 'spo2_min', 'heart_rate_min', 'heart_rate_max', 'created_at', 'created_by')
+    list_filter = ('unit',)
+    readonly_fields = ('created_at', 'created_by')
+
+    def has_change_permission(self, request, obj=None):
+        # Кожна зміна порогів - нова версія, існуючі записи не редагуються
+        return False
+
+    def save_model(self, request, obj, form, change):
+        obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+        clear_thresholds_cache()
+
+@admin.register(StatusCounter)
+class StatusCounterAdmin(admin.ModelAdmin):
+    list_display = ('unit', 'evacuation_status', 'issue_type', 'count', 'updated_at')
+    list_filter = ('evacuation_status', 'issue_type')
+    readonly_fields = ('updated_at',)
+
 # Розширення адміністративного інтерфейсу для користувачів
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Користувачі та групи змінюються також через адмінку і вхід у систему,
+        # тому кеш аудиту безпеки скидається сигналами моделей auth
+        from django.contrib.auth.models import User, Group
+        from django.db.models.signals import post_save, post_delete, m2m_changed
+        from api.response_cache import user_changed
+
+        for model in (User, Group):
+            post_save.connect(user_changed, sender=model, dispatch_uid=f'response_cache_{model.__name__}_save')
+            post_delete.connect(user_changed, sender=model, dispatch_uid=f'response_cache_{model.__name__}_delete')
+        m2m_changed.connect(user_changed, sender=User.groups.through, dispatch_uid='response_cache_user_groups')
@@ -0,0 +1,64 @@
+"""Умовні GET запити (ETag / If-None-Match) для endpoint-ів, які опитує дашборд.
+
+ETag складається з версій даних (api/services/versions.py), параметрів запиту
+та, за потреби, поточної хвилини для відповідей з тривалостями. Якщо клієнт
+надіслав той самий ETag, повертається 304 без запитів до бази та серіалізації.
+Параметри проти кешування браузера (?t=<час>) в ETag не входять.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.services.versions import data_versions
+
+# Параметри, які клієнти додають лише для обходу кешу браузера
+CACHE_BUSTER_PARAMS = ('t',)
+
+
+def request_params(request):
+    """Параметри запиту, від яких залежить відповідь"""
+    params = request.GET.copy()
+    for name in CACHE_BUSTER_PARAMS:
+        params.pop(name, None)
+    return params.urlencode()
+
+
+def build_etag(request, scopes, per_minute):
+    parts = data_versions(*scopes)
+    parts.append(request.path)
+    parts.append(request_params(request))
+    if per_minute:
+        parts.append(str(int(timezone.now().timestamp() // 60)))
+    digest = hashlib.sha1('|'.join(parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def conditional_on(*scopes, per_minute=False):
+    """Декоратор дії viewset: ETag з версій областей scopes.
+
+    ETag обчислюється до виконання дії: зміна, що відбудеться під час
+    побудови відповіді, дасть інший ETag при наступному опитуванні.
+    Права доступу перевіряються DRF до виклику дії, тож 304 отримують
+    лише користувачі з доступом.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            etag = build_etag(request, scopes, per_minute)
+            # Відповіді залежать від прав користувача: не кешувати в спільних проксі
+            headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+            matches = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+            if etag in matches or '*' in matches:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                for name, value in headers.items():
+                    response[name] = value
+            return response
+        return wrapper
+    return decorator
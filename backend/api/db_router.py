@@ -0,0 +1,126 @@
+"""Маршрутизація читання на репліку бази даних.
+
+Читання йде на репліку лише для дій, явно перелічених у ReplicaReadMixin.replica_actions,
+лише для безпечних методів і лише поки відставання репліки не перевищує
+REPLICA_MAX_LAG_SECONDS. Після дій евакуації користувач на REPLICA_PIN_SECONDS
+закріплюється за основною базою, щоб одразу бачити власні зміни.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+_use_replica = ContextVar('use_replica', default=False)
+
+_lag_lock = threading.Lock()
+_lag_state = {'checked_at': None, 'healthy': False}
+
+PIN_SESSION_KEY = 'primary_db_until'
+
+
+def replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def replica_lag_seconds(alias):
+    """Відставання репліки в секундах або None, якщо реплікація не працює"""
+    connection = connections[alias]
+    if connection.vendor != 'mysql':
+        # Локальні бази (наприклад, два файли SQLite) не мають реплікації
+        return 0
+
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute('SHOW REPLICA STATUS')
+            column = 'Seconds_Behind_Source'
+        except Exception:
+            # MySQL до 8.0.22
+            cursor.execute('SHOW SLAVE STATUS')
+            column = 'Seconds_Behind_Master'
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        columns = [description[0] for description in cursor.description]
+        return dict(zip(columns, row)).get(column)
+
+
+def replica_is_healthy():
+    """Перевіряє відставання репліки не частіше ніж раз на REPLICA_LAG_CHECK_INTERVAL секунд"""
+    alias = replica_alias()
+    if alias is None:
+        return False
+
+    now = time.monotonic()
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+    checked_at = _lag_state['checked_at']
+    if checked_at is not None and now - checked_at < interval:
+        return _lag_state['healthy']
+
+    with _lag_lock:
+        if _lag_state['checked_at'] is not None and now - _lag_state['checked_at'] < interval:
+            return _lag_state['healthy']
+        try:
+            lag = replica_lag_seconds(alias)
+            healthy = lag is not None and lag <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+            if not healthy:
+                logger.warning(f"Replica '{alias}' lag is {lag}, reading from primary")
+        except Exception as e:
+            logger.error(f"Error checking replica lag: {e}")
+            healthy = False
+        _lag_state['checked_at'] = now
+        _lag_state['healthy'] = healthy
+    return healthy
+
+
+def pin_to_primary(request):
+    """Закріплює читання користувача за основною базою після його змін"""
+    if hasattr(request, 'session'):
+        request.session[PIN_SESSION_KEY] = time.time() + getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+def is_pinned_to_primary(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+class ReplicaRouter:
+    """Направляє читання на репліку, коли поточний запит дозволив це"""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaReadMixin:
+    """Дозволяє читання з репліки для дій в'юсету з replica_actions"""
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and getattr(self, 'action', None) in self.replica_actions
+            and not is_pinned_to_primary(request)
+            and replica_is_healthy()
+        ):
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
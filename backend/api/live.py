@@ -0,0 +1,279 @@
+"""Оновлення в реальному часі через WebSocket (/ws/medical_data/).
+
+Один опитувач на процес читає нові записи ChangeLog, завантажує змінені стани
+поранених, сповіщення та евакуації одним запитом на тип, серіалізує кожне
+повідомлення один раз і розсилає його з'єднанням, фільтри яких йому
+відповідають. Клієнти без фільтрів отримують усі повідомлення.
+
+Протокол (frontend/src/utils/websocket.js):
+    сервер -> клієнт: {"type": "medical_data" | "evacuation_update" | "alert", "data": {...}}
+    клієнт -> сервер: {"action": "subscribe_soldier" | "unsubscribe_soldier", "soldier_id": "..."}
+                      {"action": "subscribe_unit" | "unsubscribe_unit", "unit_id": 1}
+                      {"action": "subscribe_bbox", "bbox": [min_lat, min_lon, max_lat, max_lon]}
+                      {"action": "unsubscribe_bbox"}
+"""
+import asyncio
+import json
+import logging
+from collections import namedtuple
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, HASH_SESSION_KEY, get_user_model
+from django.db import close_old_connections
+from django.utils.crypto import constant_time_compare
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.models import ChangeLog, SoldierState, Alert, Evacuation, UnitClosure
+from api.serializers import MedicalDataSerializer, AlertSerializer, EvacuationSerializer
+from api.services.changes import current_cursor
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_PATH = '/ws/medical_data/'
+
+# Кому адресоване повідомлення: за цими полями перевіряються фільтри з'єднань
+Route = namedtuple('Route', ['soldier_id', 'unit_id', 'latitude', 'longitude'])
+
+
+class Subscriber:
+    """Одне WebSocket з'єднання з його фільтрами та чергою повідомлень"""
+
+    def __init__(self):
+        self.soldiers = set()
+        self.units = {}
+        self.bbox = None
+        self.queue = asyncio.Queue(maxsize=getattr(settings, 'LIVE_UPDATES_QUEUE_SIZE', 256))
+        self.overflowed = False
+
+    def matches(self, route):
+        if not self.soldiers and not self.units and self.bbox is None:
+            return True
+        if route.soldier_id in self.soldiers:
+            return True
+        if any(route.unit_id in subtree for subtree in self.units.values()):
+            return True
+        if self.bbox is not None and route.latitude is not None and route.longitude is not None:
+            min_lat, min_lon, max_lat, max_lon = self.bbox
+            return min_lat <= route.latitude <= max_lat and min_lon <= route.longitude <= max_lon
+        return False
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Повільний клієнт: закриваємо з'єднання, клієнт перепідключиться і дочитає через ?since=
+            self.overflowed = True
+
+
+class LiveUpdatesHub:
+    """Опитувач журналу змін та розсилка повідомлень підписникам процесу"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.cursor = None
+        self.last_sent_readings = {}
+        self.task = None
+
+    def add(self, subscriber):
+        self.subscribers.add(subscriber)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def remove(self, subscriber):
+        self.subscribers.discard(subscriber)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+            self.cursor = None
+
+    async def run(self):
+        interval = getattr(settings, 'LIVE_UPDATES_POLL_INTERVAL', 1.0)
+        while True:
+            try:
+                messages = await sync_to_async(self.collect)()
+                self.publish(messages)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error polling live updates: {e}")
+            await asyncio.sleep(interval)
+
+    def publish(self, messages):
+        for route, message in messages:
+            for subscriber in self.subscribers:
+                if subscriber.matches(route):
+                    subscriber.push(message)
+
+    def collect(self):
+        """Читає нові зміни та будує повідомлення (виконується в потоці)"""
+        close_old_connections()
+        if self.cursor is None:
+            self.cursor = current_cursor()
+            return []
+
+        # Лише до безпечного курсора: зміни ще не завершених транзакцій з меншим
+        # seq інакше опинились би позаду курсора опитувача і не були б розіслані
+        safe_cursor = current_cursor()
+        if safe_cursor <= self.cursor:
+            return []
+        changes = {'soldier': set(), 'alert': set(), 'evacuation': set()}
+        rows = ChangeLog.objects.filter(seq__gt=self.cursor, seq__lte=safe_cursor).order_by('seq')
+        last_seq = self.cursor
+        for seq, scope, object_id, action in rows.values_list('seq', 'scope', 'object_id', 'action')[:10000]:
+            if action == 'UPSERT':
+                changes[scope].add(object_id)
+            last_seq = seq
+        self.cursor = last_seq
+
+        messages = []
+        if changes['soldier']:
+            messages += self.reading_messages(changes['soldier'])
+        if changes['alert']:
+            messages += self.alert_messages(changes['alert'])
+        if changes['evacuation']:
+            messages += self.evacuation_messages(changes['evacuation'])
+        return messages
+
+    def reading_messages(self, soldier_ids):
+        states = []
+        for state in SoldierState.objects.filter(soldier_id__in=soldier_ids).select_related('medical_data', 'soldier'):
+            # Зміни бійця без нового виміру (евакуація, редагування) не дублюють medical_data
+            if state.medical_data is None or self.last_sent_readings.get(state.soldier_id) == state.medical_data_id:
+                continue
+            self.last_sent_readings[state.soldier_id] = state.medical_data_id
+            states.append(state)
+        readings = MedicalDataSerializer([state.medical_data for state in states], many=True).data
+        return [
+            (
+                Route(state.soldier_id, state.soldier.military_unit_id, state.latitude, state.longitude),
+                encode('medical_data', data)
+            )
+            for state, data in zip(states, readings)
+        ]
+
+    def alert_messages(self, alert_ids):
+        alerts = list(Alert.objects.filter(id__in=alert_ids).select_related('soldier'))
+        return [
+            (
+                Route(alert.soldier_id, alert.soldier.military_unit_id, alert.latitude, alert.longitude),
+                encode('alert', data)
+            )
+            for alert, data in zip(alerts, AlertSerializer(alerts, many=True).data)
+        ]
+
+    def evacuation_messages(self, evacuation_ids):
+        evacuations = list(Evacuation.objects.filter(id__in=evacuation_ids).select_related('soldier__state'))
+        messages = []
+        for evacuation, data in zip(evacuations, EvacuationSerializer(evacuations, many=True).data):
+            try:
+                state = evacuation.soldier.state
+                latitude, longitude = state.latitude, state.longitude
+            except SoldierState.DoesNotExist:
+                latitude = longitude = None
+            route = Route(evacuation.soldier_id, evacuation.soldier.military_unit_id, latitude, longitude)
+            messages.append((route, encode('evacuation_update', data)))
+        return messages
+
+
+def encode(message_type, data):
+    return json.dumps({'type': message_type, 'data': data}, cls=JSONEncoder, ensure_ascii=False)
+
+
+hub = LiveUpdatesHub()
+
+
+def authenticated_user_id(scope):
+    """Користувач з сесійної cookie (None, якщо сесія недійсна)"""
+    cookies = SimpleCookie()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookies.load(value.decode('latin1'))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    user_id = session.get(SESSION_KEY)
+    if user_id is None:
+        return None
+    user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+    if user is None or not constant_time_compare(session.get(HASH_SESSION_KEY, ''), user.get_session_auth_hash()):
+        return None
+    return user.pk
+
+
+def unit_subtree(unit_id):
+    return set(UnitClosure.objects.filter(ancestor_id=unit_id).values_list('descendant_id', flat=True))
+
+
+async def handle_action(subscriber, message, send):
+    """Змінює фільтри з'єднання за повідомленням клієнта"""
+    action = message.get('action')
+    try:
+        if action == 'subscribe_soldier':
+            subscriber.soldiers.add(str(message['soldier_id']))
+        elif action == 'unsubscribe_soldier':
+            subscriber.soldiers.discard(str(message['soldier_id']))
+        elif action == 'subscribe_unit':
+            unit_id = int(message['unit_id'])
+            subscriber.units[unit_id] = await sync_to_async(unit_subtree)(unit_id)
+        elif action == 'unsubscribe_unit':
+            subscriber.units.pop(int(message['unit_id']), None)
+        elif action == 'subscribe_bbox':
+            min_lat, min_lon, max_lat, max_lon = [float(value) for value in message['bbox']]
+            subscriber.bbox = (min_lat, min_lon, max_lat, max_lon)
+        elif action == 'unsubscribe_bbox':
+            subscriber.bbox = None
+        else:
+            raise ValueError(f"Невідома дія: {action}")
+    except (KeyError, TypeError, ValueError) as e:
+        await send({'type': 'websocket.send', 'text': json.dumps({'type': 'error', 'message': str(e)}, ensure_ascii=False)})
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI застосунок WebSocket каналу оновлень"""
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    user_id = await sync_to_async(authenticated_user_id)(scope)
+    if user_id is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    await send({'type': 'websocket.accept'})
+
+    subscriber = Subscriber()
+    hub.add(subscriber)
+
+    async def sender():
+        while True:
+            message = await subscriber.queue.get()
+            if subscriber.overflowed:
+                await send({'type': 'websocket.close', 'code': 4408})
+                return
+            await send({'type': 'websocket.send', 'text': message})
+
+    sender_task = asyncio.create_task(sender())
+    try:
+        while not sender_task.done():
+            receive_task = asyncio.create_task(receive())
+            await asyncio.wait([receive_task, sender_task], return_when=asyncio.FIRST_COMPLETED)
+            if not receive_task.done():
+                receive_task.cancel()
+                break
+            event = receive_task.result()
+            if event['type'] == 'websocket.disconnect':
+                break
+            if event['type'] == 'websocket.receive' and event.get('text'):
+                try:
+                    message = json.loads(event['text'])
+                except ValueError:
+                    continue
+                if isinstance(message, dict):
+                    await handle_action(subscriber, message, send)
+    finally:
+        sender_task.cancel()
+        hub.remove(subscriber)
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.models import Alert
+
+class Command(BaseCommand):
+    help = 'Переносить координати та показники сповіщень з JSON details в окремі колонки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Кількість сповіщень в одному пакеті')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        total = 0
+
+        while True:
+            # Пакети за діапазоном первинного ключа не потребують OFFSET
+            chunk = list(
+                Alert.objects.filter(id__gt=last_id, issue_type__isnull=True)
+                .order_by('id')
+                .only('id', 'details')[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            changed = [alert for alert in chunk if self.promote_details(alert)]
+            with transaction.atomic():
+                Alert.objects.bulk_update(
+                    changed,
+                    ['latitude', 'longitude', 'spo2', 'heart_rate', 'issue_type', 'details'],
+                    batch_size=500
+                )
+            total += len(changed)
+            self.stdout.write(f'Оброблено {total} сповіщень')
+
+        self.stdout.write(self.style.SUCCESS(f'Перенесено деталі {total} сповіщень'))
+
+    def promote_details(self, alert):
+        """Переносить відомі ключі details в колонки, решта залишається в details"""
+        details = dict(alert.details or {})
+        if not {'location', 'vitals', 'issue_type'} & details.keys():
+            return False
+        location = details.pop('location', None) or {}
+        vitals = details.pop('vitals', None) or {}
+
+        alert.latitude = location.get('lat')
+        alert.longitude = location.get('lng')
+        alert.spo2 = vitals.get('spo2')
+        alert.heart_rate = vitals.get('heart_rate')
+        alert.issue_type = details.pop('issue_type', None)
+        alert.details = details
+        return True
@@ -0,0 +1,105 @@
+import random
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from api.models import Soldier, MedicalData, SoldierState, Evacuation, Alert, CriticalEpisode
+from api.services import analytics as analytics_service
+
+PREFIX = 'anbench'
+ISSUE_TYPES = ['NORMAL'] * 16 + ['SPO2', 'HR', 'BOTH', 'SENSOR_ERROR']
+
+
+class Command(BaseCommand):
+    help = 'Вимірює час та кількість запитів аналітики для періодів 24h/7d/30d на синтетичних вимірах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readings', type=int, default=10_000_000, help='Кількість вимірів, рівномірно за 30 днів')
+        parser.add_argument('--soldiers', type=int, default=2000, help='Кількість поранених')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Розмір пакета вставки')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторів вимірювання (виводиться медіана)')
+        parser.add_argument('--keep', action='store_true', help='Не видаляти синтетичні дані після вимірювання')
+
+    def handle(self, *args, **options):
+        if not Soldier.objects.filter(devEui__startswith=PREFIX).exists():
+            self.populate(options)
+        try:
+            self.stdout.write(f"{'період':>6} {'запитів':>8} {'медіана, с':>11}")
+            for period in analytics_service.PERIODS:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as queries:
+                        analytics_service.build_analytics(period)
+                    timings.append(time.perf_counter() - started)
+                timings.sort()
+                self.stdout.write(f'{period:>6} {len(queries):>8} {timings[len(timings) // 2]:>11.2f}')
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+    def populate(self, options):
+        """Створює поранених, виміри за 30 днів, евакуації, сповіщення та критичні епізоди"""
+        now = timezone.now()
+        period = timedelta(days=30).total_seconds()
+        soldiers = Soldier.objects.bulk_create([
+            Soldier(devEui=f'{PREFIX}{index:08d}', first_name='Бенчмарк', last_name=str(index), unit='Бенчмарк')
+            for index in range(options['soldiers'])
+        ], batch_size=options['batch_size'])
+        soldier_ids = [soldier.devEui for soldier in soldiers]
+
+        written = 0
+        while written < options['readings']:
+            size = min(options['batch_size'], options['readings'] - written)
+            MedicalData.objects.bulk_create([
+                MedicalData(
+                    device_id=random.choice(soldier_ids),
+                    spo2=random.randint(80, 100),
+                    heart_rate=random.randint(40, 140),
+                    latitude=48.0 + random.random(),
+                    longitude=35.0 + random.random(),
+                    timestamp=now - timedelta(seconds=random.random() * period),
+                    issue_type=random.choice(ISSUE_TYPES)
+                )
+                for _ in range(size)
+            ])
+            written += size
+            if written % (options['batch_size'] * 100) == 0:
+                self.stdout.write(f'Записано {written} вимірів')
+
+        Evacuation.objects.bulk_create([
+            Evacuation(
+                soldier_id=soldier_id,
+                status='EVACUATED',
+                evacuation_started=now - timedelta(seconds=random.random() * period),
+                evacuation_time=now - timedelta(seconds=random.random() * 3600)
+            )
+            for soldier_id in soldier_ids[::2]
+        ], batch_size=options['batch_size'])
+        Alert.objects.bulk_create([
+            Alert(soldier_id=soldier_id, alert_type='CRITICAL_STATE', message='Бенчмарк', details={}, issue_type='SPO2')
+            for soldier_id in soldier_ids
+        ], batch_size=options['batch_size'])
+        CriticalEpisode.objects.bulk_create([
+            CriticalEpisode(
+                soldier_id=soldier_id,
+                started_at=now - timedelta(seconds=random.random() * period),
+                last_reading_at=now,
+                issue_types='SPO2'
+            )
+            for soldier_id in soldier_ids[::3]
+        ], batch_size=options['batch_size'])
+
+    def cleanup(self):
+        """Видаляє синтетичні дані пакетами, не завантажуючи мільйони записів у пам'ять"""
+        soldiers = Soldier.objects.filter(devEui__startswith=PREFIX)
+        SoldierState.objects.filter(soldier__in=soldiers).delete()
+        readings = MedicalData.objects.filter(device__in=soldiers)
+        while True:
+            ids = list(readings.values_list('id', flat=True)[:50000])
+            if not ids:
+                break
+            MedicalData.objects.filter(id__in=ids).delete()
+        soldiers.delete()
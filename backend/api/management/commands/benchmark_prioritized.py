@@ -0,0 +1,108 @@
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from api.models import Soldier, MedicalData, SoldierState, Evacuation, CriticalEpisode
+from api.services.spatial import encode_geohash
+from api import views
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Вимірює час та кількість запитів endpoint prioritized на синтетичних даних (зміни відкочуються)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000', help='Кількості поранених через кому')
+        parser.add_argument('--readings', type=int, default=3, help='Вимірів на пораненого')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        self.stdout.write(f"{'поранених':>10} {'запитів':>8} {'холодний, с':>12} {'кешований, с':>13} {'запитів з кешем':>16}")
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    self.populate(size, options['readings'])
+                    self.stdout.write(self.measure(size))
+                    raise Rollback()
+            except Rollback:
+                pass
+
+    def populate(self, size, readings):
+        """Створює поранених з вимірами, станами, евакуаціями та критичними епізодами"""
+        now = timezone.now()
+        soldiers = [
+            Soldier(devEui=f'bench{index:011d}', first_name='Бійць', last_name=str(index), unit='Бенчмарк')
+            for index in range(size)
+        ]
+        Soldier.objects.bulk_create(soldiers, batch_size=2000)
+
+        records = []
+        for soldier in soldiers:
+            for reading in range(readings):
+                spo2 = random.randint(80, 100)
+                heart_rate = random.randint(50, 140)
+                latitude = 48.5 + random.random()
+                longitude = 35.0 + random.random()
+                records.append(MedicalData(
+                    device=soldier,
+                    spo2=spo2,
+                    heart_rate=heart_rate,
+                    latitude=latitude,
+                    longitude=longitude,
+                    timestamp=now - timedelta(seconds=30 * (readings - reading)),
+                    issue_type='SPO2' if spo2 < 90 else 'NORMAL'
+                ))
+        MedicalData.objects.bulk_create(records, batch_size=2000)
+
+        latest = {record.device_id: record for record in MedicalData.objects.filter(
+            device_id__in=[soldier.devEui for soldier in soldiers],
+            timestamp__gte=now - timedelta(seconds=30)
+        )}
+        SoldierState.objects.bulk_create([
+            SoldierState(
+                soldier_id=soldier_id,
+                medical_data=record,
+                spo2=record.spo2,
+                heart_rate=record.heart_rate,
+                latitude=record.latitude,
+                longitude=record.longitude,
+                geohash=encode_geohash(record.latitude, record.longitude),
+                issue_type=record.issue_type,
+                timestamp=record.timestamp
+            )
+            for soldier_id, record in latest.items()
+        ], batch_size=2000)
+        CriticalEpisode.objects.bulk_create([
+            CriticalEpisode(soldier_id=soldier_id, started_at=record.timestamp, last_reading_at=record.timestamp, issue_types='SPO2')
+            for soldier_id, record in latest.items() if record.issue_type == 'SPO2'
+        ], batch_size=2000)
+        Evacuation.objects.bulk_create([
+            Evacuation(soldier=soldier, status=random.choice(['NEEDED', 'IN_PROGRESS']), priority=random.randint(0, 5))
+            for soldier in soldiers[::3]
+        ], batch_size=2000)
+
+    def measure(self, size):
+        user = User.objects.filter(is_superuser=True).first() or User.objects.create_user('benchmark')
+        view = views.SoldierViewSet.as_view({'get': 'prioritized'})
+
+        def call():
+            request = APIRequestFactory().get('/api/soldiers/prioritized/')
+            force_authenticate(request, user=user)
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                response = view(request)
+            assert response.status_code == 200 and len(response.data) >= size
+            return time.perf_counter() - started, len(queries)
+
+        views._prioritized_cache.clear()
+        cold_time, cold_queries = call()
+        warm_time, warm_queries = call()
+        return f'{size:>10} {cold_queries:>8} {cold_time:>12.2f} {warm_time:>13.3f} {warm_queries:>16}'
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import random
+import time
+from asgiref.sync import sync_to_async
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.live import websocket_application, hub
+from api.models import Soldier, Alert, ChangeLog
+from api.services.ingestion import record_medical_data
+from api.services.counters import reconcile_counters
+
+PREFIX = 'loadtest'
+
+
+class FakeClient:
+    """WebSocket клієнт, підключений напряму до ASGI застосунку"""
+
+    def __init__(self, session_key, subscription):
+        self.scope = {
+            'type': 'websocket',
+            'path': '/ws/medical_data/',
+            'headers': [(b'cookie', f'{settings.SESSION_COOKIE_NAME}={session_key}'.encode())]
+        }
+        self.incoming = asyncio.Queue()
+        self.incoming.put_nowait({'type': 'websocket.connect'})
+        if subscription:
+            self.incoming.put_nowait({'type': 'websocket.receive', 'text': json.dumps(subscription)})
+        self.accepted = False
+        self.received = []
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send(self, event):
+        if event['type'] == 'websocket.accept':
+            self.accepted = True
+        elif event['type'] == 'websocket.send':
+            self.received.append((time.perf_counter(), event['text']))
+
+    def disconnect(self):
+        self.incoming.put_nowait({'type': 'websocket.disconnect'})
+
+
+class Command(BaseCommand):
+    help = "Навантажувальний тест каналу оновлень: тисячі WebSocket клієнтів в одному процесі"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=2000, help="Кількість з'єднань")
+        parser.add_argument('--soldiers', type=int, default=100, help='Кількість поранених, що надсилають виміри')
+        parser.add_argument('--readings', type=int, default=500, help='Загальна кількість вимірів')
+        parser.add_argument('--rate', type=float, default=100.0, help='Вимірів за секунду')
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(f'{PREFIX}_{int(time.time())}')
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+
+        soldiers = Soldier.objects.bulk_create([
+            Soldier(devEui=f'{PREFIX}{index:08d}', first_name='Тест', last_name=str(index), unit='Навантажувальний тест')
+            for index in range(options['soldiers'])
+        ])
+        try:
+            report = asyncio.run(self.run(session.session_key, soldiers, options))
+        finally:
+            alert_ids = [str(alert_id) for alert_id in Alert.objects.filter(soldier__devEui__startswith=PREFIX).values_list('id', flat=True)]
+            ChangeLog.objects.filter(scope='alert', object_id__in=alert_ids).delete()
+            ChangeLog.objects.filter(object_id__startswith=PREFIX).delete()
+            Soldier.objects.filter(devEui__startswith=PREFIX).delete()
+            session.delete()
+            user.delete()
+            reconcile_counters()
+        self.stdout.write(report)
+
+    async def run(self, session_key, soldiers, options):
+        clients = []
+        for index in range(options['clients']):
+            # Третина без фільтрів, третина стежить за одним пораненим, третина - за районом
+            if index % 3 == 1:
+                subscription = {'action': 'subscribe_soldier', 'soldier_id': random.choice(soldiers).devEui}
+            elif index % 3 == 2:
+                subscription = {'action': 'subscribe_bbox', 'bbox': [48.0, 35.0, 48.5, 36.0]}
+            else:
+                subscription = None
+            clients.append(FakeClient(session_key, subscription))
+
+        tasks = [asyncio.create_task(websocket_application(c.scope, c.receive, c.send)) for c in clients]
+        while hub.cursor is None or not all(c.accepted for c in clients):
+            await asyncio.sleep(0.1)
+        connected = sum(c.accepted for c in clients)
+
+        written = await sync_to_async(self.produce, thread_sensitive=False)(soldiers, options)
+        # Очікуємо, доки опитувач прочитає всі зміни
+        await asyncio.sleep(getattr(settings, 'LIVE_UPDATES_POLL_INTERVAL', 1.0) * 2 + 1)
+
+        for client in clients:
+            client.disconnect()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        latencies = []
+        delivered = 0
+        for client in clients:
+            delivered += len(client.received)
+            for received_at, text in client.received:
+                message = json.loads(text)
+                if message['type'] == 'medical_data' and message['data']['id'] in written:
+                    latencies.append(received_at - written[message['data']['id']])
+        latencies.sort()
+
+        def percentile(value):
+            return latencies[min(int(len(latencies) * value), len(latencies) - 1)] if latencies else 0
+
+        return (
+            f"З'єднань: {connected}/{len(clients)}\n"
+            f"Записано вимірів: {len(written)}\n"
+            f"Доставлено повідомлень: {delivered}\n"
+            f"Затримка доставки medical_data, с: p50={percentile(0.5):.3f} p95={percentile(0.95):.3f} max={percentile(1):.3f}"
+        )
+
+    def produce(self, soldiers, options):
+        """Записує виміри з заданою частотою, повертає час запису кожного виміру"""
+        written = {}
+        interval = 1 / options['rate']
+        for index in range(options['readings']):
+            started = time.perf_counter()
+            medical_data = record_medical_data(
+                soldier=random.choice(soldiers),
+                spo2=random.randint(85, 100),
+                heart_rate=random.randint(60, 130),
+                latitude=47.5 + random.random() * 1.5,
+                longitude=35.0 + random.random(),
+                timestamp=timezone.now()
+            )
+            if medical_data is not None:
+                written[medical_data.id] = time.perf_counter()
+            time.sleep(max(0, interval - (time.perf_counter() - started)))
+        return written
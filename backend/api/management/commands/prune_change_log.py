@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.services.changes import prune_changes
+
+class Command(BaseCommand):
+    help = 'Видаляє старі записи журналу змін дельта-синхронізації'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None, help='Зберігати зміни за останні N годин (за замовчуванням CHANGE_LOG_RETENTION_HOURS)')
+
+    def handle(self, *args, **options):
+        older_than = None
+        if options['hours'] is not None:
+            older_than = timezone.now() - timezone.timedelta(hours=options['hours'])
+        deleted = prune_changes(older_than)
+        self.stdout.write(self.style.SUCCESS(f'Видалено {deleted} записів журналу змін'))
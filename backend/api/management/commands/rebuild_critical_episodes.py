@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.models import Soldier, MedicalData, CriticalEpisode
+from api.services.changes import record_changes
+
+class Command(BaseCommand):
+    help = 'Перебудовує критичні епізоди поранених з історії медичних даних'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Розмір пакета при читанні історії')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        total = 0
+        # Поранені, у яких були або з'явились епізоди: їхня тривалість критичного стану могла змінитись
+        changed = []
+
+        for soldier in Soldier.objects.all().iterator():
+            episodes = self.build_episodes(soldier, chunk_size)
+            with transaction.atomic():
+                deleted, _ = CriticalEpisode.objects.filter(soldier=soldier).delete()
+                CriticalEpisode.objects.bulk_create(episodes, batch_size=1000)
+            total += len(episodes)
+            if deleted or episodes:
+                changed.append(soldier.pk)
+            if len(changed) >= 1000:
+                record_changes('soldier', changed)
+                changed = []
+        if changed:
+            record_changes('soldier', changed)
+
+        self.stdout.write(self.style.SUCCESS(f'Створено {total} критичних епізодів'))
+
+    def build_episodes(self, soldier, chunk_size):
+        """Проходить історію пораненого в хронологічному порядку та формує епізоди"""
+        episodes = []
+        episode = None
+        readings = MedicalData.objects.filter(device=soldier).order_by('timestamp', 'id').only(
+            'spo2', 'heart_rate', 'timestamp', 'issue_type'
+        )
+
+        for reading in readings.iterator(chunk_size=chunk_size):
+            if reading.issue_type in MedicalData.CRITICAL_ISSUE_TYPES:
+                if episode is None:
+                    episode = CriticalEpisode(
+                        soldier=soldier,
+                        started_at=reading.timestamp,
+                        last_reading_at=reading.timestamp
+                    )
+                    episodes.append(episode)
+                episode.register_reading(reading)
+            elif reading.issue_type == 'NORMAL' and episode is not None:
+                episode.ended_at = reading.timestamp
+                episode = None
+
+        return episodes
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+from django.db.models import OuterRef, Subquery
+from api.models import Soldier, MedicalData, SoldierState
+from api.services.spatial import encode_geohash
+from api.services.changes import record_changes
+
+class Command(BaseCommand):
+    help = 'Перебудовує таблицю поточних станів поранених з останніх медичних даних'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Розмір пакета для запису')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        latest_id = MedicalData.objects.filter(
+            device=OuterRef('pk')
+        ).order_by('-timestamp', '-id').values('id')[:1]
+        latest_ids = Soldier.objects.annotate(
+            latest_id=Subquery(latest_id)
+        ).filter(latest_id__isnull=False).values_list('latest_id', flat=True)
+
+        states = []
+        total = 0
+        for reading in MedicalData.objects.filter(id__in=list(latest_ids)).iterator(chunk_size=batch_size):
+            states.append(SoldierState(
+                soldier_id=reading.device_id,
+                medical_data=reading,
+                spo2=reading.spo2,
+                heart_rate=reading.heart_rate,
+                latitude=reading.latitude,
+                longitude=reading.longitude,
+                geohash=encode_geohash(reading.latitude, reading.longitude),
+                issue_type=reading.issue_type,
+                timestamp=reading.timestamp
+            ))
+            if len(states) >= batch_size:
+                total += self.save_states(states)
+                states = []
+        total += self.save_states(states)
+
+        self.stdout.write(self.style.SUCCESS(f'Оновлено {total} поточних станів'))
+
+    def save_states(self, states):
+        if states:
+            # MySQL (ON DUPLICATE KEY UPDATE) не приймає цільових полів конфлікту
+            features = connections[router.db_for_write(SoldierState)].features
+            unique_fields = ['soldier'] if features.supports_update_conflicts_with_target else None
+            SoldierState.objects.bulk_create(
+                states,
+                update_conflicts=True,
+                unique_fields=unique_fields,
+                update_fields=['medical_data', 'spo2', 'heart_rate', 'latitude', 'longitude', 'geohash', 'issue_type', 'timestamp']
+            )
+            record_changes('soldier', [state.soldier_id for state in states])
+        return len(states)
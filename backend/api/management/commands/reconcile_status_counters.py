@@ -0,0 +1,18 @@
+import time
+from django.core.management.base import BaseCommand
+from api.services.counters import reconcile_counters
+
+class Command(BaseCommand):
+    help = 'Звіряє лічильники статусів поранених з фактичними даними'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0, help='Повторювати кожні N секунд (0 - один раз)')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            fixed = reconcile_counters()
+            self.stdout.write(self.style.SUCCESS(f'Виправлено {fixed} лічильників'))
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,84 @@
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.models import MedicalData
+from api.services.classification import classify, thresholds_for_unit, clear_cache
+from api.services.counters import reconcile_counters
+from api.services.changes import record_changes
+from api.services.versions import bump_version
+
+class Command(BaseCommand):
+    help = 'Перекласифіковує історію медичних даних за поточними порогами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Кількість записів в одному пакеті')
+        parser.add_argument('--skip-derived', action='store_true', help='Не перебудовувати стани, епізоди та лічильники')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        clear_cache()
+        last_id = 0
+        scanned = 0
+        changed = 0
+
+        while True:
+            # Пакети за діапазоном первинного ключа не потребують OFFSET
+            rows = list(
+                MedicalData.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'spo2', 'heart_rate', 'issue_type', 'classification_version', 'device__military_unit_id', 'device_id')[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            scanned += len(rows)
+            changed += self.rescore_chunk(rows)
+            self.stdout.write(f'Оброблено {scanned} записів, змінено {changed}')
+
+        if changed and not options['skip_derived']:
+            self.stdout.write('Перебудова похідних даних...')
+            try:
+                call_command('rebuild_soldier_states', stdout=self.stdout)
+                call_command('rebuild_critical_episodes', stdout=self.stdout)
+                reconcile_counters()
+            finally:
+                # Частково перебудовані дані вже відрізняються від закешованих відповідей
+                bump_version('soldier')
+
+        self.stdout.write(self.style.SUCCESS(f'Перекласифіковано {changed} з {scanned} записів'))
+
+    def rescore_chunk(self, rows):
+        """Класифікує пакет масивами та оновлює лише змінені записи одним UPDATE на групу"""
+        ids, spo2, heart_rate, issue_types, versions, unit_ids, soldier_ids = zip(*rows)
+        ids = np.asarray(ids)
+        spo2 = np.asarray(spo2)
+        heart_rate = np.asarray(heart_rate)
+        issue_types = np.asarray(issue_types)
+        versions = np.asarray(versions, dtype=object)
+        unit_ids = np.asarray(unit_ids, dtype=object)
+        soldier_ids = np.asarray(soldier_ids, dtype=object)
+
+        updates = {}
+        affected = set()
+        for unit_id in set(unit_ids.tolist()):
+            thresholds = thresholds_for_unit(unit_id)
+            mask = unit_ids == unit_id
+            new_types = classify(spo2[mask], heart_rate[mask], thresholds)
+            stale = (new_types != issue_types[mask]) | (versions[mask] != thresholds.version)
+            for issue_type in np.unique(new_types[stale]):
+                key = (str(issue_type), thresholds.version)
+                selected = ids[mask][stale & (new_types == issue_type)]
+                updates.setdefault(key, []).extend(selected.tolist())
+            affected.update(soldier_ids[mask][stale].tolist())
+
+        with transaction.atomic():
+            for (issue_type, version), record_ids in updates.items():
+                MedicalData.objects.filter(id__in=record_ids).update(
+                    issue_type=issue_type,
+                    classification_version=version
+                )
+            # Клієнти дельта-синхронізації та WebSocket отримують перекласифікованих поранених
+            if affected:
+                record_changes('soldier', affected)
+        return sum(len(record_ids) for record_ids in updates.values())
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api.response_cache import response_stats, reset_stats
+
+class Command(BaseCommand):
+    help = 'Статистика кешу відповідей: частка влучань та заощаджений час'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Обнулити статистику після виводу')
+
+    def handle(self, *args, **options):
+        stats = response_stats()
+        self.stdout.write(f"{'endpoint':<20} {'влучань':>8} {'промахів':>9} {'частка':>7} {'побудова, с':>12} {'заощаджено, с':>14}")
+        for name, row in stats.items():
+            self.stdout.write(
+                f"{name:<20} {row['hits']:>8} {row['misses']:>9} {row['hit_ratio']:>7.1%} "
+                f"{row['build_ms'] / 1000:>12.2f} {row['saved_ms'] / 1000:>14.2f}"
+            )
+        if not stats:
+            self.stdout.write('Кеш відповідей ще не використовувався')
+        if options['reset']:
+            reset_stats()
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_remove_userprofile_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CriticalEpisode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(verbose_name='Початок')),
+                ('ended_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершення')),
+                ('last_reading_at', models.DateTimeField(verbose_name='Останній критичний вимір')),
+                ('issue_types', models.CharField(default='', max_length=50, verbose_name='Типи проблем')),
+                ('worst_spo2', models.IntegerField(blank=True, null=True, verbose_name='Найнижчий SpO2')),
+                ('max_heart_rate', models.IntegerField(blank=True, null=True, verbose_name='Найвищий пульс')),
+                ('min_heart_rate', models.IntegerField(blank=True, null=True, verbose_name='Найнижчий пульс')),
+                ('readings_count', models.IntegerField(default=0, verbose_name='Кількість критичних вимірів')),
+                ('soldier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='critical_episodes', to='api.soldier', verbose_name='Поранений')),
+            ],
+            options={
+                'verbose_name': 'Критичний епізод',
+                'verbose_name_plural': 'Критичні епізоди',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['soldier', 'ended_at'], name='episode_soldier_open_idx'), models.Index(fields=['started_at'], name='episode_started_idx')],
+            },
+        ),
+    ]
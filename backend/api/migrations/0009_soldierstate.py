@@ -0,0 +1,33 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_criticalepisode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SoldierState',
+            fields=[
+                ('soldier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='state', serialize=False, to='api.soldier', verbose_name='Поранений')),
+                ('spo2', models.IntegerField(verbose_name='SPO2')),
+                ('heart_rate', models.IntegerField(verbose_name='Пульс')),
+                ('latitude', models.FloatField(verbose_name='Широта')),
+                ('longitude', models.FloatField(verbose_name='Довгота')),
+                ('geohash', models.CharField(db_index=True, max_length=12, verbose_name='Геохеш')),
+                ('issue_type', models.CharField(choices=[('SPO2', 'Критичний SpO2'), ('HR', 'Критичний пульс'), ('BOTH', 'Критичні SpO2 та пульс'), ('SENSOR_ERROR', 'Помилка датчиків'), ('NORMAL', 'Показники в нормі')], default='NORMAL', max_length=20, verbose_name='Тип проблеми')),
+                ('timestamp', models.DateTimeField(verbose_name='Час виміру')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Оновлено')),
+                ('medical_data', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.medicaldata', verbose_name='Останній вимір')),
+            ],
+            options={
+                'verbose_name': 'Поточний стан',
+                'verbose_name_plural': 'Поточні стани',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:21
+
+from django.db import migrations, models
+
+
+def fill_open_keys(apps, schema_editor):
+    """Заповнює ключ для найновішого непрочитаного сповіщення кожного типу"""
+    Alert = apps.get_model('api', 'Alert')
+    seen = set()
+    unread = Alert.objects.filter(is_read=False).order_by('-created_at', '-id').values_list('id', 'soldier_id', 'alert_type')
+    for alert_id, soldier_id, alert_type in unread.iterator():
+        key = f"{soldier_id}:{alert_type}"
+        if key in seen:
+            continue
+        seen.add(key)
+        Alert.objects.filter(id=alert_id).update(open_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_soldierstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='open_key',
+            field=models.CharField(blank=True, editable=False, max_length=150, null=True, verbose_name='Ключ відкритого сповіщення'),
+        ),
+        migrations.RunPython(fill_open_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='alert',
+            name='open_key',
+            field=models.CharField(blank=True, editable=False, max_length=150, null=True, unique=True, verbose_name='Ключ відкритого сповіщення'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['is_read', 'created_at'], name='alert_unread_created_idx'),
+        ),
+    ]
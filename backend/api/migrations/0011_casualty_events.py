@@ -0,0 +1,47 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_alert_open_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CasualtyEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('READING_CLASSIFIED', 'Вимір класифіковано'), ('ALERT_RAISED', 'Створено сповіщення'), ('ALERT_READ', 'Сповіщення прочитано'), ('EVACUATION_STARTED', 'Евакуацію розпочато'), ('EVACUATION_COMPLETED', 'Евакуацію завершено'), ('EVACUATION_CANCELLED', 'Евакуацію скасовано')], max_length=30, verbose_name='Тип події')),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Час події')),
+                ('payload', models.JSONField(default=dict, verbose_name='Дані події')),
+                ('soldier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='api.soldier', verbose_name='Поранений')),
+            ],
+            options={
+                'verbose_name': 'Подія пораненого',
+                'verbose_name_plural': 'Події поранених',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['soldier', 'id'], name='event_soldier_seq_idx'), models.Index(fields=['occurred_at'], name='event_occurred_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CasualtySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.BigIntegerField(verbose_name='Остання застосована подія')),
+                ('occurred_at', models.DateTimeField(verbose_name='Час останньої події')),
+                ('state', models.JSONField(verbose_name='Стан')),
+                ('soldier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='api.soldier', verbose_name='Поранений')),
+            ],
+            options={
+                'verbose_name': 'Знімок стану пораненого',
+                'verbose_name_plural': 'Знімки стану поранених',
+                'ordering': ['-last_event_id'],
+                'indexes': [models.Index(fields=['soldier', 'last_event_id'], name='snapshot_soldier_seq_idx'), models.Index(fields=['soldier', 'occurred_at'], name='snapshot_soldier_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_casualty_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='heart_rate',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Пульс'),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='issue_type',
+            field=models.CharField(blank=True, choices=[('SPO2', 'Критичний SpO2'), ('HR', 'Критичний пульс'), ('BOTH', 'Критичні SpO2 та пульс'), ('SENSOR_ERROR', 'Помилка датчиків'), ('NORMAL', 'Показники в нормі')], max_length=20, null=True, verbose_name='Тип проблеми'),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Широта'),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Довгота'),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='spo2',
+            field=models.IntegerField(blank=True, null=True, verbose_name='SPO2'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['issue_type', 'created_at'], name='alert_issue_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['latitude', 'longitude'], name='alert_location_idx'),
+        ),
+    ]
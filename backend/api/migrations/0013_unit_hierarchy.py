@@ -0,0 +1,80 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def map_soldier_units(apps, schema_editor):
+    """Будує ієрархію з рядків Soldier.unit ('бригада/батальйон/рота') та прив'язує бійців"""
+    Unit = apps.get_model('api', 'Unit')
+    UnitClosure = apps.get_model('api', 'UnitClosure')
+    Soldier = apps.get_model('api', 'Soldier')
+
+    units = {}
+    ancestors = {}
+
+    def resolve(names):
+        key = tuple(names)
+        if key in units:
+            return units[key]
+        parent = resolve(names[:-1]) if len(names) > 1 else None
+        unit = Unit.objects.create(name=names[-1], parent=parent)
+        ancestors[unit.id] = [(unit.id, 0)] + [
+            (ancestor_id, depth + 1) for ancestor_id, depth in (ancestors[parent.id] if parent else [])
+        ]
+        UnitClosure.objects.bulk_create([
+            UnitClosure(ancestor_id=ancestor_id, descendant_id=unit.id, depth=depth)
+            for ancestor_id, depth in ancestors[unit.id]
+        ])
+        units[key] = unit
+        return unit
+
+    for path in Soldier.objects.exclude(unit='').values_list('unit', flat=True).distinct():
+        names = [part.strip() for part in path.split('/') if part.strip()]
+        if names:
+            Soldier.objects.filter(unit=path).update(military_unit=resolve(names))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_alert_typed_details'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Unit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Назва')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='api.unit', verbose_name='Вищий підрозділ')),
+            ],
+            options={
+                'verbose_name': 'Підрозділ',
+                'verbose_name_plural': 'Підрозділи',
+                'ordering': ['name'],
+                'unique_together': {('parent', 'name')},
+            },
+        ),
+        migrations.AddField(
+            model_name='soldier',
+            name='military_unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='soldiers', to='api.unit', verbose_name='Підрозділ в ієрархії'),
+        ),
+        migrations.CreateModel(
+            name='UnitClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.IntegerField(verbose_name='Глибина')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='api.unit', verbose_name='Предок')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='api.unit', verbose_name='Нащадок')),
+            ],
+            options={
+                'verbose_name': "Зв'язок підрозділів",
+                'verbose_name_plural': "Зв'язки підрозділів",
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='unit_closure_desc_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(map_soldier_units, migrations.RunPython.noop),
+    ]
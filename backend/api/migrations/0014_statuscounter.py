@@ -0,0 +1,49 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_status_counters(apps, schema_editor):
+    """Початкове заповнення лічильників з поточних даних"""
+    Soldier = apps.get_model('api', 'Soldier')
+    StatusCounter = apps.get_model('api', 'StatusCounter')
+    rows = Soldier.objects.values_list(
+        'military_unit_id', 'evacuation__status', 'state__issue_type'
+    ).annotate(count=models.Count('pk')).order_by()
+    StatusCounter.objects.bulk_create([
+        StatusCounter(
+            unit_id=unit_id,
+            evacuation_status=evacuation_status or 'NONE',
+            issue_type=issue_type or 'NO_DATA',
+            count=count
+        )
+        for unit_id, evacuation_status, issue_type, count in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_unit_hierarchy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evacuation_status', models.CharField(max_length=20, verbose_name='Статус евакуації')),
+                ('issue_type', models.CharField(max_length=20, verbose_name='Тип проблеми')),
+                ('count', models.IntegerField(default=0, verbose_name='Кількість')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Оновлено')),
+                ('unit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='status_counters', to='api.unit', verbose_name='Підрозділ')),
+            ],
+            options={
+                'verbose_name': 'Лічильник статусів',
+                'verbose_name_plural': 'Лічильники статусів',
+                'unique_together': {('unit', 'evacuation_status', 'issue_type')},
+            },
+        ),
+        migrations.RunPython(fill_status_counters, migrations.RunPython.noop),
+    ]
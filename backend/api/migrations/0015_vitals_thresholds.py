@@ -0,0 +1,38 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_statuscounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicaldata',
+            name='classification_version',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Версія порогів класифікації'),
+        ),
+        migrations.CreateModel(
+            name='VitalsThresholds',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spo2_min', models.IntegerField(default=90, verbose_name='Мінімальний SpO2')),
+                ('heart_rate_min', models.IntegerField(default=40, verbose_name='Мінімальний пульс')),
+                ('heart_rate_max', models.IntegerField(default=120, verbose_name='Максимальний пульс')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Створено')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('unit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='vitals_thresholds', to='api.unit', verbose_name='Підрозділ')),
+            ],
+            options={
+                'verbose_name': 'Пороги показників',
+                'verbose_name_plural': 'Пороги показників',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_vitals_thresholds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Номер зміни')),
+                ('scope', models.CharField(choices=[('soldier', 'Поранений'), ('alert', 'Сповіщення'), ('evacuation', 'Евакуація')], max_length=20, verbose_name='Тип запису')),
+                ('object_id', models.CharField(max_length=100, verbose_name='Ідентифікатор запису')),
+                ('action', models.CharField(choices=[('UPSERT', 'Створено або змінено'), ('DELETE', 'Видалено')], default='UPSERT', max_length=10, verbose_name='Дія')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Час зміни')),
+            ],
+            options={
+                'verbose_name': 'Зміна',
+                'verbose_name_plural': 'Журнал змін',
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['scope', 'seq'], name='changelog_scope_seq_idx'), models.Index(fields=['created_at'], name='changelog_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_changelog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['created_at', 'id'], name='alert_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicaldata',
+            index=models.Index(fields=['timestamp', 'id'], name='medical_time_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicaldata',
+            index=models.Index(fields=['device', 'timestamp', 'id'], name='medical_device_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicaldata',
+            index=models.Index(fields=['issue_type', 'timestamp', 'id'], name='medical_issue_time_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:13
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def merge_duplicate_roots(apps, schema_editor):
+    """Зливає однакові кореневі підрозділи, створені паралельним імпортом, у найстаріший"""
+    Unit = apps.get_model('api', 'Unit')
+    UnitClosure = apps.get_model('api', 'UnitClosure')
+    Soldier = apps.get_model('api', 'Soldier')
+    StatusCounter = apps.get_model('api', 'StatusCounter')
+    VitalsThresholds = apps.get_model('api', 'VitalsThresholds')
+
+    def merge(keeper, duplicate):
+        for child in Unit.objects.filter(parent=duplicate):
+            twin = Unit.objects.filter(parent=keeper, name=child.name).first()
+            if twin is None:
+                Unit.objects.filter(pk=child.pk).update(parent=keeper)
+            else:
+                merge(twin, child)
+        Soldier.objects.filter(military_unit=duplicate).update(military_unit=keeper)
+        VitalsThresholds.objects.filter(unit=duplicate).update(unit=keeper)
+        for counter in StatusCounter.objects.filter(unit=duplicate):
+            merged = StatusCounter.objects.filter(
+                unit=keeper, evacuation_status=counter.evacuation_status, issue_type=counter.issue_type
+            ).update(count=F('count') + counter.count)
+            if merged:
+                counter.delete()
+            else:
+                StatusCounter.objects.filter(pk=counter.pk).update(unit=keeper)
+        UnitClosure.objects.filter(descendant=duplicate).delete()
+        UnitClosure.objects.filter(ancestor=duplicate).delete()
+        Unit.objects.filter(pk=duplicate.pk).delete()
+
+    names = list(
+        Unit.objects.filter(parent__isnull=True).values('name')
+        .annotate(total=Count('id')).filter(total__gt=1).values_list('name', flat=True)
+    )
+    if not names:
+        return
+    for name in names:
+        keeper, *duplicates = Unit.objects.filter(parent__isnull=True, name=name).order_by('id')
+        for duplicate in duplicates:
+            merge(keeper, duplicate)
+
+    # Піддерева змінили вищі підрозділи - замикання перебудовується з батьківських зв'язків
+    parents = dict(Unit.objects.values_list('id', 'parent_id'))
+    links = []
+    for unit_id in parents:
+        ancestor_id, depth = unit_id, 0
+        while ancestor_id is not None:
+            links.append(UnitClosure(ancestor_id=ancestor_id, descendant_id=unit_id, depth=depth))
+            ancestor_id, depth = parents[ancestor_id], depth + 1
+    UnitClosure.objects.all().delete()
+    UnitClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='unit',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='unit',
+            name='parent_key',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Coalesce('parent', 0), output_field=models.BigIntegerField(), verbose_name='Ключ вищого підрозділу'),
+        ),
+        migrations.RunPython(merge_duplicate_roots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='unit',
+            constraint=models.UniqueConstraint(fields=('parent_key', 'name'), name='unit_unique_name_per_parent'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:14
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_counters(apps, schema_editor):
+    """Зводить дублікати клітинок без підрозділу в одну, сумуючи лічильники"""
+    StatusCounter = apps.get_model('api', 'StatusCounter')
+    duplicates = (
+        StatusCounter.objects.filter(unit__isnull=True).values('evacuation_status', 'issue_type')
+        .annotate(total=Count('id'), count_sum=Sum('count')).filter(total__gt=1)
+    )
+    for cell in list(duplicates):
+        keeper, *rest = StatusCounter.objects.filter(
+            unit__isnull=True, evacuation_status=cell['evacuation_status'], issue_type=cell['issue_type']
+        ).order_by('id').values_list('id', flat=True)
+        StatusCounter.objects.filter(id__in=rest).delete()
+        StatusCounter.objects.filter(id=keeper).update(count=cell['count_sum'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_unit_root_unique'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='statuscounter',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='statuscounter',
+            name='unit_key',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Coalesce('unit', 0), output_field=models.BigIntegerField(), verbose_name='Ключ підрозділу'),
+        ),
+        migrations.RunPython(merge_duplicate_counters, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='statuscounter',
+            constraint=models.UniqueConstraint(fields=('unit_key', 'evacuation_status', 'issue_type'), name='status_counter_unique_cell'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:24
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_event_tails(apps, schema_editor):
+    """Початкові лічильники: події кожного пораненого після його останнього знімка"""
+    Soldier = apps.get_model('api', 'Soldier')
+    CasualtyEvent = apps.get_model('api', 'CasualtyEvent')
+    CasualtySnapshot = apps.get_model('api', 'CasualtySnapshot')
+    last_snapshot = CasualtySnapshot.objects.filter(soldier_id=OuterRef('soldier_id')).order_by('-last_event_id').values('last_event_id')[:1]
+    tails = (
+        CasualtyEvent.objects.filter(id__gt=Coalesce(Subquery(last_snapshot), Value(0)))
+        .values('soldier_id').annotate(count=Count('id')).order_by()
+    )
+    for row in tails:
+        Soldier.objects.filter(pk=row['soldier_id']).update(events_since_snapshot=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_statuscounter_unit_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='soldier',
+            name='events_since_snapshot',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подій після знімка'),
+        ),
+        migrations.RunPython(count_event_tails, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,137 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 # Create your models here.
 
+class Unit(models.Model):
+    """Підрозділ в ієрархії (бригада, батальйон, рота...).
+
+    Зв'язки предок-нащадок всіх рівнів зберігаються в UnitClosure, тому вибірка
+    всього піддерева - це один індексний JOIN.
+    """
+    PATH_SEPARATOR = '/'
+
+    name = models.CharField(max_length=200, verbose_name='Назва')
+    parent = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='children', verbose_name='Вищий підрозділ')
+    # parent_id або 0 для кореневих: унікальність (parent, name) не діє на NULL,
+    # тож без цього поля паралельний імпорт міг створити дві однакові бригади
+    parent_key = models.GeneratedField(
+        expression=Coalesce('parent', 0),
+        output_field=models.BigIntegerField(),
+        db_persist=True,
+        verbose_name='Ключ вищого підрозділу'
+    )
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Підрозділ'
+        verbose_name_plural = 'Підрозділи'
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['parent_key', 'name'], name='unit_unique_name_per_parent'),
+        ]
+
+    @classmethod
+    def split_path(cls, path):
+        return [part.strip() for part in (path or '').split(cls.PATH_SEPARATOR) if part.strip()]
+
+    @classmethod
+    def resolve_path(cls, path):
+        """Повертає підрозділ за шляхом 'бригада/батальйон/рота', створюючи відсутні рівні"""
+        unit = None
+        for name in cls.split_path(path):
+            # Паралельне створення впирається в унікальність (parent_key, name),
+            # і get_or_create повертає підрозділ, який встиг створити інший процес
+            unit, _ = cls.objects.get_or_create(parent=unit, name=name)
+        return unit
+
+    def get_path(self):
+        names = self.ancestor_links.order_by('-depth').values_list('ancestor__name', flat=True)
+        return self.PATH_SEPARATOR.join(names)
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        old_parent_id = None
+        if not is_new:
+            old_parent_id = Unit.objects.filter(pk=self.pk).values_list('parent_id', flat=True).first()
+            if self.parent_id is not None and UnitClosure.objects.filter(ancestor=self, descendant_id=self.parent_id).exists():
+                raise ValueError('Підрозділ не може бути підпорядкований власному нащадку')
+        super().save(*args, **kwargs)
+        if is_new:
+            self.link_to_parent()
+        elif old_parent_id != self.parent_id:
+            self.relink_subtree()
+            # Поранені піддерева тепер належать іншим вищим підрозділам
+            from api.services.versions import bump_version
+            bump_version('soldier')
+
+    def link_to_parent(self):
+        """Додає зв'язки нового підрозділу з собою та всіма предками"""
+        links = [UnitClosure(ancestor=self, descendant=self, depth=0)]
+        if self.parent_id is not None:
+            links += [
+                UnitClosure(ancestor_id=ancestor_id, descendant=self, depth=depth + 1)
+                for ancestor_id, depth in UnitClosure.objects.filter(
+                    descendant_id=self.parent_id
+                ).values_list('ancestor_id', 'depth')
+            ]
+        UnitClosure.objects.bulk_create(links)
+
+    def relink_subtree(self):
+        """Перебудовує зв'язки піддерева після зміни вищого підрозділу"""
+        subtree = list(UnitClosure.objects.filter(ancestor=self).values_list('descendant_id', 'depth'))
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        UnitClosure.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if self.parent_id is None:
+            return
+        ancestors = UnitClosure.objects.filter(descendant_id=self.parent_id).values_list('ancestor_id', 'depth')
+        UnitClosure.objects.bulk_create([
+            UnitClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + 1 + depth)
+            for ancestor_id, ancestor_depth in ancestors
+            for descendant_id, depth in subtree
+        ])
+
+class UnitClosure(models.Model):
+    """Таблиця замикання ієрархії підрозділів: усі пари предок-нащадок"""
+    ancestor = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='descendant_links', verbose_name='Предок')
+    descendant = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='ancestor_links', verbose_name='Нащадок')
+    depth = models.IntegerField(verbose_name='Глибина')
+
+    class Meta:
+        verbose_name = 'Зв\'язок підрозділів'
+        verbose_name_plural = 'Зв\'язки підрозділів'
+        unique_together = [('ancestor', 'descendant')]
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor'], name='unit_closure_desc_idx'),
+        ]
+
 class Soldier(models.Model):
     devEui = models.CharField(max_length=100, unique=True, primary_key=True, verbose_name='ID пристрою')
     first_name = models.CharField(max_length=100, verbose_name='Ім\'я')
     last_name = models.CharField(max_length=100, verbose_name='Прізвище')
     unit = models.CharField(max_length=200, verbose_name='Підрозділ')
+    military_unit = models.ForeignKey(Unit, on_delete=models.SET_NULL, null=True, blank=True, related_name='soldiers', verbose_name='Підрозділ в ієрархії')
     last_update = models.DateTimeField(auto_now=True, verbose_name='Останнє оновлення')
     created_at = models.DateTimeField(default=timezone.now, verbose_name='Створено')
+    # Подій журналу після останнього знімка стану (api/services/timeline.py)
+    events_since_snapshot = models.PositiveIntegerField(default=0, editable=False, verbose_name='Подій після знімка')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_unit = instance.__dict__.get('unit')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Прив'язуємо до ієрархії підрозділів, якщо назву підрозділу змінено
+        if self.unit and (self.military_unit_id is None or getattr(self, '_loaded_unit', None) != self.unit):
+            self.military_unit = Unit.resolve_path(self.unit)
+        super().save(*args, **kwargs)
+        self._loaded_unit = self.unit
 
     @property
     def is_evacuated(self):
@@ -66,6 +187,7 @@ class MedicalData(models.Model):
         ('SENSOR_ERROR', 'Помилка датчиків'),
         ('NORMAL', 'Показники в нормі')
     ]
+    CRITICAL_ISSUE_TYPES = ['SPO2', 'HR', 'BOTH']
 
     id = models.AutoField(primary_key=True)
     device = models.ForeignKey(Soldier, on_delete=models.CASCADE, to_field='devEui', verbose_name='Пристрій')
@@ -80,35 +202,107 @@ class MedicalData(models.Model):
         default='NORMAL',
         verbose_name='Тип проблеми'
     )
+    classification_version = models.IntegerField(null=True, blank=True, verbose_name='Версія порогів класифікації')
 
-    def save(self, *args, **kwargs):
-        # Визначення типу проблеми перед збереженням
-        self.issue_type = self.determine_issue_type()
+    def save(self, *args, classify=True, **kwargs):
+        # Визначення типу проблеми перед збереженням (classify=False - тип уже визначив виклик, як record_medical_data)
+        if classify:
+            self.issue_type = self.determine_issue_type()
         super().save(*args, **kwargs)
 
     def determine_issue_type(self):
-        """Визначає тип проблеми на основі показників"""
-        # Перевірка на помилку датчиків
-        if self.spo2 <= 0 or self.heart_rate <= 0:
-            return 'SENSOR_ERROR'
-        
-        # Перевірка критичних показників
-        spo2_critical = self.spo2 < 90
-        hr_critical = self.heart_rate > 120 or self.heart_rate < 40
-
-        if spo2_critical and hr_critical:
-            return 'BOTH'
-        elif spo2_critical:
-            return 'SPO2'
-        elif hr_critical:
-            return 'HR'
-        else:
-            return 'NORMAL'
+        """Визначає тип проблеми за порогами підрозділу пораненого"""
+        from api.services.classification import thresholds_for_unit, classify_reading
+
+        thresholds = thresholds_for_unit(self.device.military_unit_id)
+        self.classification_version = thresholds.version
+        return classify_reading(self.spo2, self.heart_rate, thresholds)
 
     class Meta:
         verbose_name = 'Медичні дані'
         verbose_name_plural = 'Медичні дані'
         ordering = ['-timestamp']
+        # Ключі keyset пагінації (api/pagination.py) з фільтрами списку
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='medical_time_id_idx'),
+            models.Index(fields=['device', 'timestamp', 'id'], name='medical_device_time_idx'),
+            models.Index(fields=['issue_type', 'timestamp', 'id'], name='medical_issue_time_idx'),
+        ]
+
+class SoldierState(models.Model):
+    """Останній стан пораненого: копія найновішого виміру з геохешем позиції.
+
+    Оновлюється під час прийому даних, тому запити за поточним станом і
+    розташуванням не потребують пошуку останнього запису в MedicalData.
+    """
+    soldier = models.OneToOneField(Soldier, on_delete=models.CASCADE, primary_key=True, related_name='state', verbose_name='Поранений')
+    medical_data = models.ForeignKey(MedicalData, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='Останній вимір')
+    spo2 = models.IntegerField(verbose_name='SPO2')
+    heart_rate = models.IntegerField(verbose_name='Пульс')
+    latitude = models.FloatField(verbose_name='Широта')
+    longitude = models.FloatField(verbose_name='Довгота')
+    geohash = models.CharField(max_length=12, db_index=True, verbose_name='Геохеш')
+    issue_type = models.CharField(max_length=20, choices=MedicalData.ISSUE_TYPES, default='NORMAL', verbose_name='Тип проблеми')
+    timestamp = models.DateTimeField(verbose_name='Час виміру')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Оновлено')
+
+    def __str__(self):
+        return f"{self.soldier_id} - {self.issue_type} ({self.geohash})"
+
+    class Meta:
+        verbose_name = 'Поточний стан'
+        verbose_name_plural = 'Поточні стани'
+
+class CriticalEpisode(models.Model):
+    """Безперервний період критичного стану пораненого.
+
+    Епізод відкривається першим критичним виміром і закривається першим
+    нормальним, тому тривалість і історія критичних станів читаються з
+    одного рядка замість перебору всієї історії MedicalData.
+    """
+    soldier = models.ForeignKey(Soldier, on_delete=models.CASCADE, related_name='critical_episodes', verbose_name='Поранений')
+    started_at = models.DateTimeField(verbose_name='Початок')
+    ended_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершення')
+    last_reading_at = models.DateTimeField(verbose_name='Останній критичний вимір')
+    issue_types = models.CharField(max_length=50, default='', verbose_name='Типи проблем')
+    worst_spo2 = models.IntegerField(null=True, blank=True, verbose_name='Найнижчий SpO2')
+    max_heart_rate = models.IntegerField(null=True, blank=True, verbose_name='Найвищий пульс')
+    min_heart_rate = models.IntegerField(null=True, blank=True, verbose_name='Найнижчий пульс')
+    readings_count = models.IntegerField(default=0, verbose_name='Кількість критичних вимірів')
+
+    @property
+    def is_open(self):
+        return self.ended_at is None
+
+    def get_issue_types(self):
+        return [issue for issue in self.issue_types.split(',') if issue]
+
+    def duration_minutes(self, now=None):
+        """Тривалість епізоду в хвилинах (для відкритого - до поточного моменту)"""
+        end = self.ended_at or now or timezone.now()
+        return round((end - self.started_at).total_seconds() / 60, 1)
+
+    def register_reading(self, medical_data):
+        """Оновлює найгірші показники епізоду критичним виміром"""
+        if medical_data.issue_type not in self.get_issue_types():
+            self.issue_types = ','.join(self.get_issue_types() + [medical_data.issue_type])
+        self.worst_spo2 = medical_data.spo2 if self.worst_spo2 is None else min(self.worst_spo2, medical_data.spo2)
+        self.max_heart_rate = medical_data.heart_rate if self.max_heart_rate is None else max(self.max_heart_rate, medical_data.heart_rate)
+        self.min_heart_rate = medical_data.heart_rate if self.min_heart_rate is None else min(self.min_heart_rate, medical_data.heart_rate)
+        self.last_reading_at = max(self.last_reading_at, medical_data.timestamp) if self.last_reading_at else medical_data.timestamp
+        self.readings_count += 1
+
+    def __str__(self):
+        return f"{self.soldier} - {self.started_at.strftime('%Y-%m-%d %H:%M')}"
+
+    class Meta:
+        verbose_name = 'Критичний епізод'
+        verbose_name_plural = 'Критичні епізоди'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['soldier', 'ended_at'], name='episode_soldier_open_idx'),
+            models.Index(fields=['started_at'], name='episode_started_idx'),
+        ]
 
 class Alert(models.Model):
     ALERT_TYPES = [
@@ -120,19 +314,170 @@ class Alert(models.Model):
     soldier = models.ForeignKey(Soldier, on_delete=models.CASCADE, verbose_name='Поранений')
     alert_type = models.CharField(max_length=20, choices=ALERT_TYPES, verbose_name='Тип сповіщення')
     message = models.TextField(verbose_name='Повідомлення')
-    details = models.JSONField(verbose_name='Деталі')  # Для збереження показників, координат тощо
+    details = models.JSONField(verbose_name='Деталі')  # Для збереження додаткових даних
+    latitude = models.FloatField(null=True, blank=True, verbose_name='Широта')
+    longitude = models.FloatField(null=True, blank=True, verbose_name='Довгота')
+    spo2 = models.IntegerField(null=True, blank=True, verbose_name='SPO2')
+    heart_rate = models.IntegerField(null=True, blank=True, verbose_name='Пульс')
+    issue_type = models.CharField(max_length=20, choices=MedicalData.ISSUE_TYPES, null=True, blank=True, verbose_name='Тип проблеми')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Час створення')
     is_read = models.BooleanField(default=False, verbose_name='Прочитано')
     read_at = models.DateTimeField(null=True, blank=True, verbose_name='Час прочитання')
+    # Ключ відкритого сповіщення: заповнений лише поки сповіщення не прочитане,
+    # тому унікальний індекс допускає одне непрочитане сповіщення кожного типу на пораненого
+    open_key = models.CharField(max_length=150, null=True, blank=True, unique=True, editable=False, verbose_name='Ключ відкритого сповіщення')
     
     class Meta:
         verbose_name = 'Сповіщення'
         verbose_name_plural = 'Сповіщення'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_read', 'created_at'], name='alert_unread_created_idx'),
+            models.Index(fields=['issue_type', 'created_at'], name='alert_issue_created_idx'),
+            models.Index(fields=['latitude', 'longitude'], name='alert_location_idx'),
+            models.Index(fields=['created_at', 'id'], name='alert_created_id_idx'),
+        ]
+
+    @staticmethod
+    def build_open_key(soldier_id, alert_type):
+        return f"{soldier_id}:{alert_type}"
+
+    def save(self, *args, **kwargs):
+        if self.is_read:
+            if self.open_key:
+                # Прочитане в будь-якому місці (API, адмінка) сповіщення можна створити знову
+                from api.services.alerts import remember_closed
+                remember_closed([self.open_key])
+            self.open_key = None
+        elif self._state.adding and self.open_key is None:
+            self.open_key = self.build_open_key(self.soldier_id, self.alert_type)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.get_alert_type_display()} - {self.soldier} ({self.created_at.strftime('%Y-%m-%d %H:%M')})"
 
+class CasualtyEvent(models.Model):
+    """Незмінний запис журналу подій пораненого"""
+    EVENT_TYPES = [
+        ('READING_CLASSIFIED', 'Вимір класифіковано'),
+        ('ALERT_RAISED', 'Створено сповіщення'),
+        ('ALERT_READ', 'Сповіщення прочитано'),
+        ('EVACUATION_STARTED', 'Евакуацію розпочато'),
+        ('EVACUATION_COMPLETED', 'Евакуацію завершено'),
+        ('EVACUATION_CANCELLED', 'Евакуацію скасовано'),
+    ]
+
+    soldier = models.ForeignKey(Soldier, on_delete=models.CASCADE, related_name='events', verbose_name='Поранений')
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPES, verbose_name='Тип події')
+    occurred_at = models.DateTimeField(default=timezone.now, verbose_name='Час події')
+    payload = models.JSONField(default=dict, verbose_name='Дані події')
+
+    def __str__(self):
+        return f"{self.get_event_type_display()} - {self.soldier_id} ({self.occurred_at.strftime('%Y-%m-%d %H:%M:%S')})"
+
+    class Meta:
+        verbose_name = 'Подія пораненого'
+        verbose_name_plural = 'Події поранених'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['soldier', 'id'], name='event_soldier_seq_idx'),
+            models.Index(fields=['occurred_at'], name='event_occurred_idx'),
+        ]
+
+class CasualtySnapshot(models.Model):
+    """Стан пораненого після застосування подій до last_event_id включно"""
+    soldier = models.ForeignKey(Soldier, on_delete=models.CASCADE, related_name='snapshots', verbose_name='Поранений')
+    last_event_id = models.BigIntegerField(verbose_name='Остання застосована подія')
+    occurred_at = models.DateTimeField(verbose_name='Час останньої події')
+    state = models.JSONField(verbose_name='Стан')
+
+    class Meta:
+        verbose_name = 'Знімок стану пораненого'
+        verbose_name_plural = 'Знімки стану поранених'
+        ordering = ['-last_event_id']
+        indexes = [
+            models.Index(fields=['soldier', 'last_event_id'], name='snapshot_soldier_seq_idx'),
+            models.Index(fields=['soldier', 'occurred_at'], name='snapshot_soldier_time_idx'),
+        ]
+
+class VitalsThresholds(models.Model):
+    """Версія порогів класифікації показників.
+
+    Пороги не редагуються: кожна зміна - новий запис, номер якого є версією.
+    Діє найновіший запис найближчого підрозділу в ієрархії, інакше - глобальний
+    (без підрозділу).
+    """
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, null=True, blank=True, related_name='vitals_thresholds', verbose_name='Підрозділ')
+    spo2_min = models.IntegerField(default=90, verbose_name='Мінімальний SpO2')
+    heart_rate_min = models.IntegerField(default=40, verbose_name='Мінімальний пульс')
+    heart_rate_max = models.IntegerField(default=120, verbose_name='Максимальний пульс')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Створено')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Автор')
+
+    def __str__(self):
+        return f"v{self.pk}: SpO2 < {self.spo2_min}, пульс поза {self.heart_rate_min}-{self.heart_rate_max}"
+
+    class Meta:
+        verbose_name = 'Пороги показників'
+        verbose_name_plural = 'Пороги показників'
+        ordering = ['-id']
+
+class ChangeLog(models.Model):
+    """Монотонна послідовність змін записів для дельта-синхронізації клієнтів"""
+    SCOPES = [
+        ('soldier', 'Поранений'),
+        ('alert', 'Сповіщення'),
+        ('evacuation', 'Евакуація')
+    ]
+    ACTIONS = [
+        ('UPSERT', 'Створено або змінено'),
+        ('DELETE', 'Видалено')
+    ]
+
+    seq = models.BigAutoField(primary_key=True, verbose_name='Номер зміни')
+    scope = models.CharField(max_length=20, choices=SCOPES, verbose_name='Тип запису')
+    object_id = models.CharField(max_length=100, verbose_name='Ідентифікатор запису')
+    action = models.CharField(max_length=10, choices=ACTIONS, default='UPSERT', verbose_name='Дія')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Час зміни')
+
+    class Meta:
+        verbose_name = 'Зміна'
+        verbose_name_plural = 'Журнал змін'
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['scope', 'seq'], name='changelog_scope_seq_idx'),
+            models.Index(fields=['created_at'], name='changelog_created_idx'),
+        ]
+
+class StatusCounter(models.Model):
+    """Кількість бійців підрозділу з певним статусом евакуації та типом проблеми.
+
+    Змінюється на ±1 при кожному переході стану і періодично звіряється з
+    фактичними даними командою reconcile_status_counters.
+    """
+    NO_EVACUATION = 'NONE'
+    NO_DATA = 'NO_DATA'
+
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, null=True, blank=True, related_name='status_counters', verbose_name='Підрозділ')
+    # unit_id або 0 для бійців без підрозділу - щоб унікальність клітинки діяла і для них
+    unit_key = models.GeneratedField(
+        expression=Coalesce('unit', 0),
+        output_field=models.BigIntegerField(),
+        db_persist=True,
+        verbose_name='Ключ підрозділу'
+    )
+    evacuation_status = models.CharField(max_length=20, verbose_name='Статус евакуації')
+    issue_type = models.CharField(max_length=20, verbose_name='Тип проблеми')
+    count = models.IntegerField(default=0, verbose_name='Кількість')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Оновлено')
+
+    class Meta:
+        verbose_name = 'Лічильник статусів'
+        verbose_name_plural = 'Лічильники статусів'
+        constraints = [
+            models.UniqueConstraint(fields=['unit_key', 'evacuation_status', 'issue_type'], name='status_counter_unique_cell'),
+        ]
+
 class UserProfile(models.Model):
     ROLE_CHOICES = [
         ('ADMIN', 'Адміністратор'),
@@ -0,0 +1,152 @@
+"""Keyset (cursor) пагінація списків.
+
+Сторінка вибирається умовою на ключ сортування (наприклад, timestamp < t
+OR timestamp = t AND id < i) замість OFFSET, тому глибокі сторінки
+коштують стільки ж, скільки перша, за наявності композитного індексу на
+поля сортування. Курсор - непрозорий рядок зі значеннями ключа останнього
+запису сторінки; нові записи не зсувають вже видані сторінки.
+
+Сортування береться з order_by, який задало в'ю (наприклад, sort_by у пошуку
+поранених), з первинним ключем в кінці для однозначності. Сортувати можна
+за власними полями моделі та анотаціями запиту (вони не мають бути NULL);
+без order_by або для сортування за пов'язаними полями діє ordering пагінатора.
+
+Відповідь: {"next": "<url або null>", "page_size": N, "results": [...]}
+Загальної кількості (count) у відповіді немає: COUNT(*) по всій таблиці
+коштує більше за саму сторінку. Пошук поранених додає count сам.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # Останнє поле має бути унікальним, щоб курсор однозначно визначав позицію
+    ordering = ('-id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Недійсний курсор'
+
+    def get_page_size(self, request):
+        default = getattr(settings, 'API_PAGE_SIZE', 100)
+        maximum = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, default))
+        except ValueError:
+            page_size = default
+        return min(max(page_size, 1), maximum)
+
+    def get_ordering(self, queryset):
+        """Сортування в'ю з первинним ключем в кінці; ordering пагінатора, якщо в'ю його не задало"""
+        requested = queryset.query.order_by
+        local_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        local_fields.update(queryset.query.annotations)
+        if not requested or not all(isinstance(name, str) and name.lstrip('-') in local_fields for name in requested):
+            return self.ordering
+        pk_name = queryset.model._meta.pk.name
+        ordering = list(requested)
+        if pk_name not in {name.lstrip('-') for name in ordering}:
+            # Напрямок як у першого поля, щоб база читала композитний індекс в один бік
+            ordering.append(f"-{pk_name}" if ordering[0].startswith('-') else pk_name)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset)
+        fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self.after_position(queryset, fields, self.decode_cursor(encoded)))
+
+        # Один зайвий запис показує, чи існує наступна сторінка
+        page = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_position = [getattr(page[-1], name) for name, _ in fields] if self.has_next else None
+        return page
+
+    def after_position(self, queryset, fields, position):
+        """Умова "після позиції" для кортежу полів сортування"""
+        if len(position) != len(fields):
+            raise NotFound(self.invalid_cursor_message)
+        annotations = queryset.query.annotations
+        try:
+            values = [
+                (annotations[name].output_field if name in annotations else queryset.model._meta.get_field(name)).to_python(value)
+                for (name, _), value in zip(fields, position)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        for index, (name, descending) in enumerate(fields):
+            equal = {fields[prior][0]: values[prior] for prior in range(index)}
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': values[index]})
+
+        # Межа на перше поле дозволяє базі читати індекс діапазоном
+        first_name, first_descending = fields[0]
+        bound = {f"{first_name}__{'lte' if first_descending else 'gte'}": values[0]}
+        return Q(**bound) & condition
+
+    def encode_cursor(self, position):
+        # isoformat зберігає мікросекунди (DjangoJSONEncoder обрізає їх до мілісекунд)
+        position = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        raw = json.dumps(position, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded):
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            position = json.loads(raw)
+        except (ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('page_size', self.page_size),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class TimestampKeysetPagination(KeysetPagination):
+    """Медичні дані: від найновіших вимірів"""
+    ordering = ('-timestamp', '-id')
+
+
+class CreatedAtKeysetPagination(KeysetPagination):
+    """Сповіщення: від найновіших"""
+    ordering = ('-created_at', '-id')
+
+
+class SoldierKeysetPagination(KeysetPagination):
+    ordering = ('devEui',)
@@ -0,0 +1,111 @@
+"""Кеш відповідей дорогих endpoint-ів читання.
+
+Ключ містить версії областей даних (api/services/versions.py), набір прав
+користувача, шлях і параметри запиту (без ?t=). Запис пораненого, сповіщення,
+евакуації чи користувача змінює версію своєї області, тож наступний запит
+будує відповідь заново, а старі записи кешу більше не читаються. TTL
+(RESPONSE_CACHE_TIMEOUT) лише звільняє пам'ять від таких записів.
+
+Статистика влучань і заощадженого часу зберігається в тому ж кеші для
+кожного RESPONSE_STATS_SAMPLE_RATE-го запиту в середньому (значення
+множаться на частоту вибірки, тож суми - оцінка):
+python manage.py response_cache_stats
+"""
+import hashlib
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.conditional import request_params
+from api.services.versions import data_versions, bump_version
+
+KEY_PREFIX = 'response:'
+STATS_PREFIX = 'response_stats:'
+STATS_FIELDS = ('hits', 'misses', 'build_ms', 'saved_ms')
+STATS_INDEX_KEY = STATS_PREFIX + 'endpoints'
+
+
+def permission_key(user):
+    """Відповіді залежать лише від прав, а не від конкретного користувача"""
+    if user.is_superuser:
+        return 'superuser'
+    return ','.join(sorted(user.groups.values_list('name', flat=True)))
+
+
+def response_key(name, request, scopes, per_minute):
+    parts = data_versions(*scopes)
+    parts += [permission_key(request.user), request.path, request_params(request)]
+    if per_minute:
+        parts.append(str(int(timezone.now().timestamp() // 60)))
+    return KEY_PREFIX + name + ':' + hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def cached_response(name, *scopes, per_minute=False):
+    """Декоратор дії: кешує успішну відповідь до зміни даних областей scopes"""
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            started = time.perf_counter()
+            key = response_key(name, request, scopes, per_minute)
+            cached = cache.get(key)
+            if cached is not None:
+                build_ms, data = cached
+                lookup_ms = (time.perf_counter() - started) * 1000
+                record_stats(name, hits=1, saved_ms=max(build_ms - lookup_ms, 0))
+                return Response(data)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                build_ms = (time.perf_counter() - started) * 1000
+                cache.set(key, (build_ms, response.data), timeout=getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 600))
+                record_stats(name, misses=1, build_ms=build_ms)
+            return response
+        return wrapper
+    return decorator
+
+
+def record_stats(name, **values):
+    rate = max(getattr(settings, 'RESPONSE_STATS_SAMPLE_RATE', 10), 1)
+    if random.randrange(rate):
+        return
+    endpoints = cache.get(STATS_INDEX_KEY) or set()
+    if name not in endpoints:
+        cache.set(STATS_INDEX_KEY, endpoints | {name}, timeout=None)
+    for field, value in values.items():
+        key = f'{STATS_PREFIX}{name}:{field}'
+        amount = int(round(value * rate))
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # Лічильника ще немає або його витіснено
+            if not cache.add(key, amount, timeout=None):
+                cache.incr(key, amount)
+
+
+def response_stats():
+    """{endpoint: {hits, misses, hit_ratio, build_ms, saved_ms}}"""
+    stats = {}
+    for name in sorted(cache.get(STATS_INDEX_KEY) or ()):
+        keys = {field: f'{STATS_PREFIX}{name}:{field}' for field in STATS_FIELDS}
+        values = cache.get_many(keys.values())
+        row = {field: values.get(key, 0) for field, key in keys.items()}
+        requests = row['hits'] + row['misses']
+        row['hit_ratio'] = round(row['hits'] / requests, 3) if requests else 0
+        stats[name] = row
+    return stats
+
+
+def reset_stats():
+    names = cache.get(STATS_INDEX_KEY) or ()
+    cache.delete_many([f'{STATS_PREFIX}{name}:{field}' for name in names for field in STATS_FIELDS] + [STATS_INDEX_KEY])
+
+
+def user_changed(sender, **kwargs):
+    """Користувачі, групи чи входи змінились: застаріває аудит безпеки"""
+    bump_version('user')
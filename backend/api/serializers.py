@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Soldier, MedicalData, Alert, Evacuation, UserProfile
+from .models import Soldier, MedicalData, Alert, Evacuation, UserProfile, CriticalEpisode, Unit, SoldierState
 from django.utils import timezone
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.password_validation import validate_password
@@ -37,7 +37,8 @@ class SoldierSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Soldier
-        fields = ['devEui', 'first_name', 'last_name', 'unit', 'is_evacuated', 'last_update', 'created_at']
+        fields = ['devEui', 'first_name', 'last_name', 'unit', 'military_unit', 'is_evacuated', 'last_update', 'created_at']
+        read_only_fields = ['military_unit']
 
 class SoldierDetailSerializer(serializers.ModelSerializer):
     evacuation = EvacuationSerializer(read_only=True)
@@ -48,16 +49,27 @@ class SoldierDetailSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Soldier
-        fields = ['devEui', 'first_name', 'last_name', 'unit', 'evacuation', 'latest_medical_data', 'time_since_last_update', 'priority_info', 'critical_duration', 'last_update', 'created_at']
+        fields = ['devEui', 'first_name', 'last_name', 'unit', 'military_unit', 'evacuation', 'latest_medical_data', 'time_since_last_update', 'priority_info', 'critical_duration', 'last_update', 'created_at']
+    
+    def get_latest(self, obj):
+        """Останній вимір з таблиці поточних станів (без запиту, якщо її завантажено через select_related)"""
+        try:
+            state = obj.state
+        except SoldierState.DoesNotExist:
+            return None
+        return state.medical_data
     
     def get_latest_medical_data(self, obj):
-        latest_data = MedicalData.objects.filter(device=obj).order_by('-timestamp').first()
+        latest_data = self.get_latest(obj)
         if latest_data:
-            return MedicalDataSerializer(latest_data).data
+            # Один вкладений серіалізатор на весь список (many=True), поля будуються один раз
+            if not hasattr(self, '_medical_data_serializer'):
+                self._medical_data_serializer = MedicalDataSerializer()
+            return self._medical_data_serializer.to_representation(latest_data)
         return None
     
     def get_time_since_last_update(self, obj):
-        latest_data = MedicalData.objects.filter(device=obj).order_by('-timestamp').first()
+        latest_data = self.get_latest(obj)
         if not latest_data:
             return "Немає даних"
             
@@ -80,17 +92,41 @@ class SoldierDetailSerializer(serializers.ModelSerializer):
             return 0
     
     def get_critical_duration(self, obj):
-        # Час у критичному стані
-        latest_data = MedicalData.objects.filter(
-            device=obj, 
-            issue_type__in=['SPO2', 'HR', 'BOTH']
-        ).order_by('-timestamp').first()
+        # Час у критичному стані з початку поточного епізоду
+        if hasattr(obj, 'open_episodes'):
+            # Відкриті епізоди попередньо завантажені через prefetch_related
+            episode = obj.open_episodes[0] if obj.open_episodes else None
+        else:
+            episode = CriticalEpisode.objects.filter(
+                soldier=obj,
+                ended_at__isnull=True
+            ).only('started_at').first()
         
-        if not latest_data:
+        if not episode:
             return 0
             
-        time_diff = timezone.now() - latest_data.timestamp
-        return time_diff.seconds // 60  # Повертаємо хвилини
+        time_diff = timezone.now() - episode.started_at
+        return int(time_diff.total_seconds() // 60)  # Повертаємо хвилини
+
+class CriticalEpisodeSerializer(serializers.ModelSerializer):
+    issue_types = serializers.SerializerMethodField()
+    duration_minutes = serializers.SerializerMethodField()
+    is_open = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = CriticalEpisode
+        fields = ['id', 'soldier', 'started_at', 'ended_at', 'is_open', 'duration_minutes', 'last_reading_at', 'issue_types', 'worst_spo2', 'max_heart_rate', 'min_heart_rate', 'readings_count']
+    
+    def get_issue_types(self, obj):
+        return obj.get_issue_types()
+    
+    def get_duration_minutes(self, obj):
+        return obj.duration_minutes()
+
+class UnitSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Unit
+        fields = ['id', 'name', 'parent']
 
 class MedicalHistorySerializer(serializers.ModelSerializer):
     medical_history = serializers.SerializerMethodField()
@@ -109,7 +145,7 @@ class AlertSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Alert
-        fields = ['id', 'soldier', 'soldier_name', 'alert_type', 'alert_type_display', 'message', 'details', 'created_at', 'is_read', 'read_at']
+        fields = ['id', 'soldier', 'soldier_name', 'alert_type', 'alert_type_display', 'message', 'latitude', 'longitude', 'spo2', 'heart_rate', 'issue_type', 'details', 'created_at', 'is_read', 'read_at']
     
     def get_soldier_name(self, obj):
         return f"{obj.soldier.first_name} {obj.soldier.last_name}"
@@ -0,0 +1,152 @@
+"""Створення та закриття сповіщень.
+
+Непрочитане сповіщення кожного типу для пораненого може бути лише одне - це
+гарантує унікальний індекс по Alert.open_key. Створення виконується одним
+INSERT, який пропускає дублікат і повертає ідентифікатор вставленого рядка.
+
+Спільний кеш (CACHES['default']) зберігає стан ключа: 'open' - сповіщення
+відкрите, INSERT не потрібен; 'closed' - сповіщення щойно прочитане в
+будь-якому процесі. Закриття перезаписує стан, а відкриття лише додає його
+(cache.add), тож запізнілий 'open' не приховає нове сповіщення після прочитання.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from api.models import Alert
+from api.services.timeline import record_event, record_events
+from api.services.changes import record_change, record_changes
+
+KEY_PREFIX = 'open_alert:'
+OPEN = 'open'
+CLOSED = 'closed'
+
+
+def _cache_ttl():
+    return getattr(settings, 'OPEN_ALERT_CACHE_SECONDS', 60)
+
+
+def is_known_open(key):
+    return cache.get(KEY_PREFIX + key) == OPEN
+
+
+def remember_open(key, created=False):
+    """Після коміту позначає ключ відкритим; новостворене сповіщення перекриває 'closed'"""
+    if created:
+        transaction.on_commit(lambda: cache.set(KEY_PREFIX + key, OPEN, timeout=_cache_ttl()))
+    else:
+        transaction.on_commit(lambda: cache.add(KEY_PREFIX + key, OPEN, timeout=_cache_ttl()))
+
+
+def remember_closed(keys):
+    """Після коміту позначає ключі закритими для всіх процесів"""
+    keys = [KEY_PREFIX + key for key in keys if key]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, CLOSED), timeout=_cache_ttl()))
+
+
+def insert_open_alert(alert):
+    """Вставляє сповіщення одним INSERT, пропускаючи дублікат open_key.
+
+    Повертає ідентифікатор вставленого рядка або None, якщо відкрите
+    сповіщення вже існує. MySQL: INSERT IGNORE з кількістю вставлених рядків
+    (ON DUPLICATE KEY UPDATE з CLIENT_FOUND_ROWS не відрізняє вставку від
+    дубліката), інші бази: ON CONFLICT DO NOTHING RETURNING.
+    """
+    connection = connections[router.db_for_write(Alert)]
+    quote = connection.ops.quote_name
+    fields = [field for field in Alert._meta.concrete_fields if not field.primary_key]
+    values = [field.get_db_prep_save(field.pre_save(alert, True), connection) for field in fields]
+    table = quote(Alert._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'INSERT IGNORE INTO {table} ({columns}) VALUES ({placeholders})', values)
+            return cursor.lastrowid if cursor.rowcount == 1 else None
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) VALUES ({placeholders}) '
+            f'ON CONFLICT DO NOTHING RETURNING {quote(Alert._meta.pk.column)}',
+            values
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def build_alert_message(soldier, alert_type):
+    if alert_type == 'NEW_CASUALTY':
+        return f'Виявлено нового пораненого: {soldier.first_name} {soldier.last_name}'
+    elif alert_type == 'CRITICAL_STATE':
+        return f'Критичний стан: {soldier.first_name} {soldier.last_name}'
+    elif alert_type == 'CRITICAL_DURATION':
+        return f'Тривалий критичний стан: {soldier.first_name} {soldier.last_name}'
+    return ''
+
+
+def create_alert(soldier, medical_data, alert_type=None, message=None):
+    """Створює сповіщення на основі медичних даних.
+
+    Ідемпотентна операція: якщо непрочитане сповіщення такого типу вже існує,
+    нове не створюється.
+    """
+    if not alert_type:
+        # Якщо тип сповіщення не вказано, визначаємо його на основі даних
+        if medical_data.issue_type in ['SPO2', 'HR', 'BOTH']:
+            alert_type = 'CRITICAL_STATE'
+        else:
+            alert_type = 'NEW_CASUALTY'
+
+    key = Alert.build_open_key(soldier.pk, alert_type)
+    if is_known_open(key):
+        return
+
+    alert = Alert(
+        soldier=soldier,
+        alert_type=alert_type,
+        message=message or build_alert_message(soldier, alert_type),
+        open_key=key,
+        latitude=medical_data.latitude,
+        longitude=medical_data.longitude,
+        spo2=medical_data.spo2,
+        heart_rate=medical_data.heart_rate,
+        issue_type=medical_data.issue_type,
+        details={}
+    )
+    # Унікальний індекс по open_key відкидає дублікат без окремої перевірки
+    alert.pk = insert_open_alert(alert)
+    remember_open(key, created=alert.pk is not None)
+    if alert.pk is not None:
+        record_event(soldier, 'ALERT_RAISED', {'alert_type': alert_type})
+        record_change('alert', alert.pk)
+
+
+def mark_alert_read(alert):
+    """Позначає одне сповіщення прочитаним (Alert.save закриває його ключ у спільному кеші)"""
+    with transaction.atomic():
+        alert.is_read = True
+        alert.read_at = timezone.now()
+        alert.save()
+        record_event(alert.soldier, 'ALERT_READ', {'alert_id': alert.id, 'alert_type': alert.alert_type})
+        record_change('alert', alert.id)
+
+
+def mark_alerts_read(queryset, read_at=None):
+    """Позначає сповіщення прочитаними одним умовним UPDATE, повертає їх ідентифікатори"""
+    read_at = read_at or timezone.now()
+    with transaction.atomic():
+        unread = queryset.filter(is_read=False).select_related(None).order_by().select_for_update()
+        alerts = list(unread.values_list('id', 'soldier_id', 'alert_type', 'open_key'))
+        alert_ids = [alert_id for alert_id, _, _, _ in alerts]
+        Alert.objects.filter(id__in=alert_ids, is_read=False).update(
+            is_read=True,
+            read_at=read_at,
+            open_key=None
+        )
+        record_events([
+            (soldier_id, 'ALERT_READ', {'alert_id': alert_id, 'alert_type': alert_type})
+            for alert_id, soldier_id, alert_type, _ in alerts
+        ])
+        record_changes('alert', alert_ids)
+        remember_closed([open_key for _, _, _, open_key in alerts])
+    return alert_ids
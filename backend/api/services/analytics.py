@@ -0,0 +1,189 @@
+"""Аналітика за період, обчислена в базі.
+
+Кожна секція - один агрегуючий запит з умовними COUNT (Count(filter=Q(...))),
+географічні кластери групуються в базі за округленими координатами, тож жоден
+вимір не завантажується в Python. Секції, що читають одну таблицю (критичні
+стани та робота системи), мають спільний запит.
+"""
+from datetime import timedelta
+
+from django.db.models import Avg, Count, DateTimeField, DurationField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from api.models import Soldier, MedicalData, Alert, CriticalEpisode
+from api.services.units import subtree_q
+
+PERIODS = {
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+}
+
+
+def minutes(duration):
+    return round(duration.total_seconds() / 60 if duration else 0, 2)
+
+
+def unit_q(unit_id, soldier_field=None):
+    return Q() if unit_id is None else subtree_q(unit_id, soldier_field)
+
+
+def build_analytics(time_period='24h', unit_id=None):
+    """Всі секції аналітики; невідомий період трактується як 24h"""
+    now = timezone.now()
+    start_time = now - PERIODS.get(time_period, PERIODS['24h'])
+
+    soldier_stats = soldier_aggregates(start_time, unit_id)
+    reading_stats = reading_aggregates(start_time, unit_id)
+    return {
+        'evacuation_statistics': evacuation_statistics(soldier_stats),
+        'response_time_statistics': response_time_statistics(start_time, unit_id),
+        'geographical_statistics': geographical_statistics(start_time, unit_id),
+        'critical_state_statistics': critical_state_statistics(reading_stats, start_time, unit_id, now),
+        'system_performance': system_performance(reading_stats, soldier_stats),
+        'time_period': time_period,
+        'generated_at': now
+    }
+
+
+def soldier_aggregates(start_time, unit_id):
+    """Поранені за період та завершені евакуації одним запитом"""
+    duration = ExpressionWrapper(
+        F('evacuation__evacuation_time') - F('evacuation__evacuation_started'),
+        output_field=DurationField()
+    )
+    evacuated = Q(evacuation__status='EVACUATED', evacuation__evacuation_time__gte=start_time)
+    timed = evacuated & Q(evacuation__evacuation_started__isnull=False)
+    return Soldier.objects.filter(unit_q(unit_id)).annotate(evacuation_duration=duration).aggregate(
+        created=Count('pk', filter=Q(created_at__gte=start_time)),
+        evacuated=Count('pk', filter=evacuated),
+        average_duration=Avg('evacuation_duration', filter=timed),
+        under_30min=Count('pk', filter=timed & Q(evacuation_duration__lte=timedelta(minutes=30))),
+        between_30_60min=Count('pk', filter=timed & Q(
+            evacuation_duration__gt=timedelta(minutes=30),
+            evacuation_duration__lte=timedelta(minutes=60)
+        )),
+        over_60min=Count('pk', filter=timed & Q(evacuation_duration__gt=timedelta(minutes=60)))
+    )
+
+
+def reading_aggregates(start_time, unit_id):
+    """Виміри за період за типами проблем та активні датчики одним запитом"""
+    return MedicalData.objects.filter(unit_q(unit_id, 'device'), timestamp__gte=start_time).aggregate(
+        total=Count('id'),
+        spo2=Count('id', filter=Q(issue_type='SPO2')),
+        heart_rate=Count('id', filter=Q(issue_type='HR')),
+        both=Count('id', filter=Q(issue_type='BOTH')),
+        sensor_errors=Count('id', filter=Q(issue_type='SENSOR_ERROR')),
+        active_sensors=Count('device', distinct=True)
+    )
+
+
+def evacuation_statistics(soldier_stats):
+    return {
+        'total_evacuated': soldier_stats['evacuated'],
+        'average_evacuation_time_minutes': minutes(soldier_stats['average_duration']),
+        'evacuation_success_rate': round(soldier_stats['evacuated'] / max(soldier_stats['created'], 1) * 100, 2),
+        'evacuation_time_distribution': {
+            'under_30min': soldier_stats['under_30min'],
+            '30_60min': soldier_stats['between_30_60min'],
+            'over_60min': soldier_stats['over_60min']
+        }
+    }
+
+
+def response_time_statistics(start_time, unit_id):
+    """Час реагування на сповіщення: весь розподіл одним запитом"""
+    response_time = ExpressionWrapper(F('read_at') - F('created_at'), output_field=DurationField())
+    stats = Alert.objects.filter(unit_q(unit_id, 'soldier'), created_at__gte=start_time).annotate(
+        response_time=response_time
+    ).aggregate(
+        total_alerts=Count('id'),
+        unread_alerts=Count('id', filter=Q(is_read=False)),
+        average_response_time=Avg('response_time', filter=Q(is_read=True, read_at__isnull=False)),
+        under_5min=Count('id', filter=Q(is_read=True, response_time__lte=timedelta(minutes=5))),
+        between_5_15min=Count('id', filter=Q(
+            is_read=True,
+            response_time__gt=timedelta(minutes=5),
+            response_time__lte=timedelta(minutes=15)
+        )),
+        over_15min=Count('id', filter=Q(is_read=True, response_time__gt=timedelta(minutes=15)))
+    )
+    return {
+        'total_alerts': stats['total_alerts'],
+        'average_response_time_minutes': minutes(stats['average_response_time']),
+        'response_time_distribution': {
+            'under_5min': stats['under_5min'],
+            '5_15min': stats['between_5_15min'],
+            'over_15min': stats['over_15min']
+        },
+        'unread_alerts': stats['unread_alerts']
+    }
+
+
+def geographical_statistics(start_time, unit_id):
+    """Кластери вимірів з округленням координат до 0.01 градуса, згруповані в базі"""
+    clusters = list(
+        MedicalData.objects.filter(unit_q(unit_id, 'device'), timestamp__gte=start_time)
+        .annotate(lat=Round('latitude', 2), lng=Round('longitude', 2))
+        .values('lat', 'lng')
+        .annotate(
+            count=Count('id'),
+            critical_cases=Count('id', filter=Q(issue_type__in=MedicalData.CRITICAL_ISSUE_TYPES))
+        )
+        .order_by()
+    )
+    return {
+        'location_clusters': [
+            {
+                'count': cluster['count'],
+                'critical_cases': cluster['critical_cases'],
+                'coordinates': {'lat': float(cluster['lat']), 'lng': float(cluster['lng'])}
+            }
+            for cluster in clusters
+        ],
+        'total_locations': len(clusters),
+        'highest_concentration': max((cluster['count'] for cluster in clusters), default=0)
+    }
+
+
+def critical_state_statistics(reading_stats, start_time, unit_id, now):
+    critical = reading_stats['spo2'] + reading_stats['heart_rate'] + reading_stats['both']
+    return {
+        'total_critical_cases': critical,
+        'critical_rate': round(critical / max(reading_stats['total'], 1) * 100, 2),
+        'issue_distribution': {
+            'spo2': reading_stats['spo2'],
+            'heart_rate': reading_stats['heart_rate'],
+            'both': reading_stats['both'],
+            'sensor_errors': reading_stats['sensor_errors']
+        },
+        'average_critical_duration_minutes': average_critical_duration(start_time, unit_id, now)
+    }
+
+
+def average_critical_duration(start_time, unit_id, now):
+    """Середня тривалість епізодів, активних протягом періоду (відкриті - до поточного моменту)"""
+    duration = ExpressionWrapper(
+        Coalesce('ended_at', Value(now, output_field=DateTimeField())) - F('started_at'),
+        output_field=DurationField()
+    )
+    average = CriticalEpisode.objects.filter(
+        Q(ended_at__isnull=True) | Q(ended_at__gte=start_time),
+        unit_q(unit_id, 'soldier')
+    ).annotate(duration=duration).aggregate(average=Avg('duration'))['average']
+    return minutes(average)
+
+
+def system_performance(reading_stats, soldier_stats):
+    total_soldiers = soldier_stats['created']
+    total_records = reading_stats['total']
+    return {
+        'total_soldiers_monitored': total_soldiers,
+        'total_medical_records': total_records,
+        'records_per_soldier': round(total_records / max(total_soldiers, 1), 2),
+        'active_sensors': reading_stats['active_sensors'],
+        'sensor_reliability': round((1 - reading_stats['sensor_errors'] / max(total_records, 1)) * 100, 2),
+        'system_coverage': round(reading_stats['active_sensors'] / max(total_soldiers, 1) * 100, 2)
+    }
@@ -0,0 +1,95 @@
+"""Журнал змін для дельта-синхронізації.
+
+Кожна зміна пораненого, сповіщення чи евакуації додає рядок до ChangeLog.
+Клієнт передає останній отриманий номер зміни (курсор) і отримує лише записи,
+змінені після нього, та ідентифікатори видалених. Кожен запис журналу також
+змінює версію області для ETag (api/services/versions.py).
+
+Номер seq видається при INSERT, а видимим рядок стає при COMMIT, тож зміна з
+меншим номером може з'явитись у журналі пізніше за зміну з більшим. Тому
+курсор, який видається клієнтам, - не максимальний seq, а межа, нижче якої
+пропусків у нумерації вже немає (див. current_cursor).
+"""
+from django.conf import settings
+from django.db.models import Count, F, Max, Min, Window
+from django.db.models.functions import Lead
+from django.utils import timezone
+
+from api.models import ChangeLog
+from api.services.versions import bump_version
+
+
+def record_change(scope, object_id, action='UPSERT'):
+    ChangeLog.objects.create(scope=scope, object_id=str(object_id), action=action)
+    bump_version(scope)
+
+
+def record_changes(scope, object_ids, action='UPSERT'):
+    """Фіксує зміну набору записів одним INSERT"""
+    now = timezone.now()
+    ChangeLog.objects.bulk_create([
+        ChangeLog(scope=scope, object_id=str(object_id), action=action, created_at=now)
+        for object_id in object_ids
+    ], batch_size=1000)
+    bump_version(scope)
+
+
+def commit_lag_seconds():
+    return getattr(settings, 'CHANGE_LOG_COMMIT_LAG_SECONDS', 30)
+
+
+def current_cursor():
+    """Найбільший seq, до якого включно всі зміни журналу вже видимі.
+
+    Серед змін останніх CHANGE_LOG_COMMIT_LAG_SECONDS секунд курсор зупиняється
+    перед першим пропуском у нумерації: пропущений номер може належати ще не
+    завершеній транзакції. Старіші пропуски вважаються відкоченими транзакціями.
+    Все рахується в базі: без пропусків - один агрегат по діапазону ключа,
+    з пропусками - LEAD по тому ж діапазону, який повертає один рядок.
+    """
+    horizon = timezone.now() - timezone.timedelta(seconds=commit_lag_seconds())
+    settled = (
+        ChangeLog.objects.filter(created_at__lt=horizon)
+        .order_by('-created_at', '-seq').values_list('seq', flat=True).first()
+    )
+    recent = ChangeLog.objects.all() if settled is None else ChangeLog.objects.filter(seq__gt=settled)
+    totals = recent.aggregate(count=Count('seq'), first=Min('seq'), last=Max('seq'))
+    if not totals['count']:
+        return settled or 0
+    start = totals['first'] - 1 if settled is None else settled
+    if totals['last'] - start == totals['count']:
+        return totals['last']
+
+    # Перший seq, за яким немає наступного номера
+    boundary = (
+        ChangeLog.objects.filter(seq__gte=start)
+        .annotate(next_seq=Window(Lead('seq', default=0), order_by=F('seq').asc()))
+        .annotate(step=F('next_seq') - F('seq'))
+        .exclude(step=1)
+        .order_by('seq').values_list('seq', flat=True).first()
+    )
+    return boundary or 0
+
+
+def cursor_expired(since):
+    """Чи видалено з журналу зміни, новіші за курсор"""
+    oldest = ChangeLog.objects.aggregate(seq=Min('seq'))['seq']
+    return oldest is not None and since + 1 < oldest
+
+
+def changes_since(scope, since, until):
+    """Остання дія для кожного запису, зміненого в проміжку (since, until]"""
+    latest = {}
+    rows = ChangeLog.objects.filter(scope=scope, seq__gt=since, seq__lte=until).order_by('seq')
+    for object_id, action in rows.values_list('object_id', 'action').iterator():
+        latest[object_id] = action
+    return latest
+
+
+def prune_changes(older_than=None):
+    """Видаляє старі зміни, завжди залишаючи останню, щоб курсори можна було перевірити"""
+    if older_than is None:
+        older_than = timezone.now() - timezone.timedelta(hours=getattr(settings, 'CHANGE_LOG_RETENTION_HOURS', 24))
+    newest = current_cursor()
+    deleted, _ = ChangeLog.objects.filter(created_at__lt=older_than, seq__lt=newest).delete()
+    return deleted
@@ -0,0 +1,101 @@
+"""Класифікація показників пораненого за версійованими порогами.
+
+Активні пороги кешуються в пам'яті процесу на VITALS_THRESHOLDS_CACHE_SECONDS
+секунд. Для одиночного виміру використовується classify_reading, для масивів
+(пакетна обробка, перекласифікація історії) - векторний classify з тими самими
+правилами.
+"""
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+
+from api.models import VitalsThresholds, UnitClosure
+
+Thresholds = namedtuple('Thresholds', ['version', 'spo2_min', 'heart_rate_min', 'heart_rate_max'])
+
+# Пороги до появи першої версії в базі (версія None)
+DEFAULT_THRESHOLDS = Thresholds(None, 90, 40, 120)
+
+_cache = {'loaded_at': None, 'by_unit': {}, 'resolved': {}}
+_cache_lock = threading.Lock()
+
+
+def _cache_ttl():
+    return getattr(settings, 'VITALS_THRESHOLDS_CACHE_SECONDS', 60)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache['loaded_at'] = None
+        _cache['by_unit'] = {}
+        _cache['resolved'] = {}
+
+
+def _load():
+    """Завантажує найновішу версію порогів для кожного підрозділу"""
+    by_unit = {}
+    for row in VitalsThresholds.objects.order_by('id').values_list(
+        'id', 'unit_id', 'spo2_min', 'heart_rate_min', 'heart_rate_max'
+    ):
+        by_unit[row[1]] = Thresholds(row[0], *row[2:])
+    _cache['by_unit'] = by_unit
+    _cache['resolved'] = {}
+    _cache['loaded_at'] = time.monotonic()
+
+
+def thresholds_for_unit(unit_id):
+    """Пороги найближчого підрозділу в ієрархії або глобальні"""
+    with _cache_lock:
+        loaded_at = _cache['loaded_at']
+        if loaded_at is None or time.monotonic() - loaded_at > _cache_ttl():
+            _load()
+        resolved = _cache['resolved']
+        if unit_id in resolved:
+            return resolved[unit_id]
+
+        by_unit = _cache['by_unit']
+        thresholds = by_unit.get(None, DEFAULT_THRESHOLDS)
+        if unit_id is not None and len(by_unit) > (1 if None in by_unit else 0):
+            ancestors = UnitClosure.objects.filter(descendant_id=unit_id).order_by('depth').values_list('ancestor_id', flat=True)
+            for ancestor_id in ancestors:
+                if ancestor_id in by_unit:
+                    thresholds = by_unit[ancestor_id]
+                    break
+        resolved[unit_id] = thresholds
+        return thresholds
+
+
+def classify_reading(spo2, heart_rate, thresholds=DEFAULT_THRESHOLDS):
+    """Тип проблеми для одного виміру"""
+    # Перевірка на помилку датчиків
+    if spo2 <= 0 or heart_rate <= 0:
+        return 'SENSOR_ERROR'
+
+    # Перевірка критичних показників
+    spo2_critical = spo2 < thresholds.spo2_min
+    hr_critical = heart_rate > thresholds.heart_rate_max or heart_rate < thresholds.heart_rate_min
+
+    if spo2_critical and hr_critical:
+        return 'BOTH'
+    elif spo2_critical:
+        return 'SPO2'
+    elif hr_critical:
+        return 'HR'
+    return 'NORMAL'
+
+
+def classify(spo2, heart_rate, thresholds=DEFAULT_THRESHOLDS):
+    """Векторна класифікація: масиви SpO2 та пульсу -> масив типів проблем"""
+    spo2 = np.asarray(spo2)
+    heart_rate = np.asarray(heart_rate)
+    sensor_error = (spo2 <= 0) | (heart_rate <= 0)
+    spo2_critical = spo2 < thresholds.spo2_min
+    hr_critical = (heart_rate > thresholds.heart_rate_max) | (heart_rate < thresholds.heart_rate_min)
+    return np.select(
+        [sensor_error, spo2_critical & hr_critical, spo2_critical, hr_critical],
+        ['SENSOR_ERROR', 'BOTH', 'SPO2', 'HR'],
+        default='NORMAL'
+    )
@@ -0,0 +1,175 @@
+"""Кластеризація поточних позицій поранених для карти.
+
+Позиції проєктуються у web-mercator і групуються сіткою в піксельних
+координатах карти: комірка має CLUSTER_CELL_PIXELS пікселів на кожному
+масштабі. Піраміда будується знизу вгору - рівень z отримується з рівня z+1
+зсувом індексів комірок на один біт, тож кожен рівень агрегує вже згруповані
+кластери, а не всі точки. Для кожного кластера зберігаються кількість,
+центроїд і найгірший тип проблеми.
+
+Піраміда кешується в пам'яті процесу для кожного фільтра підрозділу і
+перебудовується лише після зміни версій даних 'soldier' / 'evacuation'.
+Запит за bbox - векторна маска по комірках одного рівня.
+"""
+import math
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from api.models import SoldierState
+from api.services.units import subtree_q
+from api.services.versions import data_versions
+
+# Ранг тяжкості: кластер показує найгірший тип проблеми серед своїх поранених
+SEVERITY = ('NORMAL', 'SENSOR_ERROR', 'HR', 'SPO2', 'BOTH')
+SEVERITY_RANK = {issue_type: rank for rank, issue_type in enumerate(SEVERITY)}
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.05112878
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def max_zoom():
+    return getattr(settings, 'CLUSTER_MAX_ZOOM', 16)
+
+
+def cell_bits():
+    """log2 розміру комірки в пікселях (розмір округлюється до степеня двійки)"""
+    return max(int(math.log2(getattr(settings, 'CLUSTER_CELL_PIXELS', 64))), 0)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def project(latitudes, longitudes, zoom):
+    """Цілі піксельні координати web-mercator на масштабі zoom"""
+    scale = TILE_SIZE * 2.0 ** zoom
+    latitudes = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))
+    x = (longitudes + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(latitudes) + 1.0 / np.cos(latitudes)) / np.pi) / 2.0 * scale
+    return (
+        np.clip(x, 0, scale - 1).astype(np.int64),
+        np.clip(y, 0, scale - 1).astype(np.int64)
+    )
+
+
+def load_positions(unit_id=None):
+    """Поточні позиції поранених, які ще не евакуйовані"""
+    queryset = SoldierState.objects.exclude(soldier__evacuation__status='EVACUATED')
+    if unit_id is not None:
+        queryset = queryset.filter(subtree_q(unit_id, 'soldier'))
+    rows = list(queryset.values_list('soldier_id', 'latitude', 'longitude', 'issue_type'))
+    soldier_ids = np.array([row[0] for row in rows], dtype=object)
+    latitudes = np.array([row[1] for row in rows], dtype=np.float64)
+    longitudes = np.array([row[2] for row in rows], dtype=np.float64)
+    severity = np.array([SEVERITY_RANK.get(row[3], 0) for row in rows], dtype=np.int8)
+    return soldier_ids, latitudes, longitudes, severity
+
+
+def aggregate(cell_x, cell_y, count, latitude_sum, longitude_sum, severity, member):
+    """Об'єднує записи з однаковою коміркою (cell_x, cell_y)"""
+    keys = (cell_x << 32) | cell_y
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    size = len(unique_keys)
+    worst = np.zeros(size, dtype=np.int8)
+    np.maximum.at(worst, inverse, severity)
+    # Представник кластера: для одиночного кластера це і є його поранений
+    representative = np.empty(size, dtype=np.int64)
+    representative[inverse] = member
+    return {
+        'cell_x': unique_keys >> 32,
+        'cell_y': unique_keys & 0xFFFFFFFF,
+        'count': np.bincount(inverse, weights=count, minlength=size).astype(np.int64),
+        'latitude_sum': np.bincount(inverse, weights=latitude_sum, minlength=size),
+        'longitude_sum': np.bincount(inverse, weights=longitude_sum, minlength=size),
+        'severity': worst,
+        'member': representative
+    }
+
+
+def build_pyramid(soldier_ids, latitudes, longitudes, severity):
+    """Рівні кластерів від max_zoom() до 0"""
+    top = max_zoom()
+    levels = [None] * (top + 1)
+    if not len(soldier_ids):
+        return {'soldier_ids': soldier_ids, 'levels': levels}
+
+    bits = cell_bits()
+    pixel_x, pixel_y = project(latitudes, longitudes, top)
+    level = aggregate(
+        pixel_x >> bits, pixel_y >> bits,
+        np.ones(len(soldier_ids)), latitudes, longitudes, severity,
+        np.arange(len(soldier_ids), dtype=np.int64)
+    )
+    levels[top] = level
+    for zoom in range(top - 1, -1, -1):
+        level = aggregate(
+            level['cell_x'] >> 1, level['cell_y'] >> 1,
+            level['count'], level['latitude_sum'], level['longitude_sum'],
+            level['severity'], level['member']
+        )
+        levels[zoom] = level
+
+    for level in levels:
+        level['latitude'] = level.pop('latitude_sum') / level['count']
+        level['longitude'] = level.pop('longitude_sum') / level['count']
+    return {'soldier_ids': soldier_ids, 'levels': levels}
+
+
+def get_pyramid(unit_id=None):
+    """Піраміда з кешу, якщо з моменту побудови дані не змінювались"""
+    versions = data_versions('soldier', 'evacuation')
+    cached = _cache.get(unit_id)
+    if cached is not None and cached[0] == versions:
+        return cached[1]
+    with _cache_lock:
+        cached = _cache.get(unit_id)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+        pyramid = build_pyramid(*load_positions(unit_id))
+        _cache[unit_id] = (versions, pyramid)
+        return pyramid
+
+
+def visible_clusters(pyramid, zoom, bbox):
+    """Кластери рівня zoom, комірки яких перетинають bbox.
+
+    bbox = (min_lat, min_lon, max_lat, max_lon); min_lon > max_lon означає
+    область, що перетинає 180-й меридіан. Фільтр за коміркою, а не за
+    центроїдом, не губить кластери біля краю екрана на дрібних масштабах.
+    """
+    zoom = min(max(zoom, 0), max_zoom())
+    level = pyramid['levels'][zoom]
+    if level is None:
+        return []
+
+    min_lat, min_lon, max_lat, max_lon = bbox
+    # Межі bbox у комірках рівня: y росте на південь, тож верхня межа - з max_lat
+    shift = max_zoom() - zoom + cell_bits()
+    (left, right), (top, bottom) = [
+        cells >> shift
+        for cells in project(np.array([max_lat, min_lat]), np.array([min_lon, max_lon]), max_zoom())
+    ]
+    mask = (level['cell_y'] >= top) & (level['cell_y'] <= bottom)
+    if min_lon <= max_lon:
+        mask &= (level['cell_x'] >= left) & (level['cell_x'] <= right)
+    else:
+        mask &= (level['cell_x'] >= left) | (level['cell_x'] <= right)
+
+    indices = np.flatnonzero(mask)
+    soldier_ids = pyramid['soldier_ids']
+    return [
+        {
+            'latitude': float(level['latitude'][index]),
+            'longitude': float(level['longitude'][index]),
+            'count': int(level['count'][index]),
+            'worst_issue_type': SEVERITY[level['severity'][index]],
+            'soldier_id': soldier_ids[level['member'][index]] if level['count'][index] == 1 else None
+        }
+        for index in indices
+    ]
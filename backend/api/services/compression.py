@@ -0,0 +1,52 @@
+"""Стиснення потоку вимірів з мертвою зоною (deadband).
+
+Стабільний поранений щоциклу надсилає майже однакові SpO2, пульс та координати.
+Вимір зберігається лише коли показник виходить за межі мертвої зони відносно
+останнього збереженого, позиція зміщується більше ніж на VITALS_DEADBAND_METERS,
+змінюється тип проблеми або минає VITALS_MAX_INTERVAL_SECONDS. Зміна типу
+проблеми зберігається завжди, тому критичні переходи не втрачаються.
+
+Останній збережений вимір кожного пораненого тримається в пам'яті процесу;
+після перезапуску перший вимір кожного пораненого зберігається.
+"""
+import threading
+from django.conf import settings
+
+from api.services.spatial import haversine_km
+
+_last_stored = {}
+_last_stored_lock = threading.Lock()
+
+
+def compression_enabled():
+    return getattr(settings, 'VITALS_COMPRESSION_ENABLED', False)
+
+
+def should_store(soldier_id, spo2, heart_rate, latitude, longitude, issue_type, timestamp):
+    """Чи потрібно зберігати вимір з огляду на останній збережений"""
+    last = _last_stored.get(soldier_id)
+    if last is None or issue_type != last['issue_type'] or timestamp < last['timestamp']:
+        return True
+    if (timestamp - last['timestamp']).total_seconds() >= getattr(settings, 'VITALS_MAX_INTERVAL_SECONDS', 300):
+        return True
+    if abs(spo2 - last['spo2']) > getattr(settings, 'VITALS_DEADBAND_SPO2', 1):
+        return True
+    if abs(heart_rate - last['heart_rate']) > getattr(settings, 'VITALS_DEADBAND_HEART_RATE', 3):
+        return True
+    distance_m = float(haversine_km(last['latitude'], last['longitude'], latitude, longitude)) * 1000
+    return distance_m > getattr(settings, 'VITALS_DEADBAND_METERS', 10)
+
+
+def remember_stored(medical_data):
+    with _last_stored_lock:
+        last = _last_stored.get(medical_data.device_id)
+        if last is None or medical_data.timestamp >= last['timestamp']:
+            _last_stored[medical_data.device_id] = {
+                'spo2': medical_data.spo2,
+                'heart_rate': medical_data.heart_rate,
+                'latitude': medical_data.latitude,
+                'longitude': medical_data.longitude,
+                'issue_type': medical_data.issue_type,
+                'timestamp': medical_data.timestamp,
+            }
+
@@ -0,0 +1,148 @@
+"""Лічильники бійців за підрозділом, статусом евакуації та типом проблеми.
+
+Кожен перехід стану (новий вимір, дія евакуації, зміна підрозділу) переносить
+бійця з однієї клітинки матриці в іншу: -1 для старої та +1 для нової.
+Розбіжності через зміни в обхід сервісів (адмінка, ручні правки) виправляє
+reconcile_counters.
+"""
+import logging
+from collections import Counter, namedtuple
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from api.models import Soldier, StatusCounter
+
+logger = logging.getLogger(__name__)
+
+Bucket = namedtuple('Bucket', ['unit_id', 'evacuation_status', 'issue_type'])
+
+
+def make_bucket(unit_id, evacuation_status, issue_type):
+    return Bucket(
+        unit_id,
+        evacuation_status or StatusCounter.NO_EVACUATION,
+        issue_type or StatusCounter.NO_DATA
+    )
+
+
+def current_bucket(soldier_id):
+    """Клітинка матриці, в якій зараз знаходиться боєць (None, якщо бійця немає)"""
+    row = Soldier.objects.filter(pk=soldier_id).values_list(
+        'military_unit_id', 'evacuation__status', 'state__issue_type'
+    ).first()
+    return make_bucket(*row) if row else None
+
+
+def adjust(bucket, delta):
+    """Змінює лічильник клітинки на delta, створюючи її за потреби"""
+    counters = StatusCounter.objects.filter(
+        unit_id=bucket.unit_id,
+        evacuation_status=bucket.evacuation_status,
+        issue_type=bucket.issue_type
+    )
+    if counters.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            StatusCounter.objects.create(
+                unit_id=bucket.unit_id,
+                evacuation_status=bucket.evacuation_status,
+                issue_type=bucket.issue_type,
+                count=delta
+            )
+    except IntegrityError:
+        # Клітинку щойно створив інший процес
+        counters.update(count=F('count') + delta)
+
+
+def record_transition(soldier_id, **previous):
+    """Переносить бійця в нову клітинку після зміни його стану.
+
+    Викликається після збереження змін; previous містить старі значення
+    змінених полів: unit_id, evacuation_status та/або issue_type.
+    """
+    new = current_bucket(soldier_id)
+    if new is None:
+        return
+    old = make_bucket(**dict(new._asdict(), **previous))
+    if old != new:
+        adjust(old, -1)
+        adjust(new, 1)
+
+
+def record_moves(moves):
+    """Переносить групу бійців: moves - пари (стара клітинка, нова клітинка).
+
+    Зміни підсумовуються, тож масова дія оновлює кожну клітинку один раз.
+    """
+    deltas = Counter()
+    for old, new in moves:
+        if old != new:
+            deltas[old] -= 1
+            deltas[new] += 1
+    for bucket, delta in deltas.items():
+        if delta:
+            adjust(bucket, delta)
+
+
+def soldier_added(soldier_id):
+    bucket = current_bucket(soldier_id)
+    if bucket is not None:
+        adjust(bucket, 1)
+
+
+def soldier_removed(soldier_id):
+    """Викликається перед видаленням бійця"""
+    bucket = current_bucket(soldier_id)
+    if bucket is not None:
+        adjust(bucket, -1)
+
+
+def status_matrix(queryset=None):
+    """Всі ненульові клітинки матриці одним запитом"""
+    queryset = StatusCounter.objects.all() if queryset is None else queryset
+    return list(
+        queryset.filter(count__gt=0)
+        .order_by('unit__name', 'evacuation_status', 'issue_type')
+        .values('unit_id', 'unit__name', 'evacuation_status', 'issue_type', 'count')
+    )
+
+
+def reconcile_counters():
+    """Звіряє лічильники з фактичними даними, повертає кількість виправлених клітинок"""
+    with transaction.atomic():
+        actual = {
+            make_bucket(unit_id, evacuation_status, issue_type): count
+            for unit_id, evacuation_status, issue_type, count in Soldier.objects.values_list(
+                'military_unit_id', 'evacuation__status', 'state__issue_type'
+            ).annotate(count=Count('pk')).order_by()
+        }
+        stored = {
+            make_bucket(unit_id, evacuation_status, issue_type): (counter_id, count)
+            for counter_id, unit_id, evacuation_status, issue_type, count in
+            StatusCounter.objects.select_for_update().values_list(
+                'id', 'unit_id', 'evacuation_status', 'issue_type', 'count'
+            )
+        }
+
+        fixed = 0
+        for bucket, (counter_id, count) in stored.items():
+            expected = actual.get(bucket, 0)
+            if count != expected:
+                StatusCounter.objects.filter(id=counter_id).update(count=expected)
+                fixed += 1
+        missing = [bucket for bucket in actual if bucket not in stored]
+        StatusCounter.objects.bulk_create([
+            StatusCounter(
+                unit_id=bucket.unit_id,
+                evacuation_status=bucket.evacuation_status,
+                issue_type=bucket.issue_type,
+                count=actual[bucket]
+            )
+            for bucket in missing
+        ])
+        fixed += len(missing)
+
+    if fixed:
+        logger.warning(f"Reconciled {fixed} status counters")
+    return fixed
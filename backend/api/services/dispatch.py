@@ -0,0 +1,306 @@
+"""Планування евакуації: які команди забирають яких поранених і в якому порядку.
+
+Кожна команда виїжджає зі своєї позиції і забирає не більше capacity
+поранених. Мета - мінімізувати сумарний зважений час очікування
+Σ urgency * ETA; поранений без команди коштує urgency *
+DISPATCH_UNASSIGNED_PENALTY_MINUTES. Терміновість зростає з тяжкістю стану,
+тривалістю критичного епізоду та ручним пріоритетом евакуації.
+
+Алгоритм: жадібна вставка (найтерміновіші першими, у найдешевшу позицію
+будь-якого маршруту), далі локальний пошук у межах бюджету часу -
+переміщення пораненого в найкращу позицію будь-якого маршруту та заміна
+призначеного пораненого непризначеним (вигідніше розташованим або
+терміновішим). Маршрути зберігаються як матриці
+однакової ширини, тож вартість вставки пораненого в усі позиції всіх
+маршрутів рахується однією векторною операцією.
+
+Попередній план зберігається в спільному кеші; наступний розрахунок для
+того ж набору команд починається з нього (прибираються вже не актуальні
+поранені, додаються нові), тож зміна показників лише уточнює план.
+"""
+import hashlib
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from api.models import MedicalData, SoldierState
+from api.services.clustering import SEVERITY_RANK
+from api.services.spatial import haversine_km
+from api.services.units import subtree_q
+
+PLAN_CACHE_SECONDS = 3600
+IMPROVEMENT_EPSILON = 1e-6
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def load_casualties(unit_id=None):
+    """Поранені, які чекають на евакуацію, з терміновістю.
+
+    Враховуються статус NEEDED, а також поранені без запису евакуації з
+    критичним станом (їм евакуацію ще не призначили вручну).
+    """
+    queryset = SoldierState.objects.filter(
+        Q(soldier__evacuation__status='NEEDED')
+        | Q(soldier__evacuation__isnull=True, issue_type__in=MedicalData.CRITICAL_ISSUE_TYPES)
+    )
+    if unit_id is not None:
+        queryset = queryset.filter(subtree_q(unit_id, 'soldier'))
+    rows = queryset.values(
+        'soldier_id', 'latitude', 'longitude', 'issue_type', 'soldier__evacuation__priority'
+    ).annotate(
+        critical_since=Min(
+            'soldier__critical_episodes__started_at',
+            filter=Q(soldier__critical_episodes__ended_at__isnull=True)
+        )
+    ).order_by('soldier_id')
+
+    now = timezone.now()
+    casualties = []
+    for row in rows:
+        critical_minutes = (now - row['critical_since']).total_seconds() / 60 if row['critical_since'] else 0
+        urgency = (
+            1 + SEVERITY_RANK.get(row['issue_type'], 0)
+            + critical_minutes / setting('DISPATCH_CRITICAL_MINUTES_PER_POINT', 30)
+            + max(row['soldier__evacuation__priority'] or 0, 0)
+        )
+        casualties.append({
+            'soldier_id': row['soldier_id'],
+            'latitude': row['latitude'],
+            'longitude': row['longitude'],
+            'issue_type': row['issue_type'],
+            'critical_minutes': round(critical_minutes, 1),
+            'urgency': round(urgency, 2)
+        })
+    return casualties
+
+
+class Planner:
+    """Стан маршрутів та операції вставки/видалення.
+
+    Вузли: команди 0..T-1, поранені T..T+C-1 та фіктивний вузол D = T+C,
+    яким доповнюються маршрути. Рядок route_nodes[r] = [команда, зупинки...,
+    D, D, ...] шириною max(capacity) + 2.
+    """
+
+    def __init__(self, teams, casualties):
+        self.teams = teams
+        self.casualties = casualties
+        team_count, casualty_count = len(teams), len(casualties)
+        self.offset = team_count
+        self.dummy = team_count + casualty_count
+
+        latitudes = np.array([team['latitude'] for team in teams] + [casualty['latitude'] for casualty in casualties] + [0.0])
+        longitudes = np.array([team['longitude'] for team in teams] + [casualty['longitude'] for casualty in casualties] + [0.0])
+        speed = setting('DISPATCH_TEAM_SPEED_KMH', 20) / 60
+        distances = np.vstack([haversine_km(latitude, longitude, latitudes, longitudes) for latitude, longitude in zip(latitudes, longitudes)])
+        # Час переїзду a -> b у хвилинах плюс час завантаження в точці a, якщо це поранений
+        self.edges = distances / speed
+        self.edges[self.offset:self.dummy] += setting('DISPATCH_PICKUP_MINUTES', 5)
+        self.edges[self.dummy, :] = 0
+        self.edges[:, self.dummy] = 0
+        self.distances = distances
+
+        self.weights = np.zeros(self.dummy + 1)
+        self.weights[self.offset:self.dummy] = [casualty['urgency'] for casualty in casualties]
+        self.penalty = setting('DISPATCH_UNASSIGNED_PENALTY_MINUTES', 240)
+
+        # Команда не забере більше поранених, ніж їх є: ширина матриць не залежить від завеликої capacity
+        self.capacity = np.minimum([team['capacity'] for team in teams], casualty_count)
+        self.width = int(self.capacity.max()) + 2
+        self.stops = [[] for _ in teams]
+        self.route_nodes = np.full((team_count, self.width), self.dummy, dtype=np.int64)
+        self.route_nodes[:, 0] = np.arange(team_count)
+        self.arrival = np.zeros((team_count, self.width))
+        self.suffix_weight = np.zeros((team_count, self.width))
+        self.route_cost = np.zeros(team_count)
+        self.assigned = {}
+
+    def refresh(self, route):
+        """Перераховує рядки маршруту після зміни його зупинок"""
+        nodes = self.route_nodes[route]
+        nodes[1:] = self.dummy
+        nodes[1:len(self.stops[route]) + 1] = self.stops[route]
+        arrival = np.zeros(self.width)
+        arrival[1:] = np.cumsum(self.edges[nodes[:-1], nodes[1:]])
+        self.arrival[route] = arrival
+        weights = self.weights[nodes]
+        # Сума ваг зупинок після позиції p (для вставки після вузла p)
+        self.suffix_weight[route] = np.concatenate([np.cumsum(weights[::-1])[::-1][1:], [0.0]])
+        self.route_cost[route] = float(weights @ arrival)
+        for position, node in enumerate(self.stops[route]):
+            self.assigned[node] = (route, position)
+
+    def insertion_costs(self, node):
+        """Матриця приросту вартості від вставки node після позиції p маршруту r (inf - неможливо)"""
+        previous = self.route_nodes[:, :-1]
+        following = self.route_nodes[:, 1:]
+        to_node = self.edges[previous, node]
+        detour = to_node + self.edges[node, following] - self.edges[previous, following]
+        costs = self.weights[node] * (self.arrival[:, :-1] + to_node) + detour * self.suffix_weight[:, :-1]
+        lengths = np.array([len(stops) for stops in self.stops])
+        positions = np.arange(self.width - 1)
+        feasible = (positions[None, :] <= lengths[:, None]) & (lengths < self.capacity)[:, None]
+        return np.where(feasible, costs, np.inf)
+
+    def best_insertion(self, node):
+        costs = self.insertion_costs(node)
+        route, position = np.unravel_index(int(np.argmin(costs)), costs.shape)
+        return costs[route, position], int(route), int(position)
+
+    def insert(self, node, route, position):
+        self.stops[route].insert(position, node)
+        self.refresh(route)
+
+    def remove(self, node):
+        route, position = self.assigned.pop(node)
+        del self.stops[route][position]
+        self.refresh(route)
+        return route, position
+
+    def unassigned_cost(self, node):
+        return self.weights[node] * self.penalty
+
+    def greedy(self, nodes):
+        for node in sorted(nodes, key=lambda node: -self.weights[node]):
+            cost, route, position = self.best_insertion(node)
+            if cost < self.unassigned_cost(node):
+                self.insert(node, route, position)
+
+    def relocate(self, node):
+        """Переносить призначеного пораненого в найкращу позицію; True, якщо план покращився"""
+        before = self.route_cost.sum()
+        route, position = self.remove(node)
+        saving = before - self.route_cost.sum()
+        cost, best_route, best_position = self.best_insertion(node)
+        if cost < saving - IMPROVEMENT_EPSILON and (best_route, best_position) != (route, position):
+            self.insert(node, best_route, best_position)
+            return True
+        self.insert(node, route, position)
+        return False
+
+    def exchange(self, node):
+        """Ставить непризначеного пораненого на місце призначеного, якщо це зменшує вартість плану"""
+        previous = self.route_nodes[:, :-2]
+        current = self.route_nodes[:, 1:-1]
+        following = self.route_nodes[:, 2:]
+        shift = (
+            self.edges[previous, node] + self.edges[node, following]
+            - self.edges[previous, current] - self.edges[current, following]
+        )
+        route_delta = (
+            self.weights[node] * (self.arrival[:, :-2] + self.edges[previous, node])
+            - self.weights[current] * self.arrival[:, 1:-1]
+            + shift * self.suffix_weight[:, 1:-1]
+        )
+        gain = self.penalty * (self.weights[node] - self.weights[current]) - route_delta
+        valid = current != self.dummy
+        gain = np.where(valid, gain, -np.inf)
+        route, position = np.unravel_index(int(np.argmax(gain)), gain.shape)
+        if gain[route, position] <= IMPROVEMENT_EPSILON:
+            return False
+        self.assigned.pop(int(current[route, position]))
+        self.stops[route][position] = node
+        self.refresh(int(route))
+        return True
+
+    def local_search(self, deadline):
+        iterations = 0
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for node in sorted(set(range(self.offset, self.dummy)) - set(self.assigned), key=lambda node: -self.weights[node]):
+                if time.perf_counter() >= deadline:
+                    break
+                improved |= self.exchange(node)
+                iterations += 1
+            for node in list(self.assigned):
+                if time.perf_counter() >= deadline:
+                    break
+                improved |= self.relocate(node)
+                iterations += 1
+        return iterations
+
+    def objective(self):
+        unassigned = set(range(self.offset, self.dummy)) - set(self.assigned)
+        return float(self.route_cost.sum() + sum(self.unassigned_cost(node) for node in unassigned))
+
+
+def plan_cache_key(teams, unit_id):
+    team_ids = ','.join(sorted(team['id'] for team in teams))
+    return 'dispatch_plan:' + hashlib.sha1(f'{unit_id}|{team_ids}'.encode()).hexdigest()[:20]
+
+
+def optimize(teams, unit_id=None, time_budget_ms=None, warm_start=True):
+    """План евакуації для команд [{id, latitude, longitude, capacity}]"""
+    started = time.perf_counter()
+    budget = min(time_budget_ms or setting('DISPATCH_TIME_BUDGET_MS', 500), setting('DISPATCH_MAX_TIME_BUDGET_MS', 5000))
+    deadline = started + budget / 1000
+
+    casualties = load_casualties(unit_id)
+    result = {
+        'generated_at': timezone.now(),
+        'teams': [],
+        'unassigned': [],
+        'stats': {'casualties': len(casualties), 'warm_start': False}
+    }
+    if not casualties:
+        result['teams'] = [{'team_id': team['id'], 'capacity': team['capacity'], 'load': 0, 'route_km': 0.0, 'stops': []} for team in teams]
+        result['objective'] = 0.0
+        result['stats'].update(iterations=0, elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+        return result
+
+    planner = Planner(teams, casualties)
+    nodes = {casualty['soldier_id']: planner.offset + position for position, casualty in enumerate(casualties)}
+    cache_key = plan_cache_key(teams, unit_id)
+
+    # Попередній план: порядок зупинок зберігається для поранених, які досі чекають
+    previous = cache.get(cache_key) if warm_start else None
+    if previous:
+        for route, team in enumerate(teams):
+            for soldier_id in previous.get(team['id'], []):
+                node = nodes.get(soldier_id)
+                if node is not None and node not in planner.assigned and len(planner.stops[route]) < team['capacity']:
+                    planner.stops[route].append(node)
+                    planner.assigned[node] = None
+            planner.refresh(route)
+        result['stats']['warm_start'] = True
+
+    planner.greedy([node for node in nodes.values() if node not in planner.assigned])
+    iterations = planner.local_search(deadline)
+    cache.set(cache_key, {
+        team['id']: [casualties[node - planner.offset]['soldier_id'] for node in planner.stops[route]]
+        for route, team in enumerate(teams)
+    }, PLAN_CACHE_SECONDS)
+
+    for route, team in enumerate(teams):
+        stops = []
+        nodes_in_route = [route] + planner.stops[route]
+        for order, node in enumerate(planner.stops[route], start=1):
+            casualty = casualties[node - planner.offset]
+            stops.append(dict(
+                casualty,
+                order=order,
+                eta_minutes=round(float(planner.arrival[route, order]), 1)
+            ))
+        route_km = sum(planner.distances[a, b] for a, b in zip(nodes_in_route, nodes_in_route[1:]))
+        result['teams'].append({
+            'team_id': team['id'],
+            'capacity': team['capacity'],
+            'load': len(stops),
+            'route_km': round(float(route_km), 2),
+            'stops': stops
+        })
+    result['unassigned'] = [
+        casualty for casualty, node in zip(casualties, nodes.values()) if node not in planner.assigned
+    ]
+    result['unassigned'].sort(key=lambda casualty: -casualty['urgency'])
+    result['objective'] = round(planner.objective(), 1)
+    result['stats'].update(iterations=iterations, elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+    return result
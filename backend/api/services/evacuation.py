@@ -0,0 +1,137 @@
+"""Переходи статусів евакуації.
+
+В'юсети перевіряють, чи дозволений перехід, а ці функції виконують його,
+фіксують подію в журналі пораненого та оновлюють лічильники статусів.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Evacuation
+from api.services.changes import record_change, record_changes
+from api.services.counters import record_transition, record_moves, make_bucket
+from api.services.timeline import record_event, record_events
+
+
+def start_evacuation(evacuation, evacuation_team=None):
+    """Переводить евакуацію в статус IN_PROGRESS"""
+    previous_status = evacuation.status
+    with transaction.atomic():
+        evacuation.status = 'IN_PROGRESS'
+        evacuation.evacuation_started = timezone.now()
+        if evacuation_team is not None:
+            evacuation.evacuation_team = evacuation_team
+        evacuation.save()
+        record_transition(evacuation.soldier_id, evacuation_status=previous_status)
+        record_change('evacuation', evacuation.pk)
+        record_change('soldier', evacuation.soldier_id)
+        record_event(evacuation.soldier, 'EVACUATION_STARTED', {
+            'evacuation_started': evacuation.evacuation_started.isoformat(),
+            'evacuation_team': evacuation.evacuation_team
+        })
+    return evacuation
+
+
+def complete_evacuation(evacuation):
+    """Переводить евакуацію в статус EVACUATED"""
+    previous_status = evacuation.status
+    with transaction.atomic():
+        evacuation.status = 'EVACUATED'
+        evacuation.evacuation_time = timezone.now()
+        evacuation.save()
+        record_transition(evacuation.soldier_id, evacuation_status=previous_status)
+        record_change('evacuation', evacuation.pk)
+        record_change('soldier', evacuation.soldier_id)
+        record_event(evacuation.soldier, 'EVACUATION_COMPLETED', {
+            'evacuation_time': evacuation.evacuation_time.isoformat()
+        })
+    return evacuation
+
+
+def cancel_evacuation(evacuation):
+    """Повертає евакуацію в статус NEEDED"""
+    previous_status = evacuation.status
+    with transaction.atomic():
+        evacuation.status = 'NEEDED'
+        evacuation.evacuation_started = None
+        evacuation.save()
+        record_transition(evacuation.soldier_id, evacuation_status=previous_status)
+        record_change('evacuation', evacuation.pk)
+        record_change('soldier', evacuation.soldier_id)
+        record_event(evacuation.soldier, 'EVACUATION_CANCELLED', {})
+    return evacuation
+
+
+# Масові переходи: дозволені попередні статуси, новий статус, подія журналу
+BULK_TRANSITIONS = {
+    'start': (('NOT_NEEDED', 'NEEDED'), 'IN_PROGRESS', 'EVACUATION_STARTED'),
+    'complete': (('IN_PROGRESS',), 'EVACUATED', 'EVACUATION_COMPLETED'),
+    'cancel': (('IN_PROGRESS',), 'NEEDED', 'EVACUATION_CANCELLED'),
+}
+
+
+def bulk_transition(soldiers, operation, evacuation_team=None):
+    """Виконує перехід для набору поранених одним умовним UPDATE.
+
+    soldiers - queryset поранених. Поранені в недозволеному для переходу
+    статусі пропускаються. Повертає ідентифікатори змінених поранених.
+    """
+    from_statuses, to_status, event_type = BULK_TRANSITIONS[operation]
+    now = timezone.now()
+    # update() не заповнює auto_now полів
+    fields = {'status': to_status, 'last_update': now}
+    if operation == 'start':
+        fields['evacuation_started'] = now
+        if evacuation_team is not None:
+            fields['evacuation_team'] = evacuation_team
+    elif operation == 'complete':
+        fields['evacuation_time'] = now
+    else:
+        fields['evacuation_started'] = None
+
+    with transaction.atomic():
+        created = set()
+        if operation == 'start':
+            # Поранені без запису евакуації отримують його, як і при одиночному старті
+            missing = list(soldiers.filter(evacuation__isnull=True).values_list('pk', flat=True))
+            Evacuation.objects.bulk_create(
+                [Evacuation(soldier_id=soldier_id, status='NEEDED') for soldier_id in missing],
+                batch_size=1000,
+                ignore_conflicts=True
+            )
+            created = set(missing)
+
+        # MySQL не має UPDATE ... RETURNING: рядки блокуються і читаються перед оновленням
+        rows = list(
+            Evacuation.objects.select_for_update()
+            .filter(soldier__in=soldiers.values('pk'), status__in=from_statuses)
+            .values_list('id', 'soldier_id', 'status', 'evacuation_team', 'soldier__military_unit_id', 'soldier__state__issue_type')
+        )
+        if not rows:
+            return []
+        evacuation_ids = [row[0] for row in rows]
+        Evacuation.objects.filter(id__in=evacuation_ids, status__in=from_statuses).update(**fields)
+
+        soldier_ids = [row[1] for row in rows]
+        record_moves(
+            (
+                make_bucket(unit_id, None if soldier_id in created else previous_status, issue_type),
+                make_bucket(unit_id, to_status, issue_type)
+            )
+            for _, soldier_id, previous_status, _, unit_id, issue_type in rows
+        )
+        record_changes('evacuation', evacuation_ids)
+        record_changes('soldier', soldier_ids)
+        record_events([
+            (soldier_id, event_type, event_payload(operation, now, fields.get('evacuation_team', team)))
+            for _, soldier_id, _, team, _, _ in rows
+        ])
+    return soldier_ids
+
+
+def event_payload(operation, now, evacuation_team):
+    """Дані події журналу, як у відповідних одиночних переходах"""
+    if operation == 'start':
+        return {'evacuation_started': now.isoformat(), 'evacuation_team': evacuation_team}
+    if operation == 'complete':
+        return {'evacuation_time': now.isoformat()}
+    return {}
@@ -0,0 +1,78 @@
+"""Потокове вивантаження медичних даних (CSV / NDJSON, за потреби gzip).
+
+Записи читаються пакетами за ключем (timestamp, id) з індексу
+medical_time_id_idx: кожен пакет - окремий запит з LIMIT, тож пам'ять не
+залежить від розміру вивантаження. Драйвери MySQL не підтримують потокові
+курсори і .iterator() завантажив би весь результат у пам'ять клієнта.
+"""
+import csv
+import io
+import json
+import zlib
+
+from django.db.models import Q
+
+EXPORT_FIELDS = (
+    'id', 'device_id', 'device__first_name', 'device__last_name', 'device__unit',
+    'timestamp', 'spo2', 'heart_rate', 'latitude', 'longitude', 'issue_type'
+)
+EXPORT_HEADER = (
+    'id', 'soldier_id', 'first_name', 'last_name', 'unit',
+    'timestamp', 'spo2', 'heart_rate', 'latitude', 'longitude', 'issue_type'
+)
+TIMESTAMP_INDEX = EXPORT_FIELDS.index('timestamp')
+
+
+def export_batches(queryset, chunk_size=5000):
+    """Пакети рядків values_list у порядку (timestamp, id)"""
+    queryset = queryset.order_by('timestamp', 'id').values_list(*EXPORT_FIELDS)
+    position = None
+    while True:
+        batch = queryset
+        if position is not None:
+            timestamp, record_id = position
+            batch = batch.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=record_id), timestamp__gte=timestamp)
+        rows = list(batch[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        position = (rows[-1][TIMESTAMP_INDEX], rows[-1][0])
+
+
+def csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    for rows in batches:
+        writer.writerows(
+            row[:TIMESTAMP_INDEX] + (row[TIMESTAMP_INDEX].isoformat(),) + row[TIMESTAMP_INDEX + 1:]
+            for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Порожнє вивантаження: лише заголовок
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(batches):
+    for rows in batches:
+        lines = []
+        for row in rows:
+            record = dict(zip(EXPORT_HEADER, row))
+            record['timestamp'] = record['timestamp'].isoformat()
+            lines.append(json.dumps(record, ensure_ascii=False))
+        yield '\n'.join(lines) + '\n'
+
+
+def gzip_chunks(chunks):
+    """Стискає потік на льоту у формат gzip"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,129 @@
+import logging
+from django.db import transaction
+from api.models import MedicalData, CriticalEpisode, SoldierState
+from api.services.spatial import encode_geohash
+from api.services.alerts import create_alert
+from api.services.timeline import record_event
+from api.services.counters import record_transition
+from api.services.changes import record_change
+from api.services import compression
+
+logger = logging.getLogger(__name__)
+
+# Тривалість критичного епізоду, після якої створюється сповіщення CRITICAL_DURATION
+CRITICAL_DURATION_ALERT_SECONDS = 900
+
+
+def record_medical_data(soldier, spo2, heart_rate, latitude, longitude, timestamp):
+    """Зберігає вимір пристрою та оновлює похідні дані пораненого.
+
+    Єдина точка входу для нових вимірів: MQTT клієнт та інші джерела
+    даних повинні створювати MedicalData лише через цю функцію.
+    Якщо увімкнене стиснення і вимір не відрізняється від попереднього
+    збереженого, рядок MedicalData не створюється і повертається None, але
+    поточний стан, критичний епізод і сповіщення оновлюються як для
+    збереженого виміру.
+    """
+    medical_data = MedicalData(
+        device=soldier,
+        spo2=spo2,
+        heart_rate=heart_rate,
+        latitude=latitude,
+        longitude=longitude,
+        timestamp=timestamp
+    )
+    medical_data.issue_type = medical_data.determine_issue_type()
+    compress = compression.compression_enabled()
+    store = not compress or compression.should_store(
+        soldier.pk, spo2, heart_rate, latitude, longitude, medical_data.issue_type, timestamp
+    )
+
+    with transaction.atomic():
+        if store:
+            medical_data.save(classify=False)
+        update_soldier_state(soldier, medical_data)
+        episode = update_critical_episode(soldier, medical_data)
+        if store:
+            # Журнал подій ведеться за збереженими вимірами; відкинуті лежать у мертвій зоні останнього з них
+            record_event(soldier, 'READING_CLASSIFIED', {
+                'medical_data_id': medical_data.id,
+                'issue_type': medical_data.issue_type,
+                'spo2': medical_data.spo2,
+                'heart_rate': medical_data.heart_rate,
+                'latitude': medical_data.latitude,
+                'longitude': medical_data.longitude,
+                'reading_at': medical_data.timestamp.isoformat()
+            })
+        raise_alerts(soldier, medical_data, episode)
+    if not store:
+        return None
+    if compress:
+        compression.remember_stored(medical_data)
+    return medical_data
+
+
+def raise_alerts(soldier, medical_data, episode):
+    """Створює сповіщення про критичний стан та його тривалість"""
+    if medical_data.issue_type not in MedicalData.CRITICAL_ISSUE_TYPES:
+        return
+    create_alert(soldier, medical_data, 'CRITICAL_STATE')
+    duration = medical_data.timestamp - episode.started_at
+    if duration.total_seconds() > CRITICAL_DURATION_ALERT_SECONDS:
+        create_alert(soldier, medical_data, 'CRITICAL_DURATION')
+
+
+def update_soldier_state(soldier, medical_data):
+    """Оновлює останній стан пораненого, якщо вимір новіший за збережений"""
+    state = SoldierState.objects.select_for_update().filter(soldier=soldier).first()
+    previous_issue_type = None
+    if state is None:
+        state = SoldierState(soldier=soldier)
+    elif state.timestamp > medical_data.timestamp:
+        # Запізнілий вимір не змінює поточний стан
+        return state
+    else:
+        previous_issue_type = state.issue_type
+
+    if medical_data.pk is not None:
+        # Для відкинутого стисненням виміру посилання лишається на останній збережений
+        state.medical_data = medical_data
+    state.spo2 = medical_data.spo2
+    state.heart_rate = medical_data.heart_rate
+    state.latitude = medical_data.latitude
+    state.longitude = medical_data.longitude
+    state.geohash = encode_geohash(medical_data.latitude, medical_data.longitude)
+    state.issue_type = medical_data.issue_type
+    state.timestamp = medical_data.timestamp
+    state.save()
+    record_change('soldier', soldier.pk)
+    if previous_issue_type != state.issue_type:
+        record_transition(soldier.pk, issue_type=previous_issue_type)
+    return state
+
+
+def update_critical_episode(soldier, medical_data):
+    """Відкриває, продовжує або закриває критичний епізод пораненого.
+
+    Помилка датчиків не закриває епізод: відсутність показників не
+    означає, що стан пораненого покращився.
+    """
+    episode = CriticalEpisode.objects.select_for_update().filter(
+        soldier=soldier,
+        ended_at__isnull=True
+    ).first()
+
+    if medical_data.issue_type in MedicalData.CRITICAL_ISSUE_TYPES:
+        if episode is None:
+            episode = CriticalEpisode(
+                soldier=soldier,
+                started_at=medical_data.timestamp,
+                last_reading_at=medical_data.timestamp
+            )
+            logger.info(f"Opened critical episode for {soldier.devEui}")
+        episode.register_reading(medical_data)
+        episode.save()
+    elif medical_data.issue_type == 'NORMAL' and episode is not None:
+        episode.ended_at = max(medical_data.timestamp, episode.last_reading_at)
+        episode.save(update_fields=['ended_at'])
+        logger.info(f"Closed critical episode for {soldier.devEui}")
+    return episode
@@ -0,0 +1,119 @@
+"""Історія медичних показників пораненого.
+
+Статистика рахується одним агрегуючим запитом, а для графіка повертається
+ряд, проріджений алгоритмом LTTB (Largest-Triangle-Three-Buckets): з кожного
+інтервалу лишається точка, що найбільше впливає на форму кривої, тож
+багатоденна історія малюється кількома сотнями точок без втрати піків.
+Самі записи віддаються сторінками (keyset пагінація у в'ю).
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Min, Q
+from django.utils import timezone
+
+from api.models import MedicalData
+
+
+def history_queryset(soldier_id, days=None):
+    """Виміри пораненого, за потреби лише за останні days днів"""
+    queryset = MedicalData.objects.filter(device_id=soldier_id)
+    if days is not None:
+        queryset = queryset.filter(timestamp__gte=timezone.now() - timedelta(days=days))
+    return queryset
+
+
+def statistics(queryset):
+    """Мінімум/середнє/максимум показників та кількість критичних записів (порожній словник без записів)"""
+    valid_spo2 = Q(spo2__gt=0)
+    valid_heart_rate = Q(heart_rate__gt=0)
+    stats = queryset.aggregate(
+        records_count=Count('id'),
+        first_record_date=Min('timestamp'),
+        last_record_date=Max('timestamp'),
+        avg_spo2=Avg('spo2', filter=valid_spo2),
+        min_spo2=Min('spo2', filter=valid_spo2),
+        max_spo2=Max('spo2', filter=valid_spo2),
+        avg_heart_rate=Avg('heart_rate', filter=valid_heart_rate),
+        min_heart_rate=Min('heart_rate', filter=valid_heart_rate),
+        max_heart_rate=Max('heart_rate', filter=valid_heart_rate),
+        critical_spo2_count=Count('id', filter=Q(issue_type__in=['SPO2', 'BOTH'])),
+        critical_hr_count=Count('id', filter=Q(issue_type__in=['HR', 'BOTH'])),
+        critical_both_count=Count('id', filter=Q(issue_type='BOTH')),
+        sensor_errors=Count('id', filter=Q(issue_type='SENSOR_ERROR'))
+    )
+    if not stats['records_count']:
+        return {}
+    return {
+        'avg_spo2': round(stats['avg_spo2'] or 0, 1),
+        'min_spo2': stats['min_spo2'],
+        'max_spo2': stats['max_spo2'],
+        'avg_heart_rate': round(stats['avg_heart_rate'] or 0, 1),
+        'min_heart_rate': stats['min_heart_rate'],
+        'max_heart_rate': stats['max_heart_rate'],
+        'records_count': stats['records_count'],
+        'first_record_date': stats['first_record_date'],
+        'last_record_date': stats['last_record_date'],
+        'critical_stats': {
+            'critical_spo2_count': stats['critical_spo2_count'],
+            'critical_hr_count': stats['critical_hr_count'],
+            'critical_both_count': stats['critical_both_count'],
+            'sensor_errors': stats['sensor_errors']
+        }
+    }
+
+
+def lttb(x, y, threshold):
+    """Індекси threshold точок ряду (x, y), вибраних алгоритмом LTTB"""
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+
+    every = (size - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        # Вершина трикутника з наступного інтервалу - його середня точка
+        next_end = min(int((bucket + 2) * every) + 1, size)
+        average_x = x[end:next_end].mean()
+        average_y = y[end:next_end].mean()
+        areas = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    selected[-1] = size - 1
+    return selected
+
+
+def series_points(requested=None):
+    """Довжина ряду для графіка з параметра points, обмежена MEDICAL_HISTORY_MAX_SERIES_POINTS"""
+    default = getattr(settings, 'MEDICAL_HISTORY_SERIES_POINTS', 500)
+    maximum = getattr(settings, 'MEDICAL_HISTORY_MAX_SERIES_POINTS', 5000)
+    return min(max(requested or default, 3), maximum)
+
+
+def downsampled_series(queryset, points):
+    """Ряд для графіка від найстаріших вимірів: не більше points записів.
+
+    Помилки датчиків (нульові показники) не потрапляють у ряд. Половина точок
+    вибирається за SpO2, половина - за пульсом, щоб зберегти піки обох кривих.
+    """
+    rows = list(
+        queryset.exclude(issue_type='SENSOR_ERROR').order_by('timestamp', 'id')
+        .values_list('timestamp', 'spo2', 'heart_rate', 'issue_type')
+    )
+    if len(rows) > points:
+        x = np.array([row[0].timestamp() for row in rows])
+        spo2 = np.array([row[1] for row in rows], dtype=np.float64)
+        heart_rate = np.array([row[2] for row in rows], dtype=np.float64)
+        indices = np.union1d(lttb(x, spo2, points // 2), lttb(x, heart_rate, points - points // 2))
+        rows = [rows[index] for index in indices]
+    return [
+        {'timestamp': timestamp, 'spo2': spo2, 'heart_rate': heart_rate, 'issue_type': issue_type}
+        for timestamp, spo2, heart_rate, issue_type in rows
+    ]
@@ -0,0 +1,278 @@
+"""Пошук k найближчих поранених (kNN) за поточними позиціями.
+
+Позиції зберігаються як одиничні вектори на сфері (x, y, z): хорда між ними
+монотонно залежить від відстані по великому колу, тож звичайне k-d дерево в
+трьох вимірах дає точний kNN без похибок біля полюсів і 180-го меридіана.
+
+Індекс живе в пам'яті процесу і оновлюється інкрементально: після зміни
+версії даних 'soldier' зчитуються лише записи ChangeLog після останнього
+курсора, змінені стани завантажуються одним запитом у буфер змін, а їхні
+старі точки в дереві позначаються неактуальними. Запит обходить дерево і
+окремо перебирає буфер. Дерево перебудовується повністю, коли буфер стає
+завеликим, минає NEAREST_REBUILD_SECONDS або версія змінилась без записів
+у журналі (перерахунок стану, зміна підрозділів).
+"""
+import heapq
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from api.models import SoldierState
+from api.services.changes import current_cursor, cursor_expired, changes_since
+from api.services.spatial import EARTH_RADIUS_KM
+from api.services.versions import data_versions
+
+LEAF_SIZE = 16
+# Стан пораненого без запису евакуації
+DEFAULT_STATUS = 'NOT_NEEDED'
+FIELDS = ('soldier_id', 'latitude', 'longitude', 'issue_type', 'status', 'first_name', 'last_name')
+
+_index = {}
+_index_lock = threading.Lock()
+
+
+def rebuild_seconds():
+    return getattr(settings, 'NEAREST_REBUILD_SECONDS', 300)
+
+
+def max_delta():
+    return getattr(settings, 'NEAREST_MAX_DELTA', 1000)
+
+
+def clear_cache():
+    with _index_lock:
+        _index.clear()
+
+
+def unit_vectors(latitudes, longitudes):
+    latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(latitudes)
+    return np.column_stack([cos_lat * np.cos(longitudes), cos_lat * np.sin(longitudes), np.sin(latitudes)])
+
+
+def chord_to_km(chord_sq):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.sqrt(chord_sq) / 2, 0.0, 1.0))
+
+
+def km_to_chord_sq(km):
+    return (2 * np.sin(min(km / EARTH_RADIUS_KM, np.pi) / 2)) ** 2
+
+
+class KDTree:
+    """Статичне k-d дерево з обмежувальними прямокутниками вузлів.
+
+    Вузли зберігаються у плоских списках; лист посилається на відрізок
+    order[start:end] - індекси точок, впорядковані при побудові.
+    """
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        self.points = points
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(points))
+        self.lower, self.upper, self.children, self.ranges = [], [], [], []
+        if len(points):
+            self.build(0, len(points))
+
+    def build(self, start, end):
+        node = len(self.children)
+        indices = self.order[start:end]
+        block = self.points[indices]
+        lower, upper = block.min(axis=0), block.max(axis=0)
+        self.lower.append(lower)
+        self.upper.append(upper)
+        self.children.append(None)
+        self.ranges.append((start, end))
+        if end - start > self.leaf_size:
+            axis = int(np.argmax(upper - lower))
+            middle = (end - start) // 2
+            self.order[start:end] = indices[np.argpartition(block[:, axis], middle)]
+            left = self.build(start, start + middle)
+            right = self.build(start + middle, end)
+            self.children[node] = (left, right)
+        return node
+
+    def box_distance_sq(self, node, point):
+        gap = np.maximum(self.lower[node] - point, 0) + np.maximum(point - self.upper[node], 0)
+        return float(gap @ gap)
+
+    def query(self, point, k, mask=None, max_distance_sq=np.inf):
+        """Індекси та квадрати хорд до k найближчих точок, для яких mask істинна"""
+        if not self.children:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        best_indices = np.empty(0, dtype=np.int64)
+        best_distances = np.empty(0)
+        bound = max_distance_sq
+        queue = [(self.box_distance_sq(0, point), 0)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance > bound:
+                break
+            children = self.children[node]
+            if children is not None:
+                for child in children:
+                    child_distance = self.box_distance_sq(child, point)
+                    if child_distance <= bound:
+                        heapq.heappush(queue, (child_distance, child))
+                continue
+
+            start, end = self.ranges[node]
+            indices = self.order[start:end]
+            if mask is not None:
+                indices = indices[mask[indices]]
+            if not len(indices):
+                continue
+            difference = self.points[indices] - point
+            distances = np.einsum('ij,ij->i', difference, difference)
+            within = distances <= max_distance_sq
+            best_indices = np.concatenate([best_indices, indices[within]])
+            best_distances = np.concatenate([best_distances, distances[within]])
+            if len(best_distances) > k:
+                keep = np.argpartition(best_distances, k - 1)[:k]
+                best_indices, best_distances = best_indices[keep], best_distances[keep]
+            if len(best_distances) == k:
+                bound = min(bound, float(best_distances.max()))
+        return best_indices, best_distances
+
+
+def load_rows(soldier_ids=None):
+    queryset = SoldierState.objects.all()
+    if soldier_ids is not None:
+        queryset = queryset.filter(soldier_id__in=soldier_ids)
+    rows = queryset.values_list(
+        'soldier_id', 'latitude', 'longitude', 'issue_type',
+        'soldier__evacuation__status', 'soldier__first_name', 'soldier__last_name'
+    )
+    return [row[:4] + (row[4] or DEFAULT_STATUS,) + row[5:] for row in rows]
+
+
+def columns(rows):
+    """Масиви полів для векторних фільтрів"""
+    return {
+        name: np.array([row[position] for row in rows], dtype=np.float64 if name in ('latitude', 'longitude') else object)
+        for position, name in enumerate(FIELDS)
+    }
+
+
+def build_index(versions, cursor):
+    rows = load_rows()
+    data = columns(rows)
+    return {
+        'versions': versions,
+        'cursor': cursor,
+        'built_at': time.monotonic(),
+        'data': data,
+        'tree': KDTree(unit_vectors(data['latitude'], data['longitude'])),
+        'positions': {soldier_id: position for position, soldier_id in enumerate(data['soldier_id'])},
+        'alive': np.ones(len(rows), dtype=bool),
+        **delta_columns({})
+    }
+
+
+def apply_changes(index, cursor):
+    """Новий індекс зі зміненими після курсора станами в буфері змін (None, якщо потрібна перебудова).
+
+    Дерево спільне, а маска актуальних точок і буфер копіюються, тож запити,
+    що вже виконуються зі старим індексом, не бачать проміжного стану.
+    """
+    if cursor_expired(index['cursor']):
+        return None
+    changed = list(changes_since('soldier', index['cursor'], cursor))
+    if not changed or len(changed) > max_delta():
+        return None
+    fresh = {row[0]: row for row in load_rows(changed)}
+    alive = index['alive'].copy()
+    delta = dict(index['delta'])
+    for soldier_id in changed:
+        position = index['positions'].get(soldier_id)
+        if position is not None:
+            alive[position] = False
+        if soldier_id in fresh:
+            delta[soldier_id] = fresh[soldier_id]
+        else:
+            # Поранений видалений або ще не має позиції
+            delta.pop(soldier_id, None)
+    if len(delta) > max_delta():
+        return None
+    return dict(index, cursor=cursor, alive=alive, **delta_columns(delta))
+
+
+def delta_columns(delta):
+    data = columns(list(delta.values()))
+    return {'delta': delta, 'delta_data': data, 'delta_points': unit_vectors(data['latitude'], data['longitude'])}
+
+
+def get_index():
+    """Актуальний індекс: без змін, оновлений з журналу змін або перебудований"""
+    versions = data_versions('soldier', 'evacuation')
+    index = _index.get('current')
+    if index is not None and index['versions'] == versions and time.monotonic() - index['built_at'] < rebuild_seconds():
+        return index
+    with _index_lock:
+        index = _index.get('current')
+        if index is not None and index['versions'] == versions and time.monotonic() - index['built_at'] < rebuild_seconds():
+            return index
+        # Курсор фіксується до читання станів: зміни під час читання застосуються наступного разу
+        cursor = current_cursor()
+        if index is not None and time.monotonic() - index['built_at'] < rebuild_seconds():
+            index = apply_changes(index, cursor)
+        index = build_index(versions, cursor) if index is None else dict(index, versions=versions)
+        _index['current'] = index
+        return index
+
+
+def row_mask(data, statuses=None, issue_types=None, soldier_ids=None, exclude=None):
+    mask = np.ones(len(data['soldier_id']), dtype=bool)
+    if statuses is not None:
+        mask &= np.isin(data['status'], list(statuses))
+    if issue_types is not None:
+        mask &= np.isin(data['issue_type'], list(issue_types))
+    if soldier_ids is not None:
+        mask &= np.isin(data['soldier_id'], list(soldier_ids))
+    if exclude is not None:
+        mask &= data['soldier_id'] != exclude
+    return mask
+
+
+def nearest(latitude, longitude, k=10, statuses=None, issue_types=None, soldier_ids=None, exclude=None, radius_km=None):
+    """k найближчих поранених до точки, відсортованих за відстанню.
+
+    statuses / issue_types / soldier_ids - допустимі значення (None - без
+    фільтра), exclude - ідентифікатор пораненого, якого не включати.
+    """
+    index = get_index()
+    point = unit_vectors([latitude], [longitude])[0]
+    max_distance_sq = np.inf if radius_km is None else km_to_chord_sq(radius_km)
+    filters = {'statuses': statuses, 'issue_types': issue_types, 'soldier_ids': soldier_ids, 'exclude': exclude}
+
+    data = index['data']
+    mask = index['alive'] & row_mask(data, **filters)
+    indices, distances = index['tree'].query(point, k, mask, max_distance_sq)
+    candidates = [(distance, data, position) for position, distance in zip(indices, distances)]
+
+    if index['delta']:
+        delta_data = index['delta_data']
+        positions = np.flatnonzero(row_mask(delta_data, **filters))
+        difference = index['delta_points'][positions] - point
+        delta_distances = np.einsum('ij,ij->i', difference, difference)
+        candidates += [
+            (distance, delta_data, position)
+            for position, distance in zip(positions, delta_distances) if distance <= max_distance_sq
+        ]
+
+    candidates.sort(key=lambda candidate: candidate[0])
+    return [
+        {
+            'soldier_id': source['soldier_id'][position],
+            'first_name': source['first_name'][position],
+            'last_name': source['last_name'][position],
+            'latitude': float(source['latitude'][position]),
+            'longitude': float(source['longitude'][position]),
+            'issue_type': source['issue_type'][position],
+            'evacuation_status': source['status'][position],
+            'distance': round(float(chord_to_km(distance)) * 1000, 1)
+        }
+        for distance, source, position in candidates[:k]
+    ]
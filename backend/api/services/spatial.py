@@ -0,0 +1,147 @@
+"""Просторовий індекс поточних позицій поранених на основі геохешу.
+
+Кожен SoldierState зберігає геохеш останньої позиції. Запит за радіусом або
+прямокутником спочатку покриває область набором префіксів геохешу (індексний
+пошук LIKE 'prefix%'), а точну відстань рахує векторно лише для кандидатів.
+"""
+import math
+import numpy as np
+from django.db.models import Q
+
+from api.models import SoldierState
+
+EARTH_RADIUS_KM = 6371.0
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Максимальна кількість комірок покриття, після якої переходимо на грубіший рівень
+MAX_COVER_CELLS = 32
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Кодує координати в геохеш заданої довжини"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    result = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(result) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            result.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(result)
+
+
+def geohash_cell_size(precision):
+    """Розмір комірки геохешу (висота, ширина) в градусах"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = math.floor(precision * 5 / 2)
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def cover_bbox(min_lat, min_lon, max_lat, max_lon):
+    """Повертає набір префіксів геохешу, що повністю покривають прямокутник"""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_height, cell_width = geohash_cell_size(precision)
+        rows = math.floor(max_lat / cell_height) - math.floor(min_lat / cell_height) + 1
+        cols = math.floor(max_lon / cell_width) - math.floor(min_lon / cell_width) + 1
+        if rows * cols <= MAX_COVER_CELLS:
+            break
+
+    cells = set()
+    lat = min_lat
+    while True:
+        lon = min_lon
+        while True:
+            cells.add(encode_geohash(lat, lon, precision))
+            if lon >= max_lon:
+                break
+            lon = min(lon + cell_width, max_lon)
+        if lat >= max_lat:
+            break
+        lat = min(lat + cell_height, max_lat)
+    return cells
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """Прямокутник, що описує коло заданого радіуса"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    dlon = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return (
+        max(latitude - dlat, -90.0),
+        max(longitude - dlon, -180.0),
+        min(latitude + dlat, 90.0),
+        min(longitude + dlon, 180.0)
+    )
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Векторний розрахунок відстані від точки до масиву точок в кілометрах"""
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(longitudes, dtype=float) - longitude)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def states_in_bbox(min_lat, min_lon, max_lat, max_lon, queryset=None):
+    """Поточні стани поранених всередині прямокутника"""
+    if queryset is None:
+        queryset = SoldierState.objects.all()
+
+    cells_filter = Q()
+    for prefix in cover_bbox(min_lat, min_lon, max_lat, max_lon):
+        cells_filter |= Q(geohash__startswith=prefix)
+
+    return queryset.filter(cells_filter).filter(
+        latitude__gte=min_lat,
+        latitude__lte=max_lat,
+        longitude__gte=min_lon,
+        longitude__lte=max_lon
+    )
+
+
+def states_within_radius(latitude, longitude, radius_km, queryset=None):
+    """Поточні стани в радіусі від точки.
+
+    Повертає список пар (SoldierState, відстань в км), відсортований за відстанню.
+    """
+    candidates = list(states_in_bbox(*radius_bbox(latitude, longitude, radius_km), queryset=queryset))
+    if not candidates:
+        return []
+
+    distances = haversine_km(
+        latitude, longitude,
+        [state.latitude for state in candidates],
+        [state.longitude for state in candidates]
+    )
+    order = np.argsort(distances, kind='stable')
+    return [
+        (candidates[index], float(distances[index]))
+        for index in order
+        if distances[index] <= radius_km
+    ]
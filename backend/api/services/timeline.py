@@ -0,0 +1,205 @@
+"""Журнал подій поранених зі знімками стану.
+
+Кожна зміна стану пораненого додається до CasualtyEvent. Коли після знімка
+пораненого накопичується CASUALTY_SNAPSHOT_INTERVAL подій, зберігається новий
+знімок, тому стан на будь-який момент T відновлюється з найближчого знімка та
+короткого хвоста подій. Кількість подій після знімка зберігається в
+Soldier.events_since_snapshot: запис події збільшує лічильник одним UPDATE без
+читання хвоста, а хвіст читається лише коли лічильник досягає інтервалу.
+"""
+from django.conf import settings
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.models import CasualtyEvent, CasualtySnapshot, Soldier
+
+# Кількість поранених в одному запиті хвостів подій battlefield_at
+BATTLEFIELD_CHUNK_SIZE = 500
+
+
+def snapshot_interval():
+    return getattr(settings, 'CASUALTY_SNAPSHOT_INTERVAL', 50)
+
+
+def empty_state():
+    return {
+        'issue_type': None,
+        'spo2': None,
+        'heart_rate': None,
+        'latitude': None,
+        'longitude': None,
+        'reading_at': None,
+        'open_alerts': [],
+        'evacuation_status': None,
+        'evacuation_team': None,
+        'evacuation_started': None,
+        'evacuation_time': None,
+        'events_count': 0,
+        'last_event_at': None,
+    }
+
+
+def apply_event(state, event_type, payload, occurred_at):
+    """Застосовує подію до стану пораненого (змінює і повертає state)"""
+    if event_type == 'READING_CLASSIFIED':
+        for field in ['issue_type', 'spo2', 'heart_rate', 'latitude', 'longitude', 'reading_at']:
+            state[field] = payload.get(field)
+    elif event_type == 'ALERT_RAISED':
+        if payload.get('alert_type') not in state['open_alerts']:
+            state['open_alerts'] = state['open_alerts'] + [payload.get('alert_type')]
+    elif event_type == 'ALERT_READ':
+        state['open_alerts'] = [alert for alert in state['open_alerts'] if alert != payload.get('alert_type')]
+    elif event_type == 'EVACUATION_STARTED':
+        state['evacuation_status'] = 'IN_PROGRESS'
+        state['evacuation_started'] = payload.get('evacuation_started')
+        state['evacuation_team'] = payload.get('evacuation_team')
+    elif event_type == 'EVACUATION_COMPLETED':
+        state['evacuation_status'] = 'EVACUATED'
+        state['evacuation_time'] = payload.get('evacuation_time')
+    elif event_type == 'EVACUATION_CANCELLED':
+        state['evacuation_status'] = 'NEEDED'
+        state['evacuation_started'] = None
+
+    state['events_count'] += 1
+    state['last_event_at'] = occurred_at.isoformat()
+    return state
+
+
+def record_event(soldier, event_type, payload):
+    """Додає подію до журналу та за потреби зберігає знімок стану"""
+    event = CasualtyEvent.objects.create(
+        soldier=soldier,
+        event_type=event_type,
+        payload=payload
+    )
+    # Рядок не оновлюється лише коли лічильник досяг інтервалу - тоді будується знімок
+    counted = Soldier.objects.filter(
+        pk=event.soldier_id, events_since_snapshot__lt=snapshot_interval() - 1
+    ).update(events_since_snapshot=F('events_since_snapshot') + 1)
+    if not counted:
+        maybe_snapshot(event.soldier_id)
+    return event
+
+
+def record_events(events):
+    """Додає набір подій (soldier_id, event_type, payload) одним INSERT"""
+    now = timezone.now()
+    CasualtyEvent.objects.bulk_create([
+        CasualtyEvent(soldier_id=soldier_id, event_type=event_type, payload=payload, occurred_at=now)
+        for soldier_id, event_type, payload in events
+    ], batch_size=1000)
+    # Лічильники збільшуються одним UPDATE на кожну різну кількість нових подій,
+    # знімки будуються лише для тих, у кого хвіст досяг інтервалу
+    counts = defaultdict(int)
+    for soldier_id, _, _ in events:
+        counts[soldier_id] += 1
+    groups = defaultdict(list)
+    for soldier_id, count in counts.items():
+        groups[count].append(soldier_id)
+    for count, soldier_ids in groups.items():
+        Soldier.objects.filter(pk__in=soldier_ids).update(events_since_snapshot=F('events_since_snapshot') + count)
+    full = Soldier.objects.filter(pk__in=list(counts), events_since_snapshot__gte=snapshot_interval())
+    for soldier_id in full.values_list('pk', flat=True):
+        maybe_snapshot(soldier_id)
+
+
+def maybe_snapshot(soldier_id):
+    """Зберігає знімок за весь хвіст, якщо після попереднього накопичилось достатньо подій"""
+    last_snapshot = CasualtySnapshot.objects.filter(soldier_id=soldier_id).order_by('-last_event_id').first()
+    last_event_id = last_snapshot.last_event_id if last_snapshot else 0
+    tail = list(
+        CasualtyEvent.objects.filter(soldier_id=soldier_id, id__gt=last_event_id)
+        .order_by('id')
+        .values_list('id', 'event_type', 'payload', 'occurred_at')
+    )
+    if len(tail) < snapshot_interval():
+        count_tail(soldier_id, last_event_id)
+        return None
+
+    state = dict(last_snapshot.state) if last_snapshot else empty_state()
+    for _, event_type, payload, occurred_at in tail:
+        apply_event(state, event_type, payload, occurred_at)
+    snapshot = CasualtySnapshot.objects.create(
+        soldier_id=soldier_id,
+        last_event_id=tail[-1][0],
+        occurred_at=tail[-1][3],
+        state=state
+    )
+    count_tail(soldier_id, snapshot.last_event_id)
+    return snapshot
+
+
+def count_tail(soldier_id, last_event_id):
+    """Встановлює лічильник пораненого за фактичною кількістю подій після знімка"""
+    tail = (
+        CasualtyEvent.objects.filter(soldier_id=soldier_id, id__gt=last_event_id)
+        .values('soldier_id').annotate(count=Count('id')).values('count')
+    )
+    Soldier.objects.filter(pk=soldier_id).update(events_since_snapshot=Coalesce(Subquery(tail), Value(0)))
+
+
+def state_at(soldier, at):
+    """Відновлює стан пораненого на момент at"""
+    snapshot = CasualtySnapshot.objects.filter(
+        soldier=soldier,
+        occurred_at__lte=at
+    ).order_by('-last_event_id').first()
+
+    state = dict(snapshot.state) if snapshot else empty_state()
+    tail = CasualtyEvent.objects.filter(
+        soldier=soldier,
+        id__gt=snapshot.last_event_id if snapshot else 0,
+        occurred_at__lte=at
+    ).order_by('id').values_list('event_type', 'payload', 'occurred_at')
+
+    for event_type, payload, occurred_at in tail:
+        apply_event(state, event_type, payload, occurred_at)
+    return state
+
+
+def battlefield_at(at, soldier_ids=None):
+    """Стан всіх поранених на момент at.
+
+    Спочатку читається останній знімок кожного пораненого до at, потім лише
+    події після його last_event_id - пакетами умов (soldier_id, id > N), які
+    база виконує діапазонами індексу (soldier, id). Поранені без знімка мають
+    коротку історію і читаються повністю.
+    """
+    latest_snapshot = CasualtySnapshot.objects.filter(
+        soldier=OuterRef('soldier'),
+        occurred_at__lte=at
+    ).order_by('-last_event_id')
+    snapshots = CasualtySnapshot.objects.filter(
+        id=Subquery(latest_snapshot.values('id')[:1])
+    )
+    if soldier_ids is not None:
+        snapshots = snapshots.filter(soldier_id__in=soldier_ids)
+
+    states = {}
+    positions = {}
+    for soldier_id, last_event_id, state in snapshots.values_list('soldier_id', 'last_event_id', 'state'):
+        states[soldier_id] = dict(state)
+        positions[soldier_id] = last_event_id
+
+    if soldier_ids is None:
+        without_snapshot = list(Soldier.objects.exclude(pk__in=list(positions)).values_list('pk', flat=True))
+    else:
+        without_snapshot = [soldier_id for soldier_id in set(soldier_ids) if soldier_id not in positions]
+
+    conditions = [Q(soldier_id=soldier_id, id__gt=last_event_id) for soldier_id, last_event_id in positions.items()]
+    conditions += [Q(soldier_id=soldier_id) for soldier_id in without_snapshot]
+    for start in range(0, len(conditions), BATTLEFIELD_CHUNK_SIZE):
+        condition = Q()
+        for part in conditions[start:start + BATTLEFIELD_CHUNK_SIZE]:
+            condition |= part
+        events = CasualtyEvent.objects.filter(condition, occurred_at__lte=at).order_by('id')
+        for soldier_id, event_type, payload, occurred_at in events.values_list(
+            'soldier_id', 'event_type', 'payload', 'occurred_at'
+        ).iterator():
+            if soldier_id not in states:
+                states[soldier_id] = empty_state()
+            apply_event(states[soldier_id], event_type, payload, occurred_at)
+    return states
@@ -0,0 +1,138 @@
+"""Траєкторії руху поранених зі спрощенням лінії.
+
+Позиції за період читаються одним запитом по індексу (device, timestamp) і
+спрощуються алгоритмом Дугласа-Пекера. Допуск прив'язаний до масштабу карти:
+TRAJECTORY_TOLERANCE_PIXELS пікселів на запитаному zoom у метрах на місцевості,
+тож на дрібному масштабі лишаються лише повороти, помітні на екрані.
+Результат кодується у формат encoded polyline (точність 1e-5 градуса),
+який напряму декодують Leaflet / Google Maps.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+
+from api.models import MedicalData
+
+EARTH_RADIUS_M = 6371000.0
+# Метрів на піксель на екваторі на масштабі 0 (тайли 256 пікселів)
+EQUATOR_METERS_PER_PIXEL = 156543.03392
+DEFAULT_ZOOM = 15
+MAX_ZOOM = 22
+POLYLINE_PRECISION = 5
+
+
+def tolerance_meters(zoom, latitude):
+    """Допуск спрощення: розмір TRAJECTORY_TOLERANCE_PIXELS пікселів на масштабі zoom"""
+    pixels = getattr(settings, 'TRAJECTORY_TOLERANCE_PIXELS', 1.0)
+    return EQUATOR_METERS_PER_PIXEL * math.cos(math.radians(latitude)) / 2 ** zoom * pixels
+
+
+def simplify(x, y, tolerance):
+    """Індекси точок, що лишаються після спрощення Дугласа-Пекера.
+
+    Відстань рахується до відрізка, а не до прямої, щоб не втрачати
+    розвороти на маршрутах "туди й назад".
+    """
+    size = len(x)
+    if size < 3:
+        return np.arange(size)
+    keep = np.zeros(size, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, size - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        px = x[start + 1:end] - x[start]
+        py = y[start + 1:end] - y[start]
+        length = dx * dx + dy * dy
+        if length == 0:
+            distances = np.hypot(px, py)
+        else:
+            t = np.clip((px * dx + py * dy) / length, 0.0, 1.0)
+            distances = np.hypot(px - t * dx, py - t * dy)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return np.flatnonzero(keep)
+
+
+def encode_polyline(latitudes, longitudes, precision=POLYLINE_PRECISION):
+    """Кодує координати в рядок encoded polyline"""
+    factor = 10 ** precision
+    points = np.column_stack([
+        np.round(np.asarray(latitudes) * factor),
+        np.round(np.asarray(longitudes) * factor)
+    ]).astype(np.int64)
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    chunks = []
+    for value in deltas.tolist():
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def build_track(soldier_id, timestamps, latitudes, longitudes, zoom):
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    # Локальна рівнопроміжна проєкція в метрах навколо середньої широти треку
+    middle = float(latitudes.mean())
+    x = np.radians(longitudes) * math.cos(math.radians(middle)) * EARTH_RADIUS_M
+    y = np.radians(latitudes) * EARTH_RADIUS_M
+    kept = simplify(x, y, tolerance_meters(zoom, middle))
+    return {
+        'soldier_id': soldier_id,
+        'started_at': timestamps[0],
+        'ended_at': timestamps[-1],
+        'original_points': len(timestamps),
+        'points': len(kept),
+        'polyline': encode_polyline(latitudes[kept], longitudes[kept])
+    }
+
+
+def build_trajectories(queryset, start_time, end_time, zoom=DEFAULT_ZOOM):
+    """Спрощені траєкторії всіх поранених з queryset вимірів за [start_time, end_time)"""
+    zoom = min(max(zoom, 0), MAX_ZOOM)
+    rows = queryset.filter(timestamp__gte=start_time, timestamp__lt=end_time).order_by(
+        'device_id', 'timestamp', 'id'
+    ).values_list('device_id', 'timestamp', 'latitude', 'longitude')
+
+    tracks = []
+    current = None
+    timestamps, latitudes, longitudes = [], [], []
+    for soldier_id, timestamp, latitude, longitude in rows.iterator(chunk_size=5000):
+        if soldier_id != current:
+            if timestamps:
+                tracks.append(build_track(current, timestamps, latitudes, longitudes, zoom))
+            current = soldier_id
+            timestamps, latitudes, longitudes = [], [], []
+        timestamps.append(timestamp)
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+    if timestamps:
+        tracks.append(build_track(current, timestamps, latitudes, longitudes, zoom))
+    return tracks
+
+
+def soldier_trajectory(soldier_id, start_time, end_time, zoom=DEFAULT_ZOOM):
+    """Траєкторія одного пораненого (порожня, якщо вимірів за період немає)"""
+    tracks = build_trajectories(MedicalData.objects.filter(device_id=soldier_id), start_time, end_time, zoom)
+    if tracks:
+        return tracks[0]
+    return {
+        'soldier_id': soldier_id,
+        'started_at': None,
+        'ended_at': None,
+        'original_points': 0,
+        'points': 0,
+        'polyline': ''
+    }
@@ -0,0 +1,20 @@
+"""Ієрархія підрозділів.
+
+Піддерево підрозділу вибирається через таблицю замикання UnitClosure одним
+JOIN по індексу (ancestor, descendant) замість пошуку підрядка в Soldier.unit.
+"""
+from django.db.models import Q
+
+from api.models import UnitClosure
+
+
+def subtree_q(unit_id, soldier_field=None):
+    """Умова "боєць належить до піддерева unit_id" для моделі, пов'язаної з Soldier полем soldier_field"""
+    prefix = f'{soldier_field}__' if soldier_field else ''
+    return Q(**{f'{prefix}military_unit__ancestor_links__ancestor_id': unit_id})
+
+
+def subtree_units(unit):
+    """Підрозділ та всі його нащадки як пари (підрозділ, глибина відносно unit)"""
+    links = UnitClosure.objects.filter(ancestor=unit).select_related('descendant').order_by('depth', 'descendant__name')
+    return [(link.descendant, link.depth) for link in links]
@@ -0,0 +1,87 @@
+"""Версії даних для умовних GET запитів.
+
+Кожна область (soldier, alert, evacuation) має версію у спільному кеші
+(CACHES['default']), яку змінюють інгестія та дії запису після коміту
+транзакції. ETag будується з версій без звернення до бази, тож відповідь
+304 на незмінені дані не виконує жодного запиту ORM.
+
+Область 'soldier' змінює кожен вимір, тож її версія змінюється не частіше
+ніж раз на DATA_VERSION_COALESCE_SECONDS: запис лише збільшує лічильник змін,
+а читач, побачивши новий лічильник у версії, старшій за інтервал, видає нову
+версію. Кеш відповідей і ETag встигають спрацювати між оновленнями.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = 'data_version:'
+CHANGES_PREFIX = 'data_changes:'
+COALESCED_SCOPES = ('soldier',)
+
+
+def coalesce_seconds():
+    return getattr(settings, 'DATA_VERSION_COALESCE_SECONDS', 5)
+
+
+def new_version(changes=None):
+    """Випадкова версія; для об'єднуваних областей - з лічильником змін і часом видачі"""
+    token = uuid.uuid4().hex[:12]
+    if changes is None:
+        return token
+    return f'{changes}-{int(time.time())}-{token}'
+
+
+def settle_version(scope, version, changes):
+    """Версія об'єднуваної області з урахуванням змін, записаних після її видачі"""
+    try:
+        seen, issued_at, _ = version.split('-')
+        if int(seen) == changes or time.time() - int(issued_at) < coalesce_seconds():
+            return version
+    except (AttributeError, ValueError):
+        # Версія старого формату
+        pass
+    version = new_version(changes)
+    cache.set(KEY_PREFIX + scope, version, timeout=None)
+    return version
+
+
+def data_versions(*scopes):
+    """Поточні версії областей; відсутні версії створюються"""
+    keys = [KEY_PREFIX + scope for scope in scopes]
+    change_keys = [CHANGES_PREFIX + scope for scope in scopes if scope in COALESCED_SCOPES]
+    versions = cache.get_many(keys + change_keys)
+    for scope, key in zip(scopes, keys):
+        changes = versions.get(CHANGES_PREFIX + scope, 0) if scope in COALESCED_SCOPES else None
+        if key not in versions:
+            # add не перезапише версію, яку паралельно встановив інший процес
+            cache.add(key, new_version(changes), timeout=None)
+            versions[key] = cache.get(key)
+        if changes is not None:
+            versions[key] = settle_version(scope, versions[key], changes)
+    return [versions[key] for key in keys]
+
+
+def count_change(scope):
+    key = CHANGES_PREFIX + scope
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Лічильника ще немає або його витіснено
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def bump_version(scope):
+    """Нова версія області після коміту поточної транзакції.
+
+    Версія змінюється лише після коміту: інакше паралельний запит міг би
+    прочитати старі дані під новою версією і віддавати їх як незмінені.
+    Для об'єднуваних областей після коміту лише збільшується лічильник змін.
+    """
+    if scope in COALESCED_SCOPES:
+        transaction.on_commit(lambda: count_change(scope))
+    else:
+        transaction.on_commit(lambda: cache.set(KEY_PREFIX + scope, new_version(), timeout=None))
@@ -0,0 +1,78 @@
+"""Дельта-режим списків: ?since=<курсор>.
+
+Відповідь містить лише записи, змінені після курсора, ідентифікатори записів,
+які потрібно прибрати з клієнта (видалені або більше не підпадають під
+фільтри), та новий курсор. Якщо курсор застарів (журнал вже очищено) або
+дорівнює 0, повертається повний список з reset=True - сторінками пагінатора
+в'ю: посилання next містить reset_cursor, зафіксований на першій сторінці, а
+поле cursor заповнене лише на останній сторінці (на решті - null).
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from api.services.changes import current_cursor, cursor_expired, changes_since
+
+
+def parse_int_param(request, name):
+    try:
+        return int(request.query_params[name])
+    except ValueError:
+        raise ParseError(f"Параметр '{name}' повинен бути цілим числом")
+
+
+class DeltaSyncMixin:
+    sync_scope = None
+    reset_cursor_query_param = 'reset_cursor'
+
+    def list(self, request, *args, **kwargs):
+        if 'since' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        since = parse_int_param(request, 'since')
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if self.reset_cursor_query_param in request.query_params:
+            # Наступна сторінка повного списку: курсор лишається з першої сторінки
+            return self.reset_response(queryset, parse_int_param(request, self.reset_cursor_query_param))
+
+        # Курсор фіксується до читання записів: зміни, що відбудуться під час
+        # запиту, потраплять і в наступну відповідь, але не загубляться
+        cursor = current_cursor()
+        if since <= 0 or cursor_expired(since):
+            return self.reset_response(queryset, cursor)
+
+        changes = changes_since(self.sync_scope, since, cursor)
+        changed = [object_id for object_id, action in changes.items() if action != 'DELETE']
+        records = list(queryset.filter(pk__in=changed)) if changed else []
+        found = {str(record.pk) for record in records}
+        pk_field = queryset.model._meta.pk
+        deleted = [pk_field.to_python(object_id) for object_id in changes if object_id not in found]
+
+        return Response({
+            'cursor': cursor,
+            'reset': False,
+            'results': self.get_serializer(records, many=True).data,
+            'deleted': deleted
+        })
+
+    def reset_response(self, queryset, cursor):
+        """Сторінка повного списку; без пагінатора - весь список одразу"""
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response({
+                'cursor': cursor,
+                'reset': True,
+                'next': None,
+                'results': self.get_serializer(queryset, many=True).data,
+                'deleted': []
+            })
+        next_link = self.paginator.get_next_link()
+        if next_link is not None:
+            next_link = replace_query_param(next_link, self.reset_cursor_query_param, cursor)
+        return Response({
+            'cursor': None if next_link else cursor,
+            'reset': True,
+            'next': next_link,
+            'results': self.get_serializer(page, many=True).data,
+            'deleted': []
+        })
@@ -10,7 +10,8 @@ from .views import (
     UserManagementView,
     UserDetailView,
     UserPasswordChangeView,
-    SecurityView
+    SecurityView,
+    UnitViewSet
 )
 
 router = DefaultRouter()
@@ -18,6 +19,7 @@ router.register(r'soldiers', SoldierViewSet)
 router.register(r'medical-data', MedicalDataViewSet)
 router.register(r'alerts', AlertViewSet)
 router.register(r'evacuations', EvacuationViewSet)
+router.register(r'units', UnitViewSet)
 router.register(r'profiles', ProfileViewSet)
 
 urlpatterns = [
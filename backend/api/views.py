@@ -3,23 +3,49 @@ from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.decorators import action, permission_classes
 from rest_framework.response import Response
+from rest_framework.exceptions import APIException, ParseError
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from .models import Soldier, MedicalData, Alert, Evacuation
-from .serializers import SoldierSerializer, SoldierDetailSerializer, MedicalDataSerializer, AlertSerializer, EvacuationSerializer, MedicalHistorySerializer, UserSerializer, UserCreateSerializer, UserProfileSerializer, PasswordChangeSerializer
-from math import sin, cos, sqrt, atan2, radians
+from django.utils.dateparse import parse_datetime
+from .models import Soldier, MedicalData, Alert, Evacuation, CriticalEpisode, SoldierState, CasualtyEvent, Unit, StatusCounter
+from .serializers import SoldierSerializer, SoldierDetailSerializer, MedicalDataSerializer, AlertSerializer, EvacuationSerializer, MedicalHistorySerializer, CriticalEpisodeSerializer, UnitSerializer, UserSerializer, UserCreateSerializer, UserProfileSerializer, PasswordChangeSerializer
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from .security import log_action, log_security_action
+from .db_router import ReplicaReadMixin, pin_to_primary
+from .sync import DeltaSyncMixin
+from .conditional import conditional_on
+from .response_cache import cached_response
+from .pagination import TimestampKeysetPagination, CreatedAtKeysetPagination, SoldierKeysetPagination
 from django.contrib.auth import logout
 from django.db.models import Q
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from .services.chirpstack import create_chirpstack_device, delete_device
-from django.db import models, transaction
+from .services.spatial import states_within_radius
+from .services.alerts import create_alert, mark_alerts_read, mark_alert_read
+from .services import evacuation as evacuation_service
+from .services.timeline import state_at, battlefield_at
+from .services.units import subtree_q, subtree_units
+from .services import counters
+from .services.changes import record_change, record_changes
+from .services import export as export_service
+from .services import analytics as analytics_service
+from .services import clustering as clustering_service
+from .services import trajectory as trajectory_service
+from .services import medical_history as medical_history_service
+from .services import nearest as nearest_service
+from .services import dispatch as dispatch_service
+from django.db import models, transaction, router
+from django.http import StreamingHttpResponse
 from datetime import datetime, timedelta
-from django.db.models import Count, Avg, F, Q
+from django.db.models import Count, Avg, Max, F, Q, Prefetch, ExpressionWrapper, DurationField, Case, When, Value, IntegerField, DateTimeField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import math
 import random
+import threading
+from collections import OrderedDict
+from django.conf import settings
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
 import logging
 
@@ -31,6 +57,101 @@ import logging
 # )
 logger = logging.getLogger(__name__)
 
+# Останній побудований список prioritized для кожного фільтра підрозділу: unit_id -> (відбиток даних, список).
+# Зберігається не більше PRIORITIZED_CACHE_SIZE фільтрів, найдавніше використані витісняються
+_prioritized_cache = OrderedDict()
+_prioritized_lock = threading.Lock()
+
+# Секції triage_board; зведення доступні лише аналітикам, як і відповідні endpoint-и
+TRIAGE_SECTIONS = ('issues_summary', 'critical_vitals', 'sensor_errors', 'in_evacuation', 'evacuation_summary')
+ANALYST_TRIAGE_SECTIONS = {'issues_summary', 'evacuation_summary'}
+
+# Початок критичного стану для поранених без відкритого епізоду в сортуванні пошуку за пріоритетом
+CRITICAL_SINCE_NONE = timezone.make_aware(datetime(9999, 1, 1))
+
+def parse_unit_id(request):
+    """Ідентифікатор підрозділу з параметра unit_id (None, якщо параметр не вказано)"""
+    unit_id = request.query_params.get('unit_id')
+    if not unit_id:
+        return None
+    try:
+        return int(unit_id)
+    except ValueError:
+        raise ParseError("Параметр 'unit_id' повинен бути цілим числом")
+
+def parse_bbox(request):
+    """Прямокутник з параметра bbox=min_lat,min_lon,max_lat,max_lon (None, якщо параметр не вказано)"""
+    bbox = request.query_params.get('bbox')
+    if not bbox:
+        return None
+    try:
+        min_lat, min_lon, max_lat, max_lon = [float(value) for value in bbox.split(',')]
+    except ValueError:
+        raise ParseError("Параметр 'bbox' повинен мати формат min_lat,min_lon,max_lat,max_lon")
+    return min_lat, min_lon, max_lat, max_lon
+
+def parse_time_range(request, default=timedelta(hours=24)):
+    """Період з параметрів from, to (ISO 8601); за замовчуванням - останні default до поточного моменту"""
+    bounds = {}
+    for name in ('from', 'to'):
+        value = request.query_params.get(name)
+        if not value:
+            continue
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ParseError(f"Параметр '{name}' повинен бути датою в форматі ISO 8601")
+        bounds[name] = timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+    end_time = bounds.get('to', timezone.now())
+    start_time = bounds.get('from', end_time - default)
+    if start_time >= end_time:
+        raise ParseError("Параметр 'from' повинен бути раніше за 'to'")
+    return start_time, end_time
+
+def parse_zoom(request, default):
+    """Масштаб карти з параметра zoom"""
+    try:
+        return int(request.query_params.get('zoom', default))
+    except ValueError:
+        raise ParseError("Параметр 'zoom' повинен бути цілим числом")
+
+def unit_filter(request, soldier_field=None):
+    """Умова фільтрації за піддеревом підрозділу з параметра unit_id (порожня, якщо параметр не вказано)"""
+    unit_id = parse_unit_id(request)
+    if unit_id is None:
+        return Q()
+    return subtree_q(unit_id, soldier_field)
+
+def medical_history_response(request, soldier, evacuation):
+    """Історія показників: статистика, сторінка останніх записів та проріджений ряд для графіка.
+
+    Параметри: days - лише останні N днів, page_size / cursor - сторінка записів
+    (найновіші спочатку), points - довжина ряду series.
+    """
+    days = request.query_params.get('days')
+    points = request.query_params.get('points')
+    try:
+        days = int(days) if days else None
+    except ValueError:
+        return Response({"error": "Параметр 'days' повинен бути цілим числом"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        points = int(points) if points else None
+    except ValueError:
+        return Response({"error": "Параметр 'points' повинен бути цілим числом"}, status=status.HTTP_400_BAD_REQUEST)
+
+    medical_records = medical_history_service.history_queryset(soldier.pk, days)
+    paginator = TimestampKeysetPagination()
+    page = paginator.paginate_queryset(medical_records, request)
+    return Response({
+        'soldier': SoldierDetailSerializer(soldier).data,
+        'evacuation': EvacuationSerializer(evacuation).data if evacuation else None,
+        'statistics': medical_history_service.statistics(medical_records),
+        'medical_records': MedicalDataSerializer(page, many=True).data,
+        'next': paginator.get_next_link(),
+        'series': medical_history_service.downsampled_series(
+            medical_records, medical_history_service.series_points(points)
+        )
+    })
+
 # Користувацькі права доступу
 class IsMedicalStaff(BasePermission):
     """Перевірка чи користувач належить до медичного персоналу"""
@@ -110,7 +231,10 @@ class UserProfileView(APIView):
 class SecurityView(APIView):
     permission_classes = [IsAuthenticated]
     
-    @action(detail=False, methods=['get'])
+    def get(self, request):
+        return self.security_audit(request)
+    
+    @cached_response('security_audit', 'user', per_minute=True)
     def security_audit(self, request):
         """Аудит безпеки системи"""
         from django.contrib.auth import get_user_model
@@ -172,19 +296,25 @@ class SecurityView(APIView):
         
         return recommendations
 
-class SoldierViewSet(viewsets.ModelViewSet):
+class SoldierViewSet(DeltaSyncMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Soldier.objects.all()
     serializer_class = SoldierSerializer
+    pagination_class = SoldierKeysetPagination
+    sync_scope = 'soldier'
+    replica_actions = ('analytics', 'medical_history', 'trajectory')
 
     def get_permissions(self):
         """Визначення прав доступу в залежності від дії"""
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             permission_classes = [IsAuthenticated, IsRecruiter]
-        elif self.action in ['start_evacuation', 'complete_evacuation', 'cancel_evacuation']:
+        elif self.action in ['start_evacuation', 'complete_evacuation', 'cancel_evacuation',
+                             'bulk_start_evacuation', 'bulk_complete_evacuation', 'bulk_cancel_evacuation']:
             permission_classes = [IsAuthenticated, IsMedicalStaff]
         elif self.action in ['analytics', 'issues_summary', 'evacuation_summary']:
             permission_classes = [IsAuthenticated, IsAnalyst]
+        elif self.action == 'triage_board' and ANALYST_TRIAGE_SECTIONS.intersection(self.triage_sections()):
+            permission_classes = [IsAuthenticated, IsAnalyst]
         else:
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
@@ -194,6 +324,9 @@ class SoldierViewSet(viewsets.ModelViewSet):
             return SoldierDetailSerializer
         return SoldierSerializer
 
+    def get_queryset(self):
+        return Soldier.objects.filter(unit_filter(self.request))
+
     def perform_create(self, serializer):
         """Створення нового солдата з інтеграцією Chirpstack"""
         dev_eui = serializer.validated_data.get('devEui')
@@ -213,7 +346,9 @@ class SoldierViewSet(viewsets.ModelViewSet):
             print(f"WARNING: Failed to create ChirpStack device for {name} with DEV EUI {dev_eui}, but continuing anyway")
         
         # Зберігаємо солдата в будь-якому випадку
-        serializer.save()
+        soldier = serializer.save()
+        counters.soldier_added(soldier.pk)
+        record_change('soldier', soldier.pk)
 
     def perform_update(self, serializer):
         """Оновлення даних солдата"""
@@ -221,7 +356,10 @@ class SoldierViewSet(viewsets.ModelViewSet):
         if 'devEui' in serializer.validated_data and serializer.instance.devEui != serializer.validated_data['devEui']:
             raise ValidationError("Зміна devEui не дозволена")
         
-        serializer.save()
+        previous_unit_id = serializer.instance.military_unit_id
+        soldier = serializer.save()
+        counters.record_transition(soldier.pk, unit_id=previous_unit_id)
+        record_change('soldier', soldier.pk)
 
     @action(detail=False, methods=['get'])
     def search(self, request):
@@ -271,53 +409,34 @@ class SoldierViewSet(viewsets.ModelViewSet):
         lon = request.query_params.get('lon')
         radius = request.query_params.get('radius')  # в кілометрах
         if all([lat, lon, radius]):
-            # Створюємо список ID поранених в радіусі
-            soldiers_in_radius = []
-            for soldier in queryset:
-                latest_data = soldier.medicaldata_set.order_by('-timestamp').first()
-                if latest_data:
-                    distance = self.calculate_distance(
-                        float(lat), float(lon),
-                        latest_data.latitude, latest_data.longitude
-                    )
-                    if distance <= float(radius):
-                        soldiers_in_radius.append(soldier.devEui)
+            # Створюємо список ID поранених в радіусі за просторовим індексом
+            soldiers_in_radius = [
+                state.soldier_id
+                for state, _ in states_within_radius(float(lat), float(lon), float(radius))
+            ]
             queryset = queryset.filter(devEui__in=soldiers_in_radius)
 
         # Сортування результатів
         sort_by = request.query_params.get('sort_by', 'priority')
         if sort_by == 'priority':
-            # Спочатку отримуємо всі результати
-            results = self.get_serializer(queryset, many=True).data
-            # Сортуємо за пріоритетом
-            priority_order = {
-                'CRITICAL': 0,
-                'HIGH': 1,
-                'WARNING': 2,
-                'NORMAL': 3,
-                'UNKNOWN': 4
-            }
-            sorted_results = sorted(
-                results,
-                key=lambda x: (
-                    priority_order.get(x['priority_info']['level'], 999),
-                    -(x.get('critical_duration', 0) or 0)  # Від більшого до меншого
-                )
-            )
-            return Response({
-                'count': len(sorted_results),
-                'results': sorted_results
-            })
+            # Пріоритет і тривалість критичного стану рахує база, тож сторінка береться курсором як і для інших сортувань
+            queryset = queryset.annotate(
+                priority_level=self.priority_level(),
+                critical_since=self.critical_since(),
+            ).order_by('priority_level', 'critical_since')
         elif sort_by == 'last_update':
             queryset = queryset.order_by('-last_update')
         elif sort_by == 'name':
             queryset = queryset.order_by('last_name', 'first_name')
 
-        # Пагінація результатів
+        # Пагінація результатів у вибраному сортуванні
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            response = self.get_paginated_response(serializer.data)
+            # Фільтри пошуку звужують вибірку, тож загальна кількість лишається у відповіді
+            response.data['count'] = queryset.count()
+            return response
 
         serializer = self.get_serializer(queryset, many=True)
         return Response({
@@ -325,83 +444,45 @@ class SoldierViewSet(viewsets.ModelViewSet):
             'results': serializer.data
         })
 
-    def calculate_distance(self, lat1, lon1, lat2, lon2):
-        """Розрахунок відстані між координатами в кілометрах"""
-        R = 6371  # Радіус Землі в км
+    @staticmethod
+    def priority_level():
+        """Рівень пріоритету за поточним станом: CRITICAL 0, HIGH 1, WARNING 2, NORMAL 3, без даних 4"""
+        return Case(
+            When(state__issue_type='BOTH', then=Value(0)),
+            When(state__issue_type__in=['SPO2', 'HR'], then=Value(1)),
+            When(state__issue_type='SENSOR_ERROR', then=Value(2)),
+            When(state__issue_type='NORMAL', then=Value(3)),
+            default=Value(4),
+            output_field=IntegerField(),
+        )
 
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        distance = R * c
-        
-        return distance
+    @staticmethod
+    def critical_since():
+        """Початок відкритого критичного епізоду; раніший початок - довший критичний стан"""
+        started_at = CriticalEpisode.objects.filter(
+            soldier=OuterRef('pk'),
+            ended_at__isnull=True
+        ).order_by('started_at').values('started_at')[:1]
+        # Без епізоду - далека дата замість NULL, щоб курсор пагінації порівнював значення
+        return Coalesce(
+            Subquery(started_at),
+            Value(CRITICAL_SINCE_NONE),
+            output_field=DateTimeField(),
+        )
 
     @action(detail=False, methods=['get'])
+    @conditional_on('soldier', 'evacuation', per_minute=True)
+    @cached_response('issues_summary', 'soldier', 'evacuation', per_minute=True)
     def issues_summary(self, request):
         """Зведення по всіх проблемах"""
-        not_evacuated = Soldier.objects.exclude(evacuation_status='EVACUATED')
-        summary = {
-            'SPO2': [],
-            'HR': [],
-            'BOTH': [],
-            'SENSOR_ERROR': [],
-            'total_wounded': not_evacuated.count()
-        }
-
-        for soldier in not_evacuated:
-            latest_data = soldier.medicaldata_set.order_by('-timestamp').first()
-            if latest_data and latest_data.issue_type != 'NORMAL':
-                summary[latest_data.issue_type].append({
-                    'soldier': self.get_serializer(soldier).data,
-                    'medical_data': MedicalDataSerializer(latest_data).data
-                })
-
-        return Response({
-            'summary': {
-                'spo2_issues': len(summary['SPO2']),
-                'hr_issues': len(summary['HR']),
-                'both_issues': len(summary['BOTH']),
-                'sensor_errors': len(summary['SENSOR_ERROR']),
-                'total_wounded': summary['total_wounded']
-            },
-            'details': summary
-        })
+        return Response(self.build_triage_board(['issues_summary'])['issues_summary'])
 
     @action(detail=False, methods=['get'])
+    @conditional_on('soldier', 'evacuation', per_minute=True)
+    @cached_response('evacuation_summary', 'soldier', 'evacuation', per_minute=True)
     def evacuation_summary(self, request):
         """Зведення по статусах евакуації"""
-        # Get status choices from Evacuation model
-        statuses = dict(Evacuation.EVACUATION_STATUS)
-        summary = {status: [] for status in statuses.keys()}
-        
-        # Process all soldiers with evacuation data
-        for evacuation in Evacuation.objects.all():
-            soldier = evacuation.soldier
-            latest_data = soldier.medicaldata_set.order_by('-timestamp').first()
-            
-            summary[evacuation.status].append({
-                'soldier': self.get_serializer(soldier).data,
-                'latest_data': MedicalDataSerializer(latest_data).data if latest_data else None,
-                'evacuation_time': evacuation.evacuation_time,
-                'evacuation_started': evacuation.evacuation_started
-            })
-
-        # Make summary counts by status
-        status_summary = {
-            status: {
-                'count': len(summary[status]),
-                'label': statuses[status]
-            } for status in statuses.keys()
-        }
-        
-        return Response({
-            'summary': status_summary,
-            'details': summary
-        })
+        return Response(self.build_triage_board(['evacuation_summary'])['evacuation_summary'])
 
     @log_action("start_evacuation")
     @action(detail=True, methods=['post'])
@@ -414,12 +495,13 @@ class SoldierViewSet(viewsets.ModelViewSet):
             soldier=soldier,
             defaults={'status': 'NEEDED'}
         )
+        if created:
+            counters.record_transition(soldier.pk, evacuation_status=None)
         
         # Only update if not already evacuated or in progress
         if evacuation.status not in ['EVACUATED', 'IN_PROGRESS']:
-            evacuation.status = 'IN_PROGRESS'
-            evacuation.evacuation_started = timezone.now()
-            evacuation.save()
+            evacuation_service.start_evacuation(evacuation)
+            pin_to_primary(request)
             
         return Response(self.get_serializer(soldier).data)
 
@@ -432,9 +514,8 @@ class SoldierViewSet(viewsets.ModelViewSet):
         try:
             evacuation = Evacuation.objects.get(soldier=soldier)
             if evacuation.status == 'IN_PROGRESS':
-                evacuation.status = 'EVACUATED'
-                evacuation.evacuation_time = timezone.now()
-                evacuation.save()
+                evacuation_service.complete_evacuation(evacuation)
+                pin_to_primary(request)
         except Evacuation.DoesNotExist:
             pass  # No evacuation to complete
             
@@ -448,76 +529,264 @@ class SoldierViewSet(viewsets.ModelViewSet):
         try:
             evacuation = Evacuation.objects.get(soldier=soldier)
             if evacuation.status == 'IN_PROGRESS':
-                evacuation.status = 'NEEDED'
-                evacuation.evacuation_started = None
-                evacuation.save()
+                evacuation_service.cancel_evacuation(evacuation)
+                pin_to_primary(request)
         except Evacuation.DoesNotExist:
             pass  # No evacuation to cancel
             
         return Response(self.get_serializer(soldier).data)
 
+    def bulk_targets(self, request):
+        """Поранені для масової дії: {"soldiers": [devEui, ...]} у тілі або фільтр unit_id / issue_type у параметрах"""
+        soldiers = self.get_queryset()
+        soldier_ids = request.data.get('soldiers')
+        if soldier_ids is not None:
+            if not isinstance(soldier_ids, list):
+                raise ParseError("Поле 'soldiers' повинно бути списком devEui")
+            return soldiers.filter(pk__in=[str(soldier_id) for soldier_id in soldier_ids])
+        
+        issue_type = request.query_params.get('issue_type')
+        if not issue_type and not request.query_params.get('unit_id'):
+            raise ParseError("Вкажіть список 'soldiers' або фільтр unit_id / issue_type")
+        if issue_type:
+            soldiers = soldiers.filter(state__issue_type__in=issue_type.split(','))
+        return soldiers
+    
+    def bulk_evacuation(self, request, operation):
+        soldier_ids = evacuation_service.bulk_transition(
+            self.bulk_targets(request),
+            operation,
+            request.data.get('evacuation_team') if operation == 'start' else None
+        )
+        if soldier_ids:
+            pin_to_primary(request)
+        return Response({'status': 'success', 'count': len(soldier_ids), 'soldiers': soldier_ids})
+    
+    @log_action("bulk_start_evacuation")
+    @action(detail=False, methods=['post'])
+    def bulk_start_evacuation(self, request):
+        """Розпочати евакуацію групи поранених (окрім вже евакуйованих та тих, що в процесі)"""
+        return self.bulk_evacuation(request, 'start')
+    
+    @log_action("bulk_complete_evacuation")
+    @action(detail=False, methods=['post'])
+    def bulk_complete_evacuation(self, request):
+        """Завершити евакуацію групи поранених, що в процесі евакуації"""
+        return self.bulk_evacuation(request, 'complete')
+    
+    @log_action("bulk_cancel_evacuation")
+    @action(detail=False, methods=['post'])
+    def bulk_cancel_evacuation(self, request):
+        """Скасувати евакуацію групи поранених, що в процесі евакуації"""
+        return self.bulk_evacuation(request, 'cancel')
+
     @action(detail=False, methods=['get'])
-    def in_evacuation(self, request):
-        """Отримати список поранених в процесі евакуації"""
-        # Get soldiers that have evacuation with IN_PROGRESS status
-        soldiers_in_progress = Soldier.objects.filter(evacuation__status='IN_PROGRESS')
-        data = []
-        
-        for soldier in soldiers_in_progress:
-            latest_data = soldier.medicaldata_set.order_by('-timestamp').first()
-            evacuation_duration = None
-            
+    @conditional_on('soldier', 'evacuation', per_minute=True)
+    @cached_response('triage_board', 'soldier', 'evacuation', per_minute=True)
+    def triage_board(self, request):
+        """Всі групування дашборду одним проходом: ?sections=critical_vitals,in_evacuation,...
+
+        Кожна секція має той самий формат, що й відповідний окремий endpoint.
+        """
+        return Response(self.build_triage_board(self.triage_sections()))
+
+    def triage_sections(self):
+        requested = self.request.query_params.get('sections')
+        if not requested:
+            return list(TRIAGE_SECTIONS)
+        sections = [section.strip() for section in requested.split(',') if section.strip()]
+        unknown = [section for section in sections if section not in TRIAGE_SECTIONS]
+        if unknown:
+            raise ParseError(f"Невідомі секції: {', '.join(unknown)}. Доступні: {', '.join(TRIAGE_SECTIONS)}")
+        return sections
+
+    def build_triage_board(self, sections):
+        """Групування поранених за одним запитом: боєць, евакуація, стан та останній вимір"""
+        soldiers = list(self.get_queryset().select_related('evacuation', 'state__medical_data'))
+        now = timezone.now()
+
+        rows = []
+        for soldier in soldiers:
             try:
                 evacuation = soldier.evacuation
+            except Evacuation.DoesNotExist:
+                evacuation = None
+            try:
+                latest_data = soldier.state.medical_data
+            except SoldierState.DoesNotExist:
+                latest_data = None
+            rows.append((soldier, evacuation, latest_data))
+
+        def not_evacuated(evacuation):
+            return evacuation is None or evacuation.status != 'EVACUATED'
+
+        # Кожен боєць і вимір серіалізуються один раз, навіть якщо входять до кількох секцій
+        selected = {}
+        for section in sections:
+            for soldier, evacuation, latest_data in rows:
+                if section == 'issues_summary':
+                    include = not_evacuated(evacuation) and latest_data is not None and latest_data.issue_type != 'NORMAL'
+                elif section == 'critical_vitals':
+                    include = not_evacuated(evacuation) and latest_data is not None and latest_data.issue_type in MedicalData.CRITICAL_ISSUE_TYPES
+                elif section == 'sensor_errors':
+                    include = not_evacuated(evacuation) and latest_data is not None and latest_data.issue_type == 'SENSOR_ERROR'
+                elif section == 'in_evacuation':
+                    include = evacuation is not None and evacuation.status == 'IN_PROGRESS'
+                else:
+                    include = evacuation is not None
+                if include:
+                    selected[soldier.pk] = (soldier, latest_data)
+        selected = list(selected.values())
+        serialized_soldiers = dict(zip(
+            [soldier.pk for soldier, _ in selected],
+            self.get_serializer([soldier for soldier, _ in selected], many=True).data
+        ))
+        readings = [latest_data for _, latest_data in selected if latest_data is not None]
+        serialized_readings = dict(zip(
+            [reading.pk for reading in readings],
+            MedicalDataSerializer(readings, many=True).data
+        ))
+
+        def reading(latest_data):
+            return serialized_readings[latest_data.pk] if latest_data is not None else None
+
+        board = {}
+        if 'issues_summary' in sections:
+            details = {issue_type: [] for issue_type in ('SPO2', 'HR', 'BOTH', 'SENSOR_ERROR')}
+            total_wounded = 0
+            for soldier, evacuation, latest_data in rows:
+                if not not_evacuated(evacuation):
+                    continue
+                total_wounded += 1
+                if latest_data is not None and latest_data.issue_type in details:
+                    details[latest_data.issue_type].append({
+                        'soldier': serialized_soldiers[soldier.pk],
+                        'medical_data': reading(latest_data)
+                    })
+            details['total_wounded'] = total_wounded
+            board['issues_summary'] = {
+                'summary': {
+                    'spo2_issues': len(details['SPO2']),
+                    'hr_issues': len(details['HR']),
+                    'both_issues': len(details['BOTH']),
+                    'sensor_errors': len(details['SENSOR_ERROR']),
+                    'total_wounded': total_wounded
+                },
+                'details': details
+            }
+
+        if 'critical_vitals' in sections:
+            critical = [
+                {
+                    'soldier': serialized_soldiers[soldier.pk],
+                    'medical_data': reading(latest_data),
+                    'issue_type': latest_data.issue_type
+                }
+                for soldier, evacuation, latest_data in rows
+                if not_evacuated(evacuation) and latest_data is not None and latest_data.issue_type in MedicalData.CRITICAL_ISSUE_TYPES
+            ]
+            board['critical_vitals'] = sorted(critical, key=lambda item: item['issue_type'] == 'BOTH', reverse=True)
+
+        if 'sensor_errors' in sections:
+            board['sensor_errors'] = [
+                {
+                    'soldier': serialized_soldiers[soldier.pk],
+                    'medical_data': reading(latest_data),
+                    'error_duration': self.get_time_since_last_update(latest_data)
+                }
+                for soldier, evacuation, latest_data in rows
+                if not_evacuated(evacuation) and latest_data is not None and latest_data.issue_type == 'SENSOR_ERROR'
+            ]
+
+        if 'in_evacuation' in sections:
+            in_progress = []
+            for soldier, evacuation, latest_data in rows:
+                if evacuation is None or evacuation.status != 'IN_PROGRESS':
+                    continue
+                duration = None
                 if evacuation.evacuation_started:
-                    diff = timezone.now() - evacuation.evacuation_started
-                    evacuation_duration = round(diff.total_seconds() / 60, 1)  # в хвилинах
-                
-                data.append({
-                    'soldier': self.get_serializer(soldier).data,
+                    duration = round((now - evacuation.evacuation_started).total_seconds() / 60, 1)  # в хвилинах
+                in_progress.append({
+                    'soldier': serialized_soldiers[soldier.pk],
                     'evacuation_started': evacuation.evacuation_started,
-                    'evacuation_duration_minutes': evacuation_duration,
-                    'latest_data': MedicalDataSerializer(latest_data).data if latest_data else None
+                    'evacuation_duration_minutes': duration,
+                    'latest_data': reading(latest_data)
                 })
-            except Evacuation.DoesNotExist:
-                continue
+            # Евакуації без часу початку - в кінці списку
+            board['in_evacuation'] = sorted(
+                in_progress,
+                key=lambda item: (item['evacuation_started'] is None, item['evacuation_started'] or now)
+            )
+
+        if 'evacuation_summary' in sections:
+            statuses = dict(Evacuation.EVACUATION_STATUS)
+            details = {evacuation_status: [] for evacuation_status in statuses}
+            for soldier, evacuation, latest_data in rows:
+                if evacuation is None:
+                    continue
+                details[evacuation.status].append({
+                    'soldier': serialized_soldiers[soldier.pk],
+                    'latest_data': reading(latest_data),
+                    'evacuation_time': evacuation.evacuation_time,
+                    'evacuation_started': evacuation.evacuation_started
+                })
+            board['evacuation_summary'] = {
+                'summary': {
+                    evacuation_status: {
+                        'count': len(details[evacuation_status]),
+                        'label': statuses[evacuation_status]
+                    } for evacuation_status in statuses
+                },
+                'details': details
+            }
+
+        return board
+
+    @action(detail=False, methods=['get'])
+    def in_evacuation(self, request):
+        """Отримати список поранених в процесі евакуації"""
+        return Response(self.build_triage_board(['in_evacuation'])['in_evacuation'])
+
+    @action(detail=False, methods=['get'])
+    def status_matrix(self, request):
+        """Кількість бійців за підрозділом, статусом евакуації та типом проблеми"""
+        queryset = StatusCounter.objects.all()
+        unit_id = parse_unit_id(request)
+        if unit_id is not None:
+            queryset = queryset.filter(unit__ancestor_links__ancestor_id=unit_id)
+        
+        matrix = counters.status_matrix(queryset)
+        by_evacuation_status = {}
+        by_issue_type = {}
+        for cell in matrix:
+            by_evacuation_status[cell['evacuation_status']] = by_evacuation_status.get(cell['evacuation_status'], 0) + cell['count']
+            by_issue_type[cell['issue_type']] = by_issue_type.get(cell['issue_type'], 0) + cell['count']
         
-        return Response(sorted(data, key=lambda x: x['evacuation_started']))
+        return Response({
+            'matrix': [
+                {
+                    'unit_id': cell['unit_id'],
+                    'unit': cell['unit__name'],
+                    'evacuation_status': cell['evacuation_status'],
+                    'issue_type': cell['issue_type'],
+                    'count': cell['count']
+                } for cell in matrix
+            ],
+            'by_evacuation_status': by_evacuation_status,
+            'by_issue_type': by_issue_type,
+            'total': sum(cell['count'] for cell in matrix)
+        })
 
     @action(detail=False, methods=['get'])
     def sensor_errors(self, request):
         """Список поранених з помилками датчиків"""
-        soldiers_with_errors = []
-        # Get soldiers that don't have evacuation with EVACUATED status
-        for soldier in Soldier.objects.exclude(evacuation__status='EVACUATED'):
-            latest_data = soldier.medicaldata_set.order_by('-timestamp').first()
-            if latest_data and latest_data.issue_type == 'SENSOR_ERROR':
-                soldiers_with_errors.append({
-                    'soldier': self.get_serializer(soldier).data,
-                    'medical_data': MedicalDataSerializer(latest_data).data,
-                    'error_duration': self.get_time_since_last_update(latest_data)
-                })
-        return Response(soldiers_with_errors)
+        return Response(self.build_triage_board(['sensor_errors'])['sensor_errors'])
 
     @action(detail=False, methods=['get'])
+    @conditional_on('soldier', 'evacuation', per_minute=True)
     def critical_vitals(self, request):
         """Поранені з критичними показниками життєдіяльності"""
-        critical_soldiers = []
-        # Get soldiers that don't have evacuation with EVACUATED status
-        for soldier in Soldier.objects.exclude(evacuation__status='EVACUATED'):
-            latest_data = soldier.medicaldata_set.order_by('-timestamp').first()
-            if latest_data and latest_data.issue_type in ['SPO2', 'HR', 'BOTH']:
-                critical_soldiers.append({
-                    'soldier': self.get_serializer(soldier).data,
-                    'medical_data': MedicalDataSerializer(latest_data).data,
-                    'issue_type': latest_data.issue_type
-                })
-        
-        return Response(sorted(
-            critical_soldiers,
-            key=lambda x: x['issue_type'] == 'BOTH',
-            reverse=True
-        ))
+        return Response(self.build_triage_board(['critical_vitals'])['critical_vitals'])
 
     @action(detail=False, methods=['get'])
     def nearby(self, request):
@@ -532,24 +801,101 @@ class SoldierViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        nearby = []
         # Get soldiers that don't have evacuation with EVACUATED status
-        for soldier in Soldier.objects.exclude(evacuation__status='EVACUATED'):
-            latest_data = soldier.medicaldata_set.order_by('-timestamp').first()
-            if latest_data:
-                distance = self.calculate_distance(
-                    lat, lon,
-                    latest_data.latitude,
-                    latest_data.longitude
-                )
-                if distance <= radius:
-                    nearby.append({
-                        'soldier': self.get_serializer(soldier).data,
-                        'distance': round(distance, 2),
-                        'medical_data': MedicalDataSerializer(latest_data).data
-                    })
+        states = SoldierState.objects.exclude(
+            soldier__evacuation__status='EVACUATED'
+        ).filter(unit_filter(request, 'soldier')).select_related('soldier__evacuation', 'medical_data')
         
-        return Response(sorted(nearby, key=lambda x: x['distance']))
+        nearby = []
+        for state, distance in states_within_radius(lat, lon, radius, queryset=states):
+            nearby.append({
+                'soldier': self.get_serializer(state.soldier).data,
+                'distance': round(distance, 2),
+                'medical_data': MedicalDataSerializer(state.medical_data).data if state.medical_data else None
+            })
+        
+        return Response(nearby)
+
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """k найближчих поранених до точки (lat, lon) або до пораненого (soldier).
+
+        Фільтри: status - статуси евакуації через кому (за замовчуванням усі, крім
+        EVACUATED), severity=critical|sensor_error або issue_type через кому,
+        unit_id, radius - максимальна відстань в км.
+        """
+        params = request.query_params
+        soldier_id = params.get('soldier')
+        if soldier_id:
+            state = SoldierState.objects.filter(soldier_id=soldier_id).values('latitude', 'longitude').first()
+            if not state:
+                return Response({"error": "Немає даних про місцезнаходження"}, status=status.HTTP_404_NOT_FOUND)
+            lat, lon = state['latitude'], state['longitude']
+        else:
+            try:
+                lat = float(params.get('lat'))
+                lon = float(params.get('lon'))
+            except (TypeError, ValueError):
+                return Response({"error": "Необхідно вказати правильні координати"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            k = min(max(int(params.get('k', 10)), 1), 100)
+            radius = float(params['radius']) if params.get('radius') else None
+        except ValueError:
+            return Response({"error": "Параметри 'k' та 'radius' повинні бути числами"}, status=status.HTTP_400_BAD_REQUEST)
+
+        statuses = params.get('status')
+        if statuses:
+            statuses = statuses.split(',')
+        else:
+            statuses = [value for value, _ in Evacuation.EVACUATION_STATUS if value != 'EVACUATED']
+        severity = params.get('severity')
+        if severity == 'critical':
+            issue_types = MedicalData.CRITICAL_ISSUE_TYPES
+        elif severity == 'sensor_error':
+            issue_types = ['SENSOR_ERROR']
+        else:
+            issue_types = params.get('issue_type').split(',') if params.get('issue_type') else None
+        unit_id = parse_unit_id(request)
+        soldier_ids = None
+        if unit_id is not None:
+            soldier_ids = Soldier.objects.filter(subtree_q(unit_id)).values_list('pk', flat=True)
+
+        return Response(nearest_service.nearest(
+            lat, lon, k,
+            statuses=statuses,
+            issue_types=issue_types,
+            soldier_ids=soldier_ids,
+            exclude=soldier_id or None,
+            radius_km=radius
+        ))
+
+    @action(detail=False, methods=['get'])
+    @conditional_on('soldier', 'evacuation')
+    def clusters(self, request):
+        """Кластери поранених для карти: лише видимі в bbox на масштабі zoom"""
+        bbox = parse_bbox(request)
+        if bbox is None:
+            raise ParseError("Необхідно вказати параметр 'bbox'")
+        if not request.query_params.get('zoom'):
+            raise ParseError("Необхідно вказати параметр 'zoom'")
+        zoom = parse_zoom(request, None)
+
+        pyramid = clustering_service.get_pyramid(parse_unit_id(request))
+        clusters = clustering_service.visible_clusters(pyramid, zoom, bbox)
+        return Response({
+            'zoom': zoom,
+            'total': sum(cluster['count'] for cluster in clusters),
+            'clusters': clusters
+        })
+
+    @action(detail=True, methods=['get'])
+    def trajectory(self, request, pk=None):
+        """Спрощена траєкторія пораненого за період (from, to) для масштабу zoom у форматі encoded polyline"""
+        soldier = self.get_object()
+        start_time, end_time = parse_time_range(request)
+        zoom = parse_zoom(request, trajectory_service.DEFAULT_ZOOM)
+        track = trajectory_service.soldier_trajectory(soldier.pk, start_time, end_time, zoom)
+        return Response(dict(track, **{'from': start_time, 'to': end_time, 'zoom': zoom}))
 
     def get_time_since_last_update(self, medical_data):
         """Розрахунок часу з моменту останнього оновлення"""
@@ -561,43 +907,41 @@ class SoldierViewSet(viewsets.ModelViewSet):
         return None
 
     @action(detail=False, methods=['get'])
+    @conditional_on('soldier', 'evacuation', per_minute=True)
     def prioritized(self, request):
         """Отримати список поранених, відсортований за пріоритетом"""
         try:
             # Отримуємо всіх солдатів без фільтрації за евакуацією
-            soldiers = Soldier.objects.all()
-            
-            # Дані для фронтенду - потрібен плоский список
-            result_list = []
+            soldiers = self.get_queryset()
             
-            for soldier in soldiers:
-                # Отримуємо останні медичні дані
-                try:
-                    latest_data = MedicalData.objects.filter(device=soldier).order_by('-timestamp').first()
-                    serialized_soldier = SoldierDetailSerializer(soldier).data
-                    
-                    # Додаємо останні медичні дані до результату
-                    if latest_data:
-                        serialized_soldier['latest_data'] = MedicalDataSerializer(latest_data).data
-                    
-                    # Додаємо інформацію про евакуацію
-                    try:
-                        evacuation = soldier.evacuation
-                        serialized_soldier['evacuation'] = {
-                            'status': evacuation.status,
-                            'evacuation_time': evacuation.evacuation_time,
-                            'evacuation_started': evacuation.evacuation_started,
-                            'priority': evacuation.priority
-                        }
-                    except Evacuation.DoesNotExist:
-                        serialized_soldier['evacuation'] = None
-                    
-                    result_list.append(serialized_soldier)
-                except Exception as e:
-                    logger.error(f"Помилка при обробці медичних даних для солдата {soldier.devEui}: {str(e)}")
-                    continue
+            # Результат перебудовується лише коли змінились дані, евакуації, склад поранених
+            # або минула хвилина (тривалості в списку округлені до хвилин)
+            fingerprint = soldiers.aggregate(
+                soldiers_count=Count('pk', distinct=True),
+                soldiers_updated=Max('last_update'),
+                state_updated=Max('state__updated_at'),
+                evacuations_count=Count('evacuation', distinct=True),
+                evacuation_updated=Max('evacuation__last_update')
+            )
+            fingerprint['minute'] = int(timezone.now().timestamp() // 60)
+            cache_key = parse_unit_id(request)
+            with _prioritized_lock:
+                cached = _prioritized_cache.get(cache_key)
+                if cached is not None:
+                    _prioritized_cache.move_to_end(cache_key)
+            if cached is not None and cached[0] == fingerprint:
+                return Response(cached[1])
             
+            result_list = self.build_prioritized_list(soldiers)
+            with _prioritized_lock:
+                _prioritized_cache[cache_key] = (fingerprint, result_list)
+                _prioritized_cache.move_to_end(cache_key)
+                while len(_prioritized_cache) > getattr(settings, 'PRIORITIZED_CACHE_SIZE', 64):
+                    _prioritized_cache.popitem(last=False)
             return Response(result_list)
+        except APIException:
+            # Помилки параметрів (ParseError, ValidationError) DRF перетворює на 4xx
+            raise
         except Exception as e:
             logger.error(f"Помилка при отриманні списку солдатів: {str(e)}")
             return Response(
@@ -605,267 +949,147 @@ class SoldierViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    @action(detail=False, methods=['get'])
-    def analytics(self, request):
-        """Розширена аналітика системи"""
-        time_period = request.query_params.get('time_period', '24h')  # 24h, 7d, 30d
-        
-        # Визначаємо часовий період
-        now = timezone.now()
-        if time_period == '7d':
-            start_time = now - timezone.timedelta(days=7)
-        elif time_period == '30d':
-            start_time = now - timezone.timedelta(days=30)
-        else:  # 24h за замовчуванням
-            start_time = now - timezone.timedelta(hours=24)
-
-        # Статистика евакуації
-        evacuation_stats = self.get_evacuation_analytics(start_time)
-        
-        # Аналіз часу реагування
-        response_time_stats = self.get_response_time_analytics(start_time)
-        
-        # Географічний аналіз
-        geo_stats = self.get_geographical_analytics(start_time)
-        
-        # Аналіз критичних станів
-        critical_stats = self.get_critical_state_analytics(start_time)
-        
-        # Загальна статистика системи
-        system_stats = self.get_system_performance_stats(start_time)
-        
-        return Response({
-            'evacuation_statistics': evacuation_stats,
-            'response_time_statistics': response_time_stats,
-            'geographical_statistics': geo_stats,
-            'critical_state_statistics': critical_stats,
-            'system_performance': system_stats,
-            'time_period': time_period,
-            'generated_at': timezone.now()
-        })
-
-    def get_evacuation_analytics(self, start_time):
-        """Аналітика евакуації"""
-        evacuated = Soldier.objects.filter(
-            evacuation_status='EVACUATED',
-            evacuation_time__gte=start_time
+    def build_prioritized_list(self, soldiers):
+        """Плоский список поранених для фронтенду за сталу кількість запитів"""
+        soldiers = soldiers.select_related('evacuation', 'state__medical_data').prefetch_related(
+            Prefetch(
+                'critical_episodes',
+                queryset=CriticalEpisode.objects.filter(ended_at__isnull=True).only('soldier_id', 'started_at'),
+                to_attr='open_episodes'
+            )
         )
         
-        total_evacuated = evacuated.count()
-        avg_evacuation_time = 0
-        evacuation_times = []
-        
-        for soldier in evacuated:
-            if soldier.evacuation_time and soldier.evacuation_started:
-                time_diff = soldier.evacuation_time - soldier.evacuation_started
-                evacuation_times.append(time_diff.total_seconds() / 60)  # в хвилинах
-        
-        if evacuation_times:
-            avg_evacuation_time = sum(evacuation_times) / len(evacuation_times)
-        
-        return {
-            'total_evacuated': total_evacuated,
-            'average_evacuation_time_minutes': round(avg_evacuation_time, 2),
-            'evacuation_success_rate': round(
-                total_evacuated / max(Soldier.objects.filter(
-                    created_at__gte=start_time
-                ).count(), 1) * 100, 2
-            ),
-            'evacuation_time_distribution': {
-                'under_30min': len([t for t in evacuation_times if t <= 30]),
-                '30_60min': len([t for t in evacuation_times if 30 < t <= 60]),
-                'over_60min': len([t for t in evacuation_times if t > 60])
-            }
-        }
-
-    def get_response_time_analytics(self, start_time):
-        """Аналіз часу реагування на критичні стани"""
-        alerts = Alert.objects.filter(created_at__gte=start_time)
-        response_times = []
-        
-        for alert in alerts:
-            if alert.is_read:
-                response_time = (alert.read_at - alert.created_at).total_seconds() / 60
-                response_times.append(response_time)
-        
-        return {
-            'total_alerts': alerts.count(),
-            'average_response_time_minutes': round(
-                sum(response_times) / len(response_times) if response_times else 0, 2
-            ),
-            'response_time_distribution': {
-                'under_5min': len([t for t in response_times if t <= 5]),
-                '5_15min': len([t for t in response_times if 5 < t <= 15]),
-                'over_15min': len([t for t in response_times if t > 15])
-            },
-            'unread_alerts': alerts.filter(is_read=False).count()
-        }
-
-    def get_geographical_analytics(self, start_time):
-        """Географічний аналіз розподілу поранених"""
-        medical_data = MedicalData.objects.filter(timestamp__gte=start_time)
-        
-        # Групуємо дані по координатах з округленням до 0.01 градуса
-        location_clusters = {}
-        for data in medical_data:
-            key = (round(data.latitude, 2), round(data.longitude, 2))
-            if key not in location_clusters:
-                location_clusters[key] = {
-                    'count': 0,
-                    'critical_cases': 0,
-                    'coordinates': {'lat': key[0], 'lng': key[1]}
+        soldiers = list(soldiers)
+        result_list = []
+        for soldier, serialized_soldier in zip(soldiers, SoldierDetailSerializer(soldiers, many=True).data):
+            # Останні медичні дані вже серіалізовані в latest_medical_data
+            if serialized_soldier['latest_medical_data']:
+                serialized_soldier['latest_data'] = serialized_soldier['latest_medical_data']
+            
+            # Додаємо інформацію про евакуацію
+            try:
+                evacuation = soldier.evacuation
+                serialized_soldier['evacuation'] = {
+                    'status': evacuation.status,
+                    'evacuation_time': evacuation.evacuation_time,
+                    'evacuation_started': evacuation.evacuation_started,
+                    'priority': evacuation.priority
                 }
-            location_clusters[key]['count'] += 1
-            if data.issue_type in ['SPO2', 'HR', 'BOTH']:
-                location_clusters[key]['critical_cases'] += 1
-        
-        return {
-            'location_clusters': list(location_clusters.values()),
-            'total_locations': len(location_clusters),
-            'highest_concentration': max(
-                [cluster['count'] for cluster in location_clusters.values()]
-            ) if location_clusters else 0
-        }
-
-    def get_critical_state_analytics(self, start_time):
-        """Аналіз критичних станів"""
-        medical_data = MedicalData.objects.filter(timestamp__gte=start_time)
-        
-        critical_cases = medical_data.filter(issue_type__in=['SPO2', 'HR', 'BOTH'])
-        total_cases = medical_data.count()
-        
-        return {
-            'total_critical_cases': critical_cases.count(),
-            'critical_rate': round(
-                critical_cases.count() / max(total_cases, 1) * 100, 2
-            ),
-            'issue_distribution': {
-                'spo2': medical_data.filter(issue_type='SPO2').count(),
-                'heart_rate': medical_data.filter(issue_type='HR').count(),
-                'both': medical_data.filter(issue_type='BOTH').count(),
-                'sensor_errors': medical_data.filter(issue_type='SENSOR_ERROR').count()
-            },
-            'average_critical_duration_minutes': self.calculate_average_critical_duration(
-                start_time
-            )
-        }
+            except Evacuation.DoesNotExist:
+                serialized_soldier['evacuation'] = None
+            
+            result_list.append(serialized_soldier)
+        return result_list
 
-    def get_system_performance_stats(self, start_time):
-        """Загальна статистика роботи системи"""
-        total_soldiers = Soldier.objects.filter(created_at__gte=start_time).count()
-        total_medical_records = MedicalData.objects.filter(timestamp__gte=start_time).count()
-        
-        # Аналіз активності датчиків
-        active_sensors = Soldier.objects.filter(
-            medicaldata__timestamp__gte=start_time
-        ).distinct().count()
-        
-        # Статистика помилок датчиків
-        sensor_errors = MedicalData.objects.filter(
-            timestamp__gte=start_time,
-            issue_type='SENSOR_ERROR'
-        ).count()
-        
-        return {
-            'total_soldiers_monitored': total_soldiers,
-            'total_medical_records': total_medical_records,
-            'records_per_soldier': round(
-                total_medical_records / max(total_soldiers, 1), 2
-            ),
-            'active_sensors': active_sensors,
-            'sensor_reliability': round(
-                (1 - sensor_errors / max(total_medical_records, 1)) * 100, 2
-            ),
-            'system_coverage': round(
-                active_sensors / max(total_soldiers, 1) * 100, 2
+    def parse_time_param(self, request, name='at'):
+        """Розбирає параметр часу в форматі ISO 8601 (за замовчуванням - поточний момент)"""
+        value = request.query_params.get(name)
+        if not value:
+            return timezone.now()
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValidationError(f"Параметр '{name}' повинен бути датою в форматі ISO 8601")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """Журнал подій пораненого"""
+        soldier = self.get_object()
+        try:
+            until = self.parse_time_param(request, 'until')
+        except ValidationError as e:
+            return Response({"error": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 200)), 1000)
+        except ValueError:
+            return Response(
+                {"error": "Параметр 'limit' повинен бути цілим числом"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        }
-
-    def calculate_average_critical_duration(self, start_time):
-        """Розрахунок середньої тривалості критичного стану"""
-        soldiers = Soldier.objects.filter(
-            medicaldata__timestamp__gte=start_time,
-            medicaldata__issue_type__in=['SPO2', 'HR', 'BOTH']
-        ).distinct()
-        
-        total_duration = 0
-        count = 0
         
-        for soldier in soldiers:
-            _, duration = check_critical_duration(soldier)
-            if duration > 0:
-                total_duration += duration
-                count += 1
-        
-        return round(total_duration / max(count, 1), 2)
+        events = CasualtyEvent.objects.filter(
+            soldier=soldier,
+            occurred_at__lte=until
+        ).order_by('-id')[:limit]
+        
+        return Response([
+            {
+                'id': event.id,
+                'event_type': event.event_type,
+                'event_type_display': event.get_event_type_display(),
+                'occurred_at': event.occurred_at,
+                'payload': event.payload
+            } for event in events
+        ])
 
     @action(detail=True, methods=['get'])
-    def medical_history(self, request, pk=None):
-        """Отримати історію медичних показників солдата"""
-        soldier = self.get_object()  # Soldier object directly
+    def state_at(self, request, pk=None):
+        """Стан пораненого на заданий момент часу"""
+        soldier = self.get_object()
+        try:
+            at = self.parse_time_param(request)
+        except ValidationError as e:
+            return Response({"error": e.messages}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Отримуємо всі медичні дані для солдата, відсортовані за часом (найновіші спочатку)
-        medical_records = MedicalData.objects.filter(device=soldier).order_by('-timestamp')
+        return Response({
+            'soldier': soldier.devEui,
+            'at': at,
+            'state': state_at(soldier, at)
+        })
+
+    @action(detail=False, methods=['get'])
+    def battlefield(self, request):
+        """Стан всіх поранених на заданий момент часу"""
+        try:
+            at = self.parse_time_param(request)
+        except ValidationError as e:
+            return Response({"error": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        
+        soldier_ids = None
+        if request.query_params.get('unit_id'):
+            soldier_ids = list(self.get_queryset().values_list('devEui', flat=True))
+        states = battlefield_at(at, soldier_ids=soldier_ids)
+        return Response({
+            'at': at,
+            'count': len(states),
+            'soldiers': states
+        })
+
+    @action(detail=False, methods=['get'])
+    @cached_response('analytics', 'soldier', 'evacuation', 'alert', per_minute=True)
+    def analytics(self, request):
+        """Розширена аналітика системи"""
+        time_period = request.query_params.get('time_period', '24h')  # 24h, 7d, 30d
+        return Response(analytics_service.build_analytics(time_period, parse_unit_id(request)))
+
+    @action(detail=True, methods=['get'])
+    def critical_episodes(self, request, pk=None):
+        """Хронологія критичних епізодів пораненого"""
+        soldier = self.get_object()
+        episodes = CriticalEpisode.objects.filter(soldier=soldier).order_by('-started_at')
         
         # Опційна фільтрація за часовим періодом
         days = request.query_params.get('days')
         if days:
             try:
-                days = int(days)
-                date_threshold = timezone.now() - timezone.timedelta(days=days)
-                medical_records = medical_records.filter(timestamp__gte=date_threshold)
+                date_threshold = timezone.now() - timezone.timedelta(days=int(days))
             except ValueError:
                 return Response(
                     {"error": "Параметр 'days' повинен бути цілим числом"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            episodes = episodes.filter(Q(ended_at__isnull=True) | Q(ended_at__gte=date_threshold))
         
-        # Серіалізуємо дані для відповіді
-        serializer = MedicalDataSerializer(medical_records, many=True)
-        
-        # Додаємо додаткову інформацію про статистику
-        stats = {}
-        if medical_records.exists():
-            # Середні показники
-            avg_spo2 = sum(record.spo2 for record in medical_records if record.spo2 > 0) / max(
-                sum(1 for record in medical_records if record.spo2 > 0), 1
-            )
-            avg_heart_rate = sum(record.heart_rate for record in medical_records if record.heart_rate > 0) / max(
-                sum(1 for record in medical_records if record.heart_rate > 0), 1
-            )
-            
-            # Кількість критичних записів за типом
-            critical_spo2_count = medical_records.filter(issue_type__in=['SPO2', 'BOTH']).count()
-            critical_hr_count = medical_records.filter(issue_type__in=['HR', 'BOTH']).count()
-            critical_both_count = medical_records.filter(issue_type='BOTH').count()
-            
-            stats = {
-                'avg_spo2': round(avg_spo2, 1),
-                'avg_heart_rate': round(avg_heart_rate, 1),
-                'records_count': medical_records.count(),
-                'first_record_date': medical_records.last().timestamp if medical_records.last() else None,
-                'last_record_date': medical_records.first().timestamp if medical_records.first() else None,
-                'critical_stats': {
-                    'critical_spo2_count': critical_spo2_count,
-                    'critical_hr_count': critical_hr_count,
-                    'critical_both_count': critical_both_count,
-                    'sensor_errors': medical_records.filter(issue_type='SENSOR_ERROR').count()
-                }
-            }
-        
-        # Також знаходимо дані евакуації, якщо є
-        try:
-            evacuation = Evacuation.objects.get(soldier=soldier)
-            evacuation_data = EvacuationSerializer(evacuation).data
-        except Evacuation.DoesNotExist:
-            evacuation_data = None
-        
-        return Response({
-            'soldier': SoldierDetailSerializer(soldier).data,
-            'evacuation': evacuation_data,
-            'statistics': stats,
-            'medical_records': serializer.data
-        })
+        return Response(CriticalEpisodeSerializer(episodes, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def medical_history(self, request, pk=None):
+        """Отримати історію медичних показників солдата"""
+        soldier = self.get_object()  # Soldier object directly
+        evacuation = Evacuation.objects.filter(soldier=soldier).first()
+        return medical_history_response(request, soldier, evacuation)
 
     def destroy(self, request, *args, **kwargs):
         """Видалення військового"""
@@ -879,7 +1103,13 @@ class SoldierViewSet(viewsets.ModelViewSet):
                 logger.warning(f"Не вдалося видалити пристрій {soldier.devEui} з ChirpStack: {str(e)}")
             
             # Видаляємо військового з бази даних
-            soldier.delete()
+            with transaction.atomic():
+                counters.soldier_removed(soldier.pk)
+                # Разом з бійцем каскадно видаляються його евакуація та сповіщення
+                record_changes('alert', soldier.alert_set.values_list('id', flat=True), 'DELETE')
+                record_changes('evacuation', Evacuation.objects.filter(soldier=soldier).values_list('id', flat=True), 'DELETE')
+                record_change('soldier', soldier.pk, 'DELETE')
+                soldier.delete()
             
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Soldier.DoesNotExist:
@@ -896,62 +1126,28 @@ class SoldierViewSet(viewsets.ModelViewSet):
 
 def check_critical_duration(soldier):
     """Перевіряє тривалість критичного стану"""
-    critical_records = MedicalData.objects.filter(
-        device=soldier,
-        issue_type__in=['SPO2', 'HR', 'BOTH']
-    ).order_by('-timestamp')
-
-    if critical_records.exists():
-        first_critical = critical_records.last()
-        duration = timezone.now() - first_critical.timestamp
+    episode = CriticalEpisode.objects.filter(
+        soldier=soldier,
+        ended_at__isnull=True
+    ).only('started_at').first()
+
+    if episode:
+        duration = timezone.now() - episode.started_at
         # Якщо в критичному стані більше 15 хвилин
         if duration.total_seconds() > 900:  # 15 хвилин = 900 секунд
             return True, duration.total_seconds() / 60
     return False, 0
 
-def create_alert(soldier, medical_data, alert_type=None, message=None):
-    """Створює сповіщення на основі медичних даних"""
-    if not alert_type:
-        # Якщо тип сповіщення не вказано, визначаємо його на основі даних
-        if medical_data.issue_type in ['SPO2', 'HR', 'BOTH']:
-            alert_type = 'CRITICAL_STATE'
-        else:
-            alert_type = 'NEW_CASUALTY'
-
-    if not message:
-        if alert_type == 'NEW_CASUALTY':
-            message = f'Виявлено нового пораненого: {soldier.first_name} {soldier.last_name}'
-        elif alert_type == 'CRITICAL_STATE':
-            message = f'Критичний стан: {soldier.first_name} {soldier.last_name}'
-        elif alert_type == 'CRITICAL_DURATION':
-            message = f'Тривалий критичний стан: {soldier.first_name} {soldier.last_name}'
-
-    # Перевіряємо чи не існує вже такого сповіщення
-    if not Alert.objects.filter(
-        soldier=soldier,
-        alert_type=alert_type,
-        is_read=False
-    ).exists():
-        Alert.objects.create(
-            soldier=soldier,
-            alert_type=alert_type,
-            message=message,
-            details={
-                'location': {
-                    'lat': medical_data.latitude,
-                    'lng': medical_data.longitude
-                },
-                'vitals': {
-                    'spo2': medical_data.spo2,
-                    'heart_rate': medical_data.heart_rate
-                },
-                'issue_type': medical_data.issue_type
-            }
-        )
-
-class MedicalDataViewSet(viewsets.ReadOnlyModelViewSet):
+class MedicalDataViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = MedicalData.objects.all().order_by('-timestamp')
     serializer_class = MedicalDataSerializer
+    pagination_class = TimestampKeysetPagination
+    replica_actions = ('list', 'retrieve', 'export')
+    
+    def get_permissions(self):
+        if self.action == 'export':
+            return [IsAuthenticated(), IsMedicalStaff()]
+        return super().get_permissions()
     
     def get_queryset(self):
         queryset = MedicalData.objects.all().order_by('-timestamp')
@@ -973,39 +1169,182 @@ class MedicalDataViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(timestamp__gte=date_threshold)
         
         return queryset
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Потокове вивантаження історії вимірів для розбору після бою.
 
-class AlertViewSet(viewsets.ModelViewSet):
+        Параметри: output=csv|ndjson, gzip=1, soldier, unit_id, issue_type (через кому),
+        from, to (ISO 8601).
+        """
+        params = request.query_params
+        output = params.get('output', 'csv')
+        if output not in ('csv', 'ndjson'):
+            return Response({"error": "Параметр 'output' повинен бути csv або ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = MedicalData.objects.filter(unit_filter(request, 'device'))
+        soldier_id = params.get('soldier')
+        if soldier_id:
+            queryset = queryset.filter(device_id=soldier_id)
+        issue_types = params.get('issue_type')
+        if issue_types:
+            queryset = queryset.filter(issue_type__in=issue_types.split(','))
+        for name, lookup in (('from', 'timestamp__gte'), ('to', 'timestamp__lt')):
+            value = params.get(name)
+            if not value:
+                continue
+            parsed = parse_datetime(value)
+            if parsed is None:
+                return Response({"error": f"Параметр '{name}' повинен бути датою в форматі ISO 8601"}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            queryset = queryset.filter(**{lookup: parsed})
+        
+        # Генератор виконується після завершення в'ю, тому база для читання фіксується зараз
+        queryset = queryset.using(router.db_for_read(MedicalData))
+        batches = export_service.export_batches(queryset)
+        chunks = export_service.csv_chunks(batches) if output == 'csv' else export_service.ndjson_chunks(batches)
+        content_type = 'text/csv; charset=utf-8' if output == 'csv' else 'application/x-ndjson; charset=utf-8'
+        filename = f"medical_data_{timezone.now():%Y%m%d_%H%M%S}.{output}"
+        if params.get('gzip') in ('1', 'true'):
+            chunks = export_service.gzip_chunks(chunks)
+            content_type = 'application/gzip'
+            filename += '.gz'
+        
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class AlertViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = Alert.objects.all().order_by('-created_at')
     serializer_class = AlertSerializer
+    pagination_class = CreatedAtKeysetPagination
+    sync_scope = 'alert'
+    
+    def get_queryset(self):
+        queryset = Alert.objects.filter(unit_filter(self.request, 'soldier')).select_related('soldier').order_by('-created_at')
+        params = self.request.query_params
+        
+        # Фільтрація за типом сповіщення та типом проблеми
+        alert_type = params.get('alert_type')
+        if alert_type:
+            queryset = queryset.filter(alert_type=alert_type)
+        issue_type = params.get('issue_type')
+        if issue_type:
+            queryset = queryset.filter(issue_type=issue_type)
+        
+        # Фільтрація за важкістю: critical - критичні показники, sensor_error - помилки датчиків
+        severity = params.get('severity')
+        if severity == 'critical':
+            queryset = queryset.filter(issue_type__in=MedicalData.CRITICAL_ISSUE_TYPES)
+        elif severity == 'sensor_error':
+            queryset = queryset.filter(issue_type='SENSOR_ERROR')
+        
+        # Фільтрація за районом: bbox=min_lat,min_lon,max_lat,max_lon
+        bbox = parse_bbox(self.request)
+        if bbox:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            queryset = queryset.filter(
+                latitude__range=(min_lat, max_lat),
+                longitude__range=(min_lon, max_lon)
+            )
+        
+        # Фільтрація за рівнем SpO2
+        max_spo2 = params.get('max_spo2')
+        if max_spo2:
+            try:
+                queryset = queryset.filter(spo2__lte=int(max_spo2))
+            except ValueError:
+                raise ParseError("Параметр 'max_spo2' повинен бути цілим числом")
+        
+        return queryset
+    
+    def perform_create(self, serializer):
+        alert = serializer.save()
+        record_change('alert', alert.pk)
+    
+    def perform_update(self, serializer):
+        alert = serializer.save()
+        record_change('alert', alert.pk)
+    
+    def perform_destroy(self, instance):
+        alert_id = instance.pk
+        instance.delete()
+        record_change('alert', alert_id, 'DELETE')
     
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         alert = self.get_object()
         if not alert.is_read:
-            alert.is_read = True
-            alert.read_at = timezone.now()
-            alert.save()
+            mark_alert_read(alert)
         return Response({'status': 'success'})
     
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
-        unread_alerts = Alert.objects.filter(is_read=False)
-        current_time = timezone.now()
-        for alert in unread_alerts:
-            alert.is_read = True
-            alert.read_at = current_time
-            alert.save()
-        return Response({'status': 'success', 'count': unread_alerts.count()})
+        """Позначає прочитаними сповіщення, що відповідають фільтрам списку (та списку 'ids' у тілі)"""
+        alerts = self.get_queryset()
+        alert_ids = request.data.get('ids')
+        if alert_ids is not None:
+            try:
+                alerts = alerts.filter(id__in=[int(alert_id) for alert_id in alert_ids])
+            except (TypeError, ValueError):
+                raise ParseError("Поле 'ids' повинно бути списком ідентифікаторів")
+        alert_ids = mark_alerts_read(alerts)
+        return Response({'status': 'success', 'count': len(alert_ids), 'ids': alert_ids})
     
     @action(detail=False, methods=['get'])
+    @conditional_on('alert')
     def unread(self, request):
-        unread_alerts = Alert.objects.filter(is_read=False).order_by('-created_at')
+        # Індекс (is_read, created_at) віддає непрочитані без сортування всієї таблиці
+        unread_alerts = Alert.objects.filter(unit_filter(request, 'soldier'), is_read=False).select_related('soldier').order_by('-created_at')
         serializer = self.get_serializer(unread_alerts, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    @conditional_on('alert')
+    def unread_count(self, request):
+        """Кількість непрочитаних сповіщень за типами"""
+        counts = Alert.objects.filter(unit_filter(request, 'soldier'), is_read=False).values('alert_type').annotate(count=Count('id'))
+        by_type = {row['alert_type']: row['count'] for row in counts}
+        return Response({'total': sum(by_type.values()), 'by_type': by_type})
 
-class EvacuationViewSet(viewsets.ModelViewSet):
+class EvacuationViewSet(DeltaSyncMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Evacuation.objects.all()
     serializer_class = EvacuationSerializer
+    replica_actions = ('medical_history',)
+    sync_scope = 'evacuation'
+    
+    def get_permissions(self):
+        if self.action == 'dispatch_plan':
+            return [IsAuthenticated(), IsMedicalStaff()]
+        return super().get_permissions()
+    
+    def perform_create(self, serializer):
+        evacuation = serializer.save()
+        counters.record_transition(evacuation.soldier_id, evacuation_status=None)
+        record_change('evacuation', evacuation.pk)
+        record_change('soldier', evacuation.soldier_id)
+    
+    def perform_update(self, serializer):
+        previous_status = serializer.instance.status
+        previous_soldier_id = serializer.instance.soldier_id
+        evacuation = serializer.save()
+        if evacuation.soldier_id != previous_soldier_id:
+            counters.record_transition(previous_soldier_id, evacuation_status=previous_status)
+            counters.record_transition(evacuation.soldier_id, evacuation_status=None)
+            record_change('soldier', previous_soldier_id)
+        else:
+            counters.record_transition(evacuation.soldier_id, evacuation_status=previous_status)
+        record_change('evacuation', evacuation.pk)
+        record_change('soldier', evacuation.soldier_id)
+    
+    def perform_destroy(self, instance):
+        previous_status = instance.status
+        evacuation_id = instance.pk
+        instance.delete()
+        counters.record_transition(instance.soldier_id, evacuation_status=previous_status)
+        record_change('evacuation', evacuation_id, 'DELETE')
+        record_change('soldier', instance.soldier_id)
     
     @action(detail=False, methods=['get'])
     def needs_evacuation(self, request):
@@ -1019,6 +1358,54 @@ class EvacuationViewSet(viewsets.ModelViewSet):
         
         return Response(soldiers)
     
+    @action(detail=False, methods=['post'])
+    def dispatch_plan(self, request):
+        """Розподіл поранених, які чекають на евакуацію, між командами з порядком забору.
+
+        Тіло: {"teams": [{"id": "...", "latitude": ..., "longitude": ..., "capacity": N}],
+        "time_budget_ms": 500, "reset": false}; параметр unit_id обмежує поранених
+        піддеревом підрозділу. Без reset розрахунок починається з попереднього плану
+        для того ж набору команд.
+        """
+        teams = request.data.get('teams')
+        if not isinstance(teams, list) or not teams:
+            return Response({"error": "Необхідно вказати список команд 'teams'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            teams = [
+                {
+                    'id': str(team['id']),
+                    'latitude': float(team['latitude']),
+                    'longitude': float(team['longitude']),
+                    'capacity': int(team.get('capacity', 1))
+                }
+                for team in teams
+            ]
+            time_budget_ms = int(request.data['time_budget_ms']) if request.data.get('time_budget_ms') else None
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return Response(
+                {"error": "Кожна команда повинна мати id, latitude, longitude та цілу capacity"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len({team['id'] for team in teams}) != len(teams):
+            return Response({"error": "Ідентифікатори команд повинні бути унікальними"}, status=status.HTTP_400_BAD_REQUEST)
+        max_capacity = getattr(settings, 'DISPATCH_MAX_TEAM_CAPACITY', 50)
+        if any(not 1 <= team['capacity'] <= max_capacity for team in teams):
+            return Response({"error": f"capacity команди повинна бути від 1 до {max_capacity}"}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(
+            math.isfinite(team['latitude']) and math.isfinite(team['longitude'])
+            and -90 <= team['latitude'] <= 90 and -180 <= team['longitude'] <= 180
+            for team in teams
+        ):
+            return Response({"error": "Координати команд повинні бути дійсними числами в межах широти та довготи"}, status=status.HTTP_400_BAD_REQUEST)
+
+        plan = dispatch_service.optimize(
+            teams,
+            unit_id=parse_unit_id(request),
+            time_budget_ms=time_budget_ms,
+            warm_start=not request.data.get('reset', False)
+        )
+        return Response(plan)
+
     @action(detail=True, methods=['post'])
     def start_evacuation(self, request, pk=None):
         evacuation = self.get_object()
@@ -1030,15 +1417,9 @@ class EvacuationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Оновлюємо статус та час початку евакуації
-        evacuation.status = 'IN_PROGRESS'
-        evacuation.evacuation_started = timezone.now()
-        
-        # Додаткові дані з запиту
-        if 'evacuation_team' in request.data:
-            evacuation.evacuation_team = request.data['evacuation_team']
-        
-        evacuation.save()
+        # Оновлюємо статус та час початку евакуації з додатковими даними з запиту
+        evacuation_service.start_evacuation(evacuation, request.data.get('evacuation_team'))
+        pin_to_primary(request)
         
         # Логування дії
         log_action(request, f"Розпочато евакуацію пораненого {evacuation.soldier.first_name} {evacuation.soldier.last_name}")
@@ -1057,9 +1438,8 @@ class EvacuationViewSet(viewsets.ModelViewSet):
             )
         
         # Оновлюємо статус та час завершення евакуації
-        evacuation.status = 'EVACUATED'
-        evacuation.evacuation_time = timezone.now()
-        evacuation.save()
+        evacuation_service.complete_evacuation(evacuation)
+        pin_to_primary(request)
         
         # Логування дії
         log_action(request, f"Завершено евакуацію пораненого {evacuation.soldier.first_name} {evacuation.soldier.last_name}")
@@ -1070,71 +1450,15 @@ class EvacuationViewSet(viewsets.ModelViewSet):
     def medical_history(self, request, pk=None):
         """Отримати історію медичних показників солдата прив'язаного до евакуації"""
         evacuation = self.get_object()
-        soldier = evacuation.soldier
-        
-        # Отримуємо всі медичні дані для солдата, відсортовані за часом (найновіші спочатку)
-        medical_records = MedicalData.objects.filter(device=soldier).order_by('-timestamp')
-        
-        # Опційна фільтрація за часовим періодом
-        days = request.query_params.get('days')
-        if days:
-            try:
-                days = int(days)
-                date_threshold = timezone.now() - timezone.timedelta(days=days)
-                medical_records = medical_records.filter(timestamp__gte=date_threshold)
-            except ValueError:
-                return Response(
-                    {"error": "Параметр 'days' повинен бути цілим числом"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        # Серіалізуємо дані для відповіді
-        serializer = MedicalDataSerializer(medical_records, many=True)
-        
-        # Додаємо додаткову інформацію про статистику
-        stats = {}
-        if medical_records.exists():
-            # Середні показники
-            avg_spo2 = sum(record.spo2 for record in medical_records if record.spo2 > 0) / max(
-                sum(1 for record in medical_records if record.spo2 > 0), 1
-            )
-            avg_heart_rate = sum(record.heart_rate for record in medical_records if record.heart_rate > 0) / max(
-                sum(1 for record in medical_records if record.heart_rate > 0), 1
-            )
-            
-            # Кількість критичних записів за типом
-            critical_spo2_count = medical_records.filter(issue_type__in=['SPO2', 'BOTH']).count()
-            critical_hr_count = medical_records.filter(issue_type__in=['HR', 'BOTH']).count()
-            critical_both_count = medical_records.filter(issue_type='BOTH').count()
-            
-            stats = {
-                'avg_spo2': round(avg_spo2, 1),
-                'avg_heart_rate': round(avg_heart_rate, 1),
-                'records_count': medical_records.count(),
-                'first_record_date': medical_records.last().timestamp if medical_records.last() else None,
-                'last_record_date': medical_records.first().timestamp if medical_records.first() else None,
-                'critical_stats': {
-                    'critical_spo2_count': critical_spo2_count,
-                    'critical_hr_count': critical_hr_count,
-                    'critical_both_count': critical_both_count,
-                    'sensor_errors': medical_records.filter(issue_type='SENSOR_ERROR').count()
-                }
-            }
-        
-        return Response({
-            'soldier': SoldierDetailSerializer(soldier).data,
-            'evacuation': EvacuationSerializer(evacuation).data,
-            'statistics': stats,
-            'medical_records': serializer.data
-        })
+        return medical_history_response(request, evacuation.soldier, evacuation)
 
     @action(detail=True, methods=['get'])
     def near_soldiers(self, request, pk=None):
         evacuation = self.get_object()
         
-        # Отримуємо останні дані пораненого для визначення координат
-        latest_data = MedicalData.objects.filter(device=evacuation.soldier).order_by('-timestamp').first()
-        if not latest_data:
+        # Отримуємо останній стан пораненого для визначення координат
+        state = SoldierState.objects.filter(soldier=evacuation.soldier).first()
+        if not state:
             return Response({"error": "Немає даних про місцезнаходження"}, status=status.HTTP_404_NOT_FOUND)
         
         # Радіус пошуку в кілометрах
@@ -1143,53 +1467,64 @@ class EvacuationViewSet(viewsets.ModelViewSet):
         # Список поранених, які знаходяться поруч
         nearby_soldiers = []
         
-        # Перебираємо всіх поранених
-        for other_soldier in Soldier.objects.all().exclude(devEui=evacuation.soldier.devEui):
-            # Перевіряємо останні дані місцезнаходження
-            other_latest = MedicalData.objects.filter(device=other_soldier).order_by('-timestamp').first()
-            if not other_latest:
-                continue
-                
-            # Визначаємо відстань між пораненими
-            distance = self.calculate_distance(
-                latest_data.latitude, latest_data.longitude,
-                other_latest.latitude, other_latest.longitude
-            )
-            
-            # Якщо відстань менша за радіус пошуку, додаємо до списку
-            if distance <= search_radius:
-                soldier_data = SoldierSerializer(other_soldier).data
-                soldier_data['distance'] = round(distance * 1000, 1)  # Переводимо в метри
-                soldier_data['coordinates'] = {
-                    'latitude': other_latest.latitude,
-                    'longitude': other_latest.longitude
-                }
-                nearby_soldiers.append(soldier_data)
+        # Кандидати відбираються за геохешем, точна відстань рахується лише для них
+        others = SoldierState.objects.exclude(soldier=evacuation.soldier).select_related('soldier__evacuation')
+        for other_state, distance in states_within_radius(state.latitude, state.longitude, search_radius, queryset=others):
+            soldier_data = SoldierSerializer(other_state.soldier).data
+            soldier_data['distance'] = round(distance * 1000, 1)  # Переводимо в метри
+            soldier_data['coordinates'] = {
+                'latitude': other_state.latitude,
+                'longitude': other_state.longitude
+            }
+            nearby_soldiers.append(soldier_data)
         
         return Response(nearby_soldiers)
+
+class UnitViewSet(viewsets.ReadOnlyModelViewSet):
+    """Ієрархія підрозділів"""
+    permission_classes = [IsAuthenticated]
+    queryset = Unit.objects.all()
+    serializer_class = UnitSerializer
     
-    def calculate_distance(self, lat1, lon1, lat2, lon2):
-        # Радіус Землі в км
-        R = 6371.0
-        
-        # Конвертуємо координати в радіани
-        lat1_rad = radians(lat1)
-        lon1_rad = radians(lon1)
-        lat2_rad = radians(lat2)
-        lon2_rad = radians(lon2)
-        
-        # Різниця між координатами
-        dlon = lon2_rad - lon1_rad
-        dlat = lat2_rad - lat1_rad
-        
-        # Формула гаверсинуса
-        a = sin(dlat / 2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon / 2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        
-        # Відстань у кілометрах
-        distance = R * c
-        
-        return distance
+    def get_queryset(self):
+        queryset = Unit.objects.all()
+        
+        # Фільтрація за вищим підрозділом: parent=root - підрозділи верхнього рівня
+        parent = self.request.query_params.get('parent')
+        if parent == 'root':
+            queryset = queryset.filter(parent__isnull=True)
+        elif parent:
+            queryset = queryset.filter(parent_id=parent)
+        return queryset
+    
+    @action(detail=True, methods=['get'])
+    def subtree(self, request, pk=None):
+        """Всі підпорядковані підрозділи з глибиною та кількістю бійців у піддереві"""
+        unit = self.get_object()
+        units = [
+            dict(self.get_serializer(descendant).data, depth=depth)
+            for descendant, depth in subtree_units(unit)
+        ]
+        return Response({
+            'unit': self.get_serializer(unit).data,
+            'units': units,
+            'soldiers_count': Soldier.objects.filter(subtree_q(unit.id)).count()
+        })
+
+    @action(detail=True, methods=['get'])
+    def trajectories(self, request, pk=None):
+        """Спрощені траєкторії всіх бійців піддерева підрозділу за період (from, to) для масштабу zoom"""
+        unit = self.get_object()
+        start_time, end_time = parse_time_range(request)
+        zoom = parse_zoom(request, trajectory_service.DEFAULT_ZOOM)
+        readings = MedicalData.objects.filter(subtree_q(unit.id, 'device'))
+        return Response({
+            'unit_id': unit.id,
+            'from': start_time,
+            'to': end_time,
+            'zoom': zoom,
+            'trajectories': trajectory_service.build_trajectories(readings, start_time, end_time, zoom)
+        })
 
 # Ролі користувачів
 class UserManagementView(APIView):
@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'battle_dashboard.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Імпорт після налаштування Django: модуль використовує моделі
+from api.live import WEBSOCKET_PATH, websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """HTTP обробляє Django, WebSocket /ws/medical_data/ - канал оновлень в реальному часі"""
+    if scope['type'] == 'websocket':
+        if scope['path'] == WEBSOCKET_PATH:
+            await websocket_application(scope, receive, send)
+        else:
+            await send({'type': 'websocket.close', 'code': 4404})
+        return
+    await django_application(scope, receive, send)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 import environ
 from datetime import timedelta
@@ -103,21 +104,62 @@ WSGI_APPLICATION = 'battle_dashboard.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'mysql.connector.django',
-        'NAME': env('DB_NAME', default='battle_dashboard'),
-        'USER': env('DB_USER', default='root'),
-        'PASSWORD': env('DB_PASSWORD', default=''),
-        'HOST': env('DB_HOST', default='localhost'),
-        'PORT': env('DB_PORT', default='3306'),
-        'OPTIONS': {
-            'charset': 'utf8mb4',
-            'use_unicode': True,
-            'init_command': "SET time_zone = '+00:00'",
+DB_ENGINE = env('DB_ENGINE', default='mysql.connector.django')
+
+if DB_ENGINE == 'django.db.backends.sqlite3':
+    # Локальний режим, наприклад для перевірки маршрутизації на двох файлах SQLite
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': env('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
         }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': env('DB_NAME', default='battle_dashboard'),
+            'USER': env('DB_USER', default='root'),
+            'PASSWORD': env('DB_PASSWORD', default=''),
+            'HOST': env('DB_HOST', default='localhost'),
+            'PORT': env('DB_PORT', default='3306'),
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                'use_unicode': True,
+                'init_command': "SET time_zone = '+00:00'",
+            }
+        }
+    }
+
+# Репліка для читання аналітики та історії (необов'язкова)
+REPLICA_DATABASE_ALIAS = 'replica'
+if env('DB_REPLICA_HOST', default='') or env('DB_REPLICA_NAME', default=''):
+    replica = dict(DATABASES['default'])
+    replica['NAME'] = env('DB_REPLICA_NAME', default=replica['NAME'])
+    if 'HOST' in replica:
+        replica['HOST'] = env('DB_REPLICA_HOST', default=replica['HOST'])
+        replica['PORT'] = env('DB_REPLICA_PORT', default=replica['PORT'])
+        replica['USER'] = env('DB_REPLICA_USER', default=replica['USER'])
+        replica['PASSWORD'] = env('DB_REPLICA_PASSWORD', default=replica['PASSWORD'])
+    replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES[REPLICA_DATABASE_ALIAS] = replica
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+REPLICA_MAX_LAG_SECONDS = env.int('REPLICA_MAX_LAG_SECONDS', default=5)  # максимально допустиме відставання
+REPLICA_LAG_CHECK_INTERVAL = env.int('REPLICA_LAG_CHECK_INTERVAL', default=5)  # як часто перевіряти відставання
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=10)  # читання з основної бази після змін користувача
+
+# Кеш, спільний для процесів веб-сервера та MQTT клієнта (версії даних для ETag).
+# CACHE_URL: filecache:///шлях/до/каталогу, rediscache://host:6379/1 або locmemcache:// (лише один процес)
+CACHES = {
+    'default': env.cache('CACHE_URL', default=f"filecache://{os.path.join(tempfile.gettempdir(), 'battle_dashboard_cache')}")
 }
+# Скільки зберігати відповіді, які вже не читаються після зміни даних (секунди)
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=600)
+# Статистика кешу відповідей збирається для кожного N-го запиту в середньому
+RESPONSE_STATS_SAMPLE_RATE = env.int('RESPONSE_STATS_SAMPLE_RATE', default=10)
+# Версія даних поранених (ETag, кеш відповідей) змінюється не частіше ніж раз на стільки секунд
+DATA_VERSION_COALESCE_SECONDS = env.int('DATA_VERSION_COALESCE_SECONDS', default=5)
 
 
 # Password validation
@@ -185,6 +227,65 @@ print(f"MQTT_CA_CERT: {MQTT_CA_CERT}")
 print(f"MQTT_CLIENT_CERT: {MQTT_CLIENT_CERT}")
 print(f"MQTT_CLIENT_KEY: {MQTT_CLIENT_KEY}")
 
+# Скільки секунд спільний кеш пам'ятає, що сповіщення відкрите або щойно прочитане
+OPEN_ALERT_CACHE_SECONDS = env.int('OPEN_ALERT_CACHE_SECONDS', default=60)
+
+# Кількість подій пораненого між знімками стану в журналі подій
+CASUALTY_SNAPSHOT_INTERVAL = env.int('CASUALTY_SNAPSHOT_INTERVAL', default=50)
+
+# Стиснення потоку вимірів: зберігати лише виміри, що виходять за мертву зону
+VITALS_COMPRESSION_ENABLED = env.bool('VITALS_COMPRESSION_ENABLED', default=False)
+VITALS_DEADBAND_SPO2 = env.int('VITALS_DEADBAND_SPO2', default=1)  # відсотки SpO2
+VITALS_DEADBAND_HEART_RATE = env.int('VITALS_DEADBAND_HEART_RATE', default=3)  # ударів за хвилину
+VITALS_DEADBAND_METERS = env.float('VITALS_DEADBAND_METERS', default=10.0)  # зміщення позиції
+VITALS_MAX_INTERVAL_SECONDS = env.int('VITALS_MAX_INTERVAL_SECONDS', default=300)  # зберігати не рідше ніж раз на
+
+# Час життя локального кешу порогів класифікації показників (секунди)
+VITALS_THRESHOLDS_CACHE_SECONDS = env.int('VITALS_THRESHOLDS_CACHE_SECONDS', default=60)
+
+# Кластеризація позицій на карті (/api/soldiers/clusters/)
+CLUSTER_MAX_ZOOM = env.int('CLUSTER_MAX_ZOOM', default=16)  # на більших масштабах використовується цей рівень
+CLUSTER_CELL_PIXELS = env.int('CLUSTER_CELL_PIXELS', default=64)  # розмір комірки сітки, степінь двійки
+
+# Допуск спрощення траєкторій у пікселях на запитаному масштабі карти
+TRAJECTORY_TOLERANCE_PIXELS = env.float('TRAJECTORY_TOLERANCE_PIXELS', default=1.0)
+
+# Кількість точок ряду для графіка в історії показників (параметр points, не більше максимуму)
+MEDICAL_HISTORY_SERIES_POINTS = env.int('MEDICAL_HISTORY_SERIES_POINTS', default=500)
+MEDICAL_HISTORY_MAX_SERIES_POINTS = env.int('MEDICAL_HISTORY_MAX_SERIES_POINTS', default=5000)
+
+# Індекс пошуку найближчих поранених: повна перебудова не рідше ніж раз на NEAREST_REBUILD_SECONDS
+# або коли буфер змін після останньої перебудови перевищує NEAREST_MAX_DELTA поранених
+NEAREST_REBUILD_SECONDS = env.int('NEAREST_REBUILD_SECONDS', default=300)
+NEAREST_MAX_DELTA = env.int('NEAREST_MAX_DELTA', default=1000)
+
+# Планування евакуації (/api/evacuations/dispatch_plan/)
+DISPATCH_TEAM_SPEED_KMH = env.float('DISPATCH_TEAM_SPEED_KMH', default=20.0)  # середня швидкість команди
+DISPATCH_PICKUP_MINUTES = env.float('DISPATCH_PICKUP_MINUTES', default=5.0)  # час на забір одного пораненого
+DISPATCH_CRITICAL_MINUTES_PER_POINT = env.float('DISPATCH_CRITICAL_MINUTES_PER_POINT', default=30.0)  # +1 до терміновості за стільки хвилин критичного стану
+DISPATCH_UNASSIGNED_PENALTY_MINUTES = env.float('DISPATCH_UNASSIGNED_PENALTY_MINUTES', default=240.0)  # штраф за непризначеного пораненого
+DISPATCH_TIME_BUDGET_MS = env.int('DISPATCH_TIME_BUDGET_MS', default=500)
+DISPATCH_MAX_TIME_BUDGET_MS = env.int('DISPATCH_MAX_TIME_BUDGET_MS', default=5000)
+DISPATCH_MAX_TEAM_CAPACITY = env.int('DISPATCH_MAX_TEAM_CAPACITY', default=50)  # найбільша місткість однієї команди
+
+# Скільки фільтрів підрозділу тримати в локальному кеші списку /api/soldiers/prioritized/
+PRIORITIZED_CACHE_SIZE = env.int('PRIORITIZED_CACHE_SIZE', default=64)
+
+# Скільки секунд пропуск у нумерації журналу змін вважається незавершеною транзакцією,
+# а не відкоченою: має перевищувати найдовшу транзакцію, що пише в журнал
+CHANGE_LOG_COMMIT_LAG_SECONDS = env.int('CHANGE_LOG_COMMIT_LAG_SECONDS', default=30)
+
+# Скільки годин зберігати журнал змін для дельта-синхронізації (?since=)
+CHANGE_LOG_RETENTION_HOURS = env.int('CHANGE_LOG_RETENTION_HOURS', default=24)
+
+# Канал оновлень в реальному часі (/ws/medical_data/, потребує ASGI сервера, наприклад uvicorn)
+LIVE_UPDATES_POLL_INTERVAL = env.float('LIVE_UPDATES_POLL_INTERVAL', default=1.0)  # як часто читати журнал змін (секунди)
+LIVE_UPDATES_QUEUE_SIZE = env.int('LIVE_UPDATES_QUEUE_SIZE', default=256)  # черга повідомлень одного клієнта
+
+# Keyset пагінація списків (?page_size=, ?cursor=)
+API_PAGE_SIZE = env.int('API_PAGE_SIZE', default=100)
+API_MAX_PAGE_SIZE = env.int('API_MAX_PAGE_SIZE', default=1000)
+
 # REST Framework налаштування без JWT
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -20,7 +20,7 @@ from rest_framework.routers import DefaultRouter
 from api.views import (
     SoldierViewSet, MedicalDataViewSet, AlertViewSet, EvacuationViewSet, 
     UserProfileView, SecurityView, UserManagementView, UserDetailView, 
-    UserPasswordChangeView
+    UserPasswordChangeView, UnitViewSet
 )
 from django.conf import settings
 from django.conf.urls.static import static
@@ -82,6 +82,7 @@ router.register(r'soldiers', SoldierViewSet)
 router.register(r'medical-data', MedicalDataViewSet)
 router.register(r'alerts', AlertViewSet)
 router.register(r'evacuations', EvacuationViewSet)
+router.register(r'units', UnitViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -1,7 +1,11 @@
 import paho.mqtt.client as mqtt
 from django.conf import settings
 import json
-from api.models import Soldier, MedicalData
+from api.models import Soldier
+from api.services.ingestion import record_medical_data
+from api.services.alerts import create_alert
+from api.services.counters import soldier_added
+from api.services.changes import record_change
 import logging
 import base64
 import ssl
@@ -186,10 +190,13 @@ class MQTTClient:
                     'unit': device_info.get('tags', {}).get('unit', 'Unknown')
                 }
             )
+            if created:
+                soldier_added(soldier.pk)
+                record_change('soldier', soldier.pk)
             
-            # Створюємо запис медичних даних
-            MedicalData.objects.create(
-                device=soldier,
+            # Створюємо запис медичних даних та оновлюємо критичні епізоди
+            medical_data = record_medical_data(
+                soldier=soldier,
                 spo2=parsed_data['spo2'],
                 heart_rate=parsed_data['heart_rate'],
                 latitude=parsed_data['latitude'],
@@ -197,6 +204,14 @@ class MQTTClient:
                 timestamp=timestamp
             )
             
+            if medical_data is None:
+                # Вимір не відрізняється від попереднього збереженого
+                logger.debug(f"Skipped unchanged reading for device {device_id}")
+                return
+            
+            if created:
+                create_alert(soldier, medical_data, 'NEW_CASUALTY')
+            
             logger.info(f"Processed data for device {device_id}")
         except Exception as e:
             logger.error(f"Error processing uplink: {e}")
@@ -340,8 +340,8 @@ const SoldierDetail = () => {
       );
     }
 
-    // Prepare data for the chart
-    const medicalRecords = [...medicalHistory.medical_records].reverse(); // Reverse to show oldest to newest
+    // Prepare data for the chart: downsampled series (oldest to newest) covers the whole period
+    const medicalRecords = medicalHistory.series || [...medicalHistory.medical_records].reverse();
     const labels = medicalRecords.map(record => formatDate(record.timestamp));
     const spo2Data = medicalRecords.map(record => record.spo2);
     const hrData = medicalRecords.map(record => record.heart_rate);
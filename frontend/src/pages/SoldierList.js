@@ -61,9 +61,8 @@ const SoldierList = () => {
         // Це запобігає блоку екрану при фоновому оновленні
       }
       
-      // Отримуємо дані з пріоритезованого API, додаємо timestamp для уникнення кешування
-      const timestamp = new Date().getTime();
-      const response = await soldierService.getPrioritizedSoldiers(timestamp);
+      // Отримуємо дані з пріоритезованого API
+      const response = await soldierService.getPrioritizedSoldiers();
       
       // Перевіряємо, чи отримали масив даних
       if (Array.isArray(response.data)) {
@@ -127,13 +127,10 @@ const soldierService = {
     return api.get('/api/soldiers/');
   },
   
-  getPrioritizedSoldiers: async (timestamp = null) => {
-    let url = '/api/soldiers/prioritized/';
-    // Додаємо timestamp для уникнення кешування
-    if (timestamp) {
-      url += `?t=${timestamp}`;
-    }
-    return api.get(url);
+  getPrioritizedSoldiers: async () => {
+    // Без параметра проти кешування: сервер віддає ETag з Cache-Control: no-cache,
+    // тож браузер перевіряє актуальність і отримує 304, якщо дані не змінились
+    return api.get('/api/soldiers/prioritized/');
   },
   
   getSoldiersByUnit: async (unit) => {